@@ -8,8 +8,28 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .const import (
+    CONF_DETECT_STATE_VARIANT,
+    CONF_HUB_MODE,
+    CONF_LOOP_BUDGET,
+    CONF_MQTT_TOPIC_PREFIX,
+    CONF_PROFILING,
+    CONF_REVERT_ON_TIMEOUT,
+    CONF_SERIAL,
+    DEFAULT_DETECT_STATE_VARIANT,
+    DEFAULT_LOOP_BUDGET,
+    DEFAULT_MQTT_TOPIC_PREFIX,
+    DEFAULT_PROFILING,
+    DEFAULT_REVERT_ON_TIMEOUT,
+    DOMAIN,
+)
+from .api import async_setup_api
+from .hub import PoolNexusHub
+from .profiling import CallbackProfiler, async_setup_profiling
+from .snapshot import async_remove_snapshot
+from .topics import TopicPlan
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,14 +38,79 @@ PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.SWITCH, Platform.TEXT, Pl
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the history and profile services and the websocket command."""
+    async_setup_api(hass)
+    async_setup_profiling(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up PoolNexus from a config entry."""
     hass.data.setdefault(DOMAIN, {})
+
+    # Options override the values of the entry data (older entries were
+    # created with them in the user step)
+    config = {**entry.data, **entry.options}
+    # Topics use the format <prefix>/<serial>/...; hub mode entries discover
+    # the serials from the traffic instead of configuring one.
+    serial = None if config.get(CONF_HUB_MODE) else config.get(CONF_SERIAL)
+    if not serial and not config.get(CONF_HUB_MODE):
+        _LOGGER.error(
+            "PoolNexus config entry %s missing 'serial' — topics must use the format <prefix>/<serial>/...; skipping setup",
+            entry.entry_id,
+        )
+        return False
+
+    # Topics are planned once for the entry and shared by the hub and the
+    # platforms, which no longer read the entry data themselves
+    plan = TopicPlan(
+        config.get(CONF_MQTT_TOPIC_PREFIX, DEFAULT_MQTT_TOPIC_PREFIX),
+        serial,
+        config.get(CONF_DETECT_STATE_VARIANT, DEFAULT_DETECT_STATE_VARIANT),
+    )
+
+    profiler = (
+        CallbackProfiler(config.get(CONF_LOOP_BUDGET, DEFAULT_LOOP_BUDGET))
+        if config.get(CONF_PROFILING, DEFAULT_PROFILING)
+        else None
+    )
+
+    # One wildcard subscription per entry; entities register handlers on the hub
+    hub = PoolNexusHub(
+        hass,
+        entry.entry_id,
+        plan,
+        config.get(CONF_REVERT_ON_TIMEOUT, DEFAULT_REVERT_ON_TIMEOUT),
+        profiler,
+    )
+    await hub.async_start()
+    hass.data[DOMAIN][entry.entry_id] = hub
+
+    # The platforms are set up concurrently
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry to apply changed options."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        hub: PoolNexusHub = hass.data[DOMAIN].pop(entry.entry_id)
+        # Don't drop commands still waiting in the write-behind queues
+        await hub.async_flush_commands()
+        await hub.async_save_snapshot()
+        hub.async_stop()
+    return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the last-known state snapshot of a removed entry."""
+    await async_remove_snapshot(hass, entry.entry_id)
 
@@ -0,0 +1,234 @@
+"""Command acknowledgement tracking for the PoolNexus integration.
+
+Switches, texts and selects show the commanded state right away. Each
+command is also registered as pending in the device's `CommandTracker`
+until the device reports the commanded value on the key's state topic,
+which acknowledges it: the time between its publish and that report is
+recorded in a per-key latency histogram. A command still pending after
+`COMMAND_ACK_TIMEOUT` counts as a timeout and, with the `revert_on_timeout`
+option, the entity goes back to the last state reported by the device.
+
+The write-behind `CommandQueue` (commands.py) reports when a command is
+actually published, which starts its latency clock, so the queue window is
+not counted as device latency. A command whose publish fails is settled
+right away and the entity goes back to the last reported state: the device
+never received it.
+
+Reports of another value while a command is pending (the device
+republishing its previous state before applying the command) do not settle
+it; they only become the state reverted to on timeout.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Callable
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import COMMAND_ACK_BUCKETS, COMMAND_ACK_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+# Marker for "no state reported by the device yet"
+NO_STATE: Any = object()
+
+RevertCallback = Callable[[Any], None]
+
+
+class LatencyHistogram:
+    """Counts of latencies per bucket, plus count, total and maximum."""
+
+    __slots__ = ("bounds", "buckets", "count", "total", "maximum", "last")
+
+    def __init__(self, bounds: tuple[float, ...] = COMMAND_ACK_BUCKETS) -> None:
+        """Initialize the buckets; the last one holds latencies above the bounds."""
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.last = 0.0
+
+    def record(self, latency: float) -> None:
+        """Count a latency in seconds."""
+        self.buckets[bisect_left(self.bounds, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.last = latency
+        if latency > self.maximum:
+            self.maximum = latency
+
+    @property
+    def mean(self) -> float:
+        """Return the mean latency in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram with bucket upper bounds in milliseconds."""
+        labels = [f"le_{bound * 1000:g}ms" for bound in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean * 1000, 3),
+            "max_ms": round(self.maximum * 1000, 3),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class PendingCommand:
+    """A command waiting for the device to report the commanded value."""
+
+    __slots__ = ("value", "sent", "reported", "revert", "cancel_timeout")
+
+    def __init__(self, value: Any, reported: Any, revert: RevertCallback | None) -> None:
+        """Initialize the pending command."""
+        self.value = value
+        # Restarted when the command queue publishes the command
+        self.sent = time.monotonic()
+        # Last value reported by the device, restored on timeout
+        self.reported = reported
+        self.revert = revert
+        self.cancel_timeout: CALLBACK_TYPE | None = None
+
+
+class CommandTracker:
+    """Pending commands and acknowledgement statistics of one device."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        timeout: float = COMMAND_ACK_TIMEOUT,
+        revert_on_timeout: bool = False,
+    ) -> None:
+        """Initialize the tracker."""
+        self._hass = hass
+        self._timeout = timeout
+        self.revert_on_timeout = revert_on_timeout
+        # key -> command waiting for its acknowledgement
+        self.pending: dict[str, PendingCommand] = {}
+        # key -> acknowledgement latencies
+        self.latency: dict[str, LatencyHistogram] = {}
+        # key -> commands never acknowledged
+        self.timeouts: dict[str, int] = {}
+        self.acknowledged = 0
+        self.failed = 0
+        self.reverted = 0
+        self.last_latency = 0.0
+
+    @property
+    def total_timeouts(self) -> int:
+        """Return the number of commands never acknowledged."""
+        return sum(self.timeouts.values())
+
+    @callback
+    def async_command(
+        self, key: str, value: Any, reported: Any, revert: RevertCallback | None = None
+    ) -> None:
+        """Register a command setting ``key`` to ``value``.
+
+        ``reported`` is the last value the device reported for the key
+        (`NO_STATE` if none); ``revert`` is called with it on timeout when
+        reverting is enabled. A new command on a key replaces the pending
+        one, keeping the value to revert to.
+        """
+        previous = self.pending.pop(key, None)
+        if previous is not None:
+            reported = previous.reported
+            if previous.cancel_timeout is not None:
+                previous.cancel_timeout()
+        pending = self.pending[key] = PendingCommand(value, reported, revert)
+
+        @callback
+        def _async_timeout(_now: Any) -> None:
+            pending.cancel_timeout = None
+            self._async_timeout(key, pending)
+
+        pending.cancel_timeout = async_call_later(self._hass, self._timeout, _async_timeout)
+
+    @callback
+    def async_reported(self, key: str, value: Any) -> None:
+        """Process a value reported by the device for ``key``."""
+        pending = self.pending.get(key)
+        if pending is None:
+            return
+        if value != pending.value:
+            pending.reported = value
+            return
+        del self.pending[key]
+        if pending.cancel_timeout is not None:
+            pending.cancel_timeout()
+        latency = time.monotonic() - pending.sent
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = LatencyHistogram()
+        histogram.record(latency)
+        self.acknowledged += 1
+        self.last_latency = latency
+
+    @callback
+    def async_published(self, key: str) -> None:
+        """Start the latency clock of the command on ``key``, just published."""
+        pending = self.pending.get(key)
+        if pending is not None:
+            pending.sent = time.monotonic()
+
+    @callback
+    def async_failed(self, key: str) -> None:
+        """Settle the command on ``key`` whose publish failed.
+
+        The entity goes back to the last state reported by the device,
+        whatever the ``revert_on_timeout`` option.
+        """
+        pending = self.pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.cancel_timeout is not None:
+            pending.cancel_timeout()
+        self.failed += 1
+        if pending.revert is not None and pending.reported is not NO_STATE:
+            self.reverted += 1
+            pending.revert(pending.reported)
+
+    @callback
+    def _async_timeout(self, key: str, pending: PendingCommand) -> None:
+        if self.pending.get(key) is not pending:
+            return
+        del self.pending[key]
+        self.timeouts[key] = self.timeouts.get(key, 0) + 1
+        _LOGGER.warning(
+            "Command %s=%s not acknowledged by the device within %ss",
+            key,
+            pending.value,
+            self._timeout,
+        )
+        if (
+            self.revert_on_timeout
+            and pending.revert is not None
+            and pending.reported is not NO_STATE
+        ):
+            self.reverted += 1
+            pending.revert(pending.reported)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop the pending commands (on unload)."""
+        for pending in self.pending.values():
+            if pending.cancel_timeout is not None:
+                pending.cancel_timeout()
+        self.pending.clear()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the tracker state for the diagnostics."""
+        return {
+            "pending": sorted(self.pending),
+            "acknowledged": self.acknowledged,
+            "failed": self.failed,
+            "timeouts": dict(sorted(self.timeouts.items())),
+            "reverted": self.reverted,
+            "latency": {
+                key: histogram.as_dict() for key, histogram in sorted(self.latency.items())
+            },
+        }
@@ -0,0 +1,101 @@
+"""Alert tracking for the PoolNexus integration.
+
+Devices republish their current alert every cycle on `<serial>/alert` as
+JSON (`{"type": ..., "message": ..., "timestamp": ...}`), with type "none"
+when nothing is wrong. `AlertTracker` keeps the current alert of one device
+and only reacts to transitions, i.e. a change of type or message: the
+timestamp of a repeated alert is the publish time, not a new alert. On a
+transition it records the new alert in a bounded history and fires
+`EVENT_ALERT`.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import ALERT_HISTORY_SIZE, ALERT_TYPE_NONE, EVENT_ALERT
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Alert:
+    """One alert as published by a device."""
+
+    type: str
+    message: str = ""
+    timestamp: str | None = None
+
+    @property
+    def active(self) -> bool:
+        """Return True unless the alert reports that nothing is wrong."""
+        return self.type not in (ALERT_TYPE_NONE, "")
+
+    @classmethod
+    def from_payload(cls, data: Any) -> Alert:
+        """Build an alert from a decoded JSON payload."""
+        if not isinstance(data, dict):
+            return cls(ALERT_TYPE_NONE if not data else str(data))
+        return cls(
+            str(data.get("type") or ALERT_TYPE_NONE),
+            str(data.get("message") or ""),
+            str(data["timestamp"]) if data.get("timestamp") else None,
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the alert as event data / attributes."""
+        return {"type": self.type, "message": self.message, "timestamp": self.timestamp}
+
+
+class AlertTracker:
+    """Current alert and recent transitions of one device."""
+
+    def __init__(self, hass: HomeAssistant, serial: str) -> None:
+        """Initialize the tracker."""
+        self._hass = hass
+        self._serial = serial
+        self.current: Alert | None = None
+        # Recent transitions, oldest first
+        self.history: deque[Alert] = deque(maxlen=ALERT_HISTORY_SIZE)
+
+    @callback
+    def async_update(self, alert: Alert) -> Alert:
+        """Process a received alert and return the current one.
+
+        The current alert keeps the timestamp of its first occurrence. The
+        first alert seen only sets the baseline: it is recorded when active
+        but fires no event, since it is usually the retained value replayed
+        at startup.
+        """
+        current = self.current
+        if current is not None and (alert.type, alert.message) == (
+            current.type,
+            current.message,
+        ):
+            return current
+        self.current = alert
+        if current is None and not alert.active:
+            return alert
+        self.history.append(alert)
+        if current is not None:
+            _LOGGER.debug(
+                "Alert of %s changed from %s to %s", self._serial, current.type, alert.type
+            )
+            self._hass.bus.async_fire(
+                EVENT_ALERT,
+                {
+                    "serial": self._serial,
+                    **alert.as_dict(),
+                    "active": alert.active,
+                    "previous_type": current.type,
+                },
+            )
+        return alert
+
+    def recent(self) -> list[dict[str, Any]]:
+        """Return the recent alerts, newest first."""
+        return [alert.as_dict() for alert in reversed(self.history)]
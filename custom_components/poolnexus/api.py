@@ -0,0 +1,140 @@
+"""History read API of the PoolNexus integration.
+
+The same query is exposed as the `poolnexus.get_history` service (with a
+response) and the `poolnexus/history` websocket command: the points of one
+key of one device between ``start`` and ``end``, from the finest history
+tier covering ``start`` unless a tier is requested.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+import time
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DEFAULT_HISTORY_RANGE, DOMAIN, HISTORY_TIERS, SENSOR_TYPES
+from .history import KeyHistory
+from .hub import PoolNexusHub
+
+SERVICE_GET_HISTORY = "get_history"
+
+HISTORY_KEYS = [key for key, cfg in SENSOR_TYPES.items() if cfg.get("history")]
+
+SERVICE_GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required("serial"): cv.string,
+        vol.Required("key"): vol.In(HISTORY_KEYS),
+        vol.Optional("start"): cv.datetime,
+        vol.Optional("end"): cv.datetime,
+        vol.Optional("tier"): vol.In(list(HISTORY_TIERS)),
+    }
+)
+
+
+def _find_history(hass: HomeAssistant, serial: str, key: str) -> KeyHistory | None:
+    """Return the history of ``key`` of the device ``serial``, in any entry."""
+    hub: PoolNexusHub
+    for hub in hass.data.get(DOMAIN, {}).values():
+        device = hub.devices.get(serial)
+        if device is not None:
+            return device.history.keys.get(key)
+    return None
+
+
+def _query(
+    hass: HomeAssistant,
+    serial: str,
+    key: str,
+    start: float | None,
+    end: float | None,
+    tier: str | None,
+) -> dict[str, Any] | None:
+    """Run a history query; None when the device is unknown."""
+    history = _find_history(hass, serial, key)
+    if history is None:
+        return None
+    if end is None:
+        end = time.time()
+    if start is None:
+        start = end - DEFAULT_HISTORY_RANGE
+    tier, points = history.query(start, end, tier)
+    return {
+        "serial": serial,
+        "key": key,
+        "tier": tier,
+        "start": start,
+        "end": end,
+        # [epoch seconds, value] pairs, oldest first
+        "points": [[timestamp, value] for timestamp, value in points],
+    }
+
+
+def _timestamp(value: datetime | None) -> float | None:
+    # Naive service datetimes are in the Home Assistant time zone
+    return dt_util.as_utc(value).timestamp() if value is not None else None
+
+
+@callback
+def async_setup_api(hass: HomeAssistant) -> None:
+    """Register the history service and websocket command."""
+
+    async def _async_get_history(call: ServiceCall) -> ServiceResponse:
+        result = _query(
+            hass,
+            call.data["serial"],
+            call.data["key"],
+            _timestamp(call.data.get("start")),
+            _timestamp(call.data.get("end")),
+            call.data.get("tier"),
+        )
+        if result is None:
+            raise ServiceValidationError(f"Unknown PoolNexus device {call.data['serial']}")
+        return result
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        _async_get_history,
+        schema=SERVICE_GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    websocket_api.async_register_command(hass, websocket_history)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required("serial"): str,
+        vol.Required("key"): vol.In(HISTORY_KEYS),
+        vol.Optional("start"): vol.Coerce(float),
+        vol.Optional("end"): vol.Coerce(float),
+        vol.Optional("tier"): vol.In(list(HISTORY_TIERS)),
+    }
+)
+@callback
+def websocket_history(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the history points of a device key (times in epoch seconds)."""
+    result = _query(
+        hass, msg["serial"], msg["key"], msg.get("start"), msg.get("end"), msg.get("tier")
+    )
+    if result is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, f"Unknown device {msg['serial']}"
+        )
+        return
+    connection.send_result(msg["id"], result)
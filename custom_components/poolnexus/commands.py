@@ -0,0 +1,179 @@
+"""Outbound command queue for the PoolNexus integration.
+
+Commands to a device are not published one by one: they are collected per
+`/set` topic for a short window (the last value wins) and flushed together,
+so an automation changing several switches and setpoints at once produces
+one batch of publishes instead of a burst of awaited ones.
+
+The integration subscribes to every topic of its devices, so each retained
+command comes straight back on its own `/set` topic. Published commands are
+kept in flight until that echo arrives (or `COMMAND_ECHO_TIMEOUT`), and the
+hub drops the message matching the payload sent instead of dispatching it
+again; a different payload on the topic is a device-side change and is
+dispatched as usual.
+
+With a `CommandTracker` (acks.py) the queue reports every command it
+publishes, starting its acknowledgement clock, and every failed publish,
+which settles the command at once.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.mqtt import async_publish
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import COMMAND_ECHO_TIMEOUT, DEFAULT_COMMAND_WINDOW
+
+if TYPE_CHECKING:
+    from .acks import CommandTracker
+    from .profiling import CallbackProfiler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CommandQueue:
+    """Write-behind queue of retained commands for one device."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        window: float = DEFAULT_COMMAND_WINDOW,
+        profiler: CallbackProfiler | None = None,
+        tracker: CommandTracker | None = None,
+    ) -> None:
+        """Initialize the queue.
+
+        Publishes are timed by ``profiler`` and reported to the
+        acknowledgement ``tracker``, if given.
+        """
+        self._hass = hass
+        self._window = window
+        self._profiler = profiler
+        self._tracker = tracker
+        # /set topic -> payload, last value wins
+        self._pending: dict[str, str] = {}
+        self._first_enqueued: float = 0.0
+        self._cancel_flush: CALLBACK_TYPE | None = None
+        # /set topic -> (payload bytes, monotonic deadline) of the published
+        # commands whose echo has not been received yet
+        self.in_flight: dict[str, tuple[bytes, float]] = {}
+        # Statistics
+        self.enqueued = 0
+        self.collapsed = 0
+        self.published = 0
+        self.failed = 0
+        self.echoes = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Return the number of commands waiting to be published."""
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the queue statistics."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "collapsed": self.collapsed,
+            "published": self.published,
+            "failed": self.failed,
+            "in_flight": len(self.in_flight),
+            "echoes": self.echoes,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    @callback
+    def async_enqueue(self, topic: str, payload: str) -> None:
+        """Queue a retained publish of ``payload`` on ``topic``."""
+        self.enqueued += 1
+        if topic in self._pending:
+            self.collapsed += 1
+        self._pending[topic] = payload
+        self.max_depth = max(self.max_depth, len(self._pending))
+        if self._cancel_flush is None:
+            self._first_enqueued = time.monotonic()
+            self._cancel_flush = async_call_later(
+                self._hass, self._window, self._async_flush_later
+            )
+
+    @callback
+    def async_consume_echo(self, topic: str, payload: bytes) -> bool:
+        """Return True if ``payload`` on ``topic`` is the echo of a command.
+
+        The in-flight command is settled either way: a differing payload
+        means the device (or another client) changed the value since.
+        """
+        in_flight = self.in_flight.pop(topic, None)
+        if in_flight is None:
+            return False
+        sent, deadline = in_flight
+        if payload != sent or time.monotonic() > deadline:
+            return False
+        self.echoes += 1
+        return True
+
+    @callback
+    def _async_flush_later(self, _now: Any) -> None:
+        self._cancel_flush = None
+        self._hass.async_create_task(self.async_flush())
+
+    async def async_flush(self) -> None:
+        """Publish every queued command now."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        first_enqueued = self._first_enqueued
+        # In flight before publishing: the echo may be dispatched before
+        # the publish calls return
+        deadline = time.monotonic() + COMMAND_ECHO_TIMEOUT
+        tracker = self._tracker
+        for topic, payload in batch.items():
+            self.in_flight[topic] = (payload.encode("utf-8"), deadline)
+            if tracker is not None:
+                tracker.async_published(_command_key(topic))
+        publishes = [
+            async_publish(self._hass, topic, payload, retain=True)
+            for topic, payload in batch.items()
+        ]
+        if self._profiler is not None:
+            publishes = [
+                self._profiler.async_timed_publish(topic, publish)
+                for topic, publish in zip(batch, publishes)
+            ]
+        results = await asyncio.gather(*publishes, return_exceptions=True)
+        for (topic, payload), result in zip(batch.items(), results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                self.in_flight.pop(topic, None)
+                _LOGGER.error("Failed to publish %s to %s: %s", payload, topic, result)
+                if tracker is not None:
+                    tracker.async_failed(_command_key(topic))
+            else:
+                self.published += 1
+        # Latency from the first queued command to the end of the flush
+        latency = time.monotonic() - first_enqueued
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        _LOGGER.debug("Flushed %d command(s) in %.3fs", len(batch), latency)
+
+
+def _command_key(topic: str) -> str:
+    """Return the key of a ``<prefix>/<serial>/<key>/set`` topic."""
+    return topic.rsplit("/", 2)[-2]
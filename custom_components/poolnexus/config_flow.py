@@ -14,15 +14,29 @@ from homeassistant.helpers import config_validation as cv
 from homeassistant.components.mqtt import async_subscribe
 
 from .const import (
+    CONF_DETECT_STATE_VARIANT,
+    CONF_HUB_MODE,
     CONF_MQTT_BROKER,
     CONF_MQTT_PASSWORD,
     CONF_MQTT_PORT,
     CONF_MQTT_TOPIC_PREFIX,
+    CONF_LOOP_BUDGET,
     CONF_MQTT_USERNAME,
+    CONF_PROFILING,
+    CONF_REVERT_ON_TIMEOUT,
+    CONF_SCAN_TIMEOUT,
     CONF_SERIAL,
+    DEFAULT_DETECT_STATE_VARIANT,
+    DEFAULT_LOOP_BUDGET,
     DEFAULT_MQTT_PORT,
     DEFAULT_MQTT_TOPIC_PREFIX,
+    DEFAULT_PROFILING,
+    DEFAULT_REVERT_ON_TIMEOUT,
+    DEFAULT_SCAN_TIMEOUT,
     DOMAIN,
+    SCAN_FIRST_MESSAGE_TIMEOUT,
+    SCAN_PRESENCE_KEYS,
+    SCAN_QUIET_PERIOD,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -36,16 +50,50 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_MQTT_PASSWORD): str,
         vol.Optional(CONF_MQTT_TOPIC_PREFIX, default=DEFAULT_MQTT_TOPIC_PREFIX): str,
         vol.Optional("scan_devices", default=False): bool,
+        vol.Optional(CONF_SCAN_TIMEOUT, default=DEFAULT_SCAN_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=0.5, max=60)
+        ),
+        vol.Optional(CONF_HUB_MODE, default=False): bool,
         vol.Optional(CONF_SERIAL): str,
     }
 )
 
 
+def _options_schema(current: dict[str, Any]) -> vol.Schema:
+    """Return the options form, defaulting to the entry's current values."""
+    return vol.Schema(
+        {
+            vol.Optional(
+                CONF_DETECT_STATE_VARIANT,
+                default=current.get(CONF_DETECT_STATE_VARIANT, DEFAULT_DETECT_STATE_VARIANT),
+            ): bool,
+            vol.Optional(
+                CONF_REVERT_ON_TIMEOUT,
+                default=current.get(CONF_REVERT_ON_TIMEOUT, DEFAULT_REVERT_ON_TIMEOUT),
+            ): bool,
+            vol.Optional(
+                CONF_PROFILING, default=current.get(CONF_PROFILING, DEFAULT_PROFILING)
+            ): bool,
+            vol.Optional(
+                CONF_LOOP_BUDGET, default=current.get(CONF_LOOP_BUDGET, DEFAULT_LOOP_BUDGET)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=1000)),
+        }
+    )
+
+
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for PoolNexus."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Return the options flow of an entry."""
+        return OptionsFlowHandler(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -57,9 +105,23 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         self._temp_user_input = user_input
 
+        if user_input.get(CONF_HUB_MODE):
+            # Hub mode: a single entry serves every serial published under the
+            # prefix, devices are created as they show up on the broker.
+            prefix = user_input.get(CONF_MQTT_TOPIC_PREFIX, DEFAULT_MQTT_TOPIC_PREFIX)
+            await self.async_set_unique_id(f"hub_{prefix}")
+            self._abort_if_unique_id_configured()
+            data = dict(user_input)
+            data.pop(CONF_SERIAL, None)
+            return self.async_create_entry(title=f"PoolNexus Hub ({prefix})", data=data)
+
         if user_input.get("scan_devices"):
             prefix = user_input.get(CONF_MQTT_TOPIC_PREFIX, DEFAULT_MQTT_TOPIC_PREFIX)
-            found = await self._scan_for_serials(self.hass, prefix)
+            found = await self._scan_for_serials(
+                self.hass,
+                prefix,
+                user_input.get(CONF_SCAN_TIMEOUT, DEFAULT_SCAN_TIMEOUT),
+            )
             if not found:
                 # No devices detected — fall back to creating the entry
                 # with the provided data (user can manually enter serial).
@@ -69,10 +131,15 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     self._abort_if_unique_id_configured()
                 return self.async_create_entry(title="PoolNexus", data=user_input)
 
-            # Show a form to let the user pick one of the discovered serials
+            # Show a form to let the user pick one of the discovered serials,
+            # labelled with the metadata seen during the scan
+            options = {
+                serial: _serial_label(serial, metadata)
+                for serial, metadata in found.items()
+            }
             return self.async_show_form(
                 step_id="select_serial",
-                data_schema=vol.Schema({vol.Required(CONF_SERIAL): vol.In(found)}),
+                data_schema=vol.Schema({vol.Required(CONF_SERIAL): vol.In(options)}),
             )
 
         # No scan requested — require a serial to be provided. The integration
@@ -126,41 +193,93 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return self.async_create_entry(title="PoolNexus", data=data)
 
-    async def _scan_for_serials(self, hass: HomeAssistant, prefix: str, timeout: float = 2.0) -> list[str]:
-        """Subscribe briefly to MQTT under `prefix/#` and collect serial segments.
+    async def _scan_for_serials(
+        self, hass: HomeAssistant, prefix: str, timeout: float = DEFAULT_SCAN_TIMEOUT
+    ) -> dict[str, dict[str, str]]:
+        """Collect the serials publishing presence topics under `prefix`.
 
-        We assume the device publishes topics like <prefix>/<serial>/...; this
-        function returns the set of first path segments after the prefix that
-        were observed (keeps order deterministic by sorting).
+        Only `<prefix>/+/availability` and `<prefix>/+/firmware` are
+        subscribed, so the broker sends one or two retained messages per
+        device instead of its whole retained state. The scan stops as soon as
+        the retained burst quiesces, or after `timeout` seconds on a broker
+        that keeps publishing. Returns serial -> {key: payload}, sorted by
+        serial.
         """
-        found: set[str] = set()
-
-        topic = f"{prefix}/#"
+        found: dict[str, dict[str, str]] = {}
+        activity = asyncio.Event()
+        offset = len(prefix) + 1
 
         @callback
         def _message(msg):
-            try:
-                t = msg.topic
-                # strip prefix + '/'
-                if not t.startswith(f"{prefix}/"):
-                    return
-                rem = t[len(prefix) + 1 :]
-                parts = rem.split("/")
-                if parts:
-                    found.add(parts[0])
-            except Exception:
+            serial, _, key = msg.topic[offset:].partition("/")
+            if not serial or key not in SCAN_PRESENCE_KEYS:
                 return
+            found.setdefault(serial, {})[key] = str(msg.payload).strip()
+            activity.set()
 
-        # Subscribe and wait for a short period to receive retained messages.
-        unsub = await async_subscribe(hass, topic, _message)
+        unsubs = []
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout
         try:
-            await asyncio.sleep(timeout)
+            for key in SCAN_PRESENCE_KEYS:
+                unsubs.append(await async_subscribe(hass, f"{prefix}/+/{key}", _message))
+            # Wait for the first retained message, then for a quiet period
+            # after each burst of messages
+            wait = SCAN_FIRST_MESSAGE_TIMEOUT
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    await asyncio.wait_for(activity.wait(), min(wait, remaining))
+                except asyncio.TimeoutError:
+                    break
+                activity.clear()
+                wait = SCAN_QUIET_PERIOD
         finally:
-            try:
-                unsub()
-            except Exception:
-                # some mqtt helpers return coroutines or cleanup differently;
-                # ignore unsubscription errors.
-                pass
-
-        return sorted(found)
+            for unsub in unsubs:
+                try:
+                    unsub()
+                except Exception:
+                    # some mqtt helpers return coroutines or cleanup differently;
+                    # ignore unsubscription errors.
+                    pass
+
+        _LOGGER.debug(
+            "Scan of %s found %d device(s) in %.2fs",
+            prefix,
+            len(found),
+            loop.time() - started,
+        )
+        return dict(sorted(found.items()))
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of a PoolNexus entry.
+
+    The entry is reloaded when its options change (see __init__.py).
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+        # Entries created before the options flow hold them in their data
+        current = {**self._entry.data, **self._entry.options}
+        return self.async_show_form(step_id="init", data_schema=_options_schema(current))
+
+
+def _serial_label(serial: str, metadata: dict[str, str]) -> str:
+    """Return the label of a discovered serial in the selection form."""
+    details = []
+    if firmware := metadata.get("firmware"):
+        details.append(f"firmware {firmware}")
+    if availability := metadata.get("availability"):
+        details.append(availability)
+    if not details:
+        return serial
+    return f"{serial} ({', '.join(details)})"
@@ -2,6 +2,10 @@
 
 DOMAIN = "poolnexus"
 
+# Device registry
+MANUFACTURER = "PoolNexus"
+MODEL = "PoolNexus Device"
+
 # Configuration
 CONF_MQTT_BROKER = "mqtt_broker"
 CONF_MQTT_PORT = "mqtt_port"
@@ -9,6 +13,18 @@ CONF_MQTT_USERNAME = "mqtt_username"
 CONF_MQTT_PASSWORD = "mqtt_password"
 CONF_MQTT_TOPIC_PREFIX = "mqtt_topic_prefix"
 CONF_SERIAL = "serial"
+# Hub mode: a single entry serving every serial under the topic prefix
+CONF_HUB_MODE = "hub_mode"
+# Upper bound in seconds of the device scan in the config flow
+CONF_SCAN_TIMEOUT = "scan_timeout"
+# Learn whether a device publishes <key> or <key>/state and ignore the other
+CONF_DETECT_STATE_VARIANT = "detect_state_variant"
+# Restore the last device-reported state when a command is not acknowledged
+CONF_REVERT_ON_TIMEOUT = "revert_on_timeout"
+# Opt-in timing of the message callbacks and command publishes
+CONF_PROFILING = "profiling"
+# Milliseconds a message callback may block the event loop (profiling)
+CONF_LOOP_BUDGET = "loop_budget"
 
 # Set values configuration
 CONF_SET_PH_VALUE = "set_ph_value"
@@ -19,44 +35,150 @@ CONF_SET_TEMPERATURE_VALUE = "set_temperature_value"
 DEFAULT_MQTT_PORT = 1883
 DEFAULT_MQTT_TOPIC_PREFIX = "poolnexus"
 DEFAULT_SERIAL = None
+DEFAULT_DETECT_STATE_VARIANT = True
+DEFAULT_REVERT_ON_TIMEOUT = False
+DEFAULT_PROFILING = False
+DEFAULT_LOOP_BUDGET = 5.0
+# Seconds commands are held to collapse repeated /set publishes
+DEFAULT_COMMAND_WINDOW = 0.05
+# Seconds a published command waits for its own echo on the /set topic
+COMMAND_ECHO_TIMEOUT = 5.0
+# Seconds a command waits for the device to report the commanded state
+COMMAND_ACK_TIMEOUT = 15.0
+# Upper bounds in seconds of the command acknowledgement latency buckets
+COMMAND_ACK_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds in seconds of the callback and publish duration buckets
+PROFILING_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+# Callbacks over the loop budget kept for the diagnostics
+PROFILING_SLOW_HISTORY = 20
+# Seconds of a cProfile capture of the profile service (default, maximum)
+DEFAULT_PROFILE_DURATION = 60
+MAX_PROFILE_DURATION = 3600
+# PoolNexus functions listed in the profile service response
+PROFILE_TOP_FUNCTIONS = 20
+# Seconds between saves of the last-known state snapshot
+SNAPSHOT_SAVE_DELAY = 60
+
+# Staleness watchdog: seconds without telemetry before a key is stale (the
+# devices publish every cycle, 10 s by default), and the shared timer wheel
+# checking the deadlines of every watched key of every entry
+TELEMETRY_STALE_AFTER = 300
+WATCHDOG_RESOLUTION = 1.0
+WATCHDOG_WHEEL_SLOTS = 512
+
+# Distinct timestamp payloads kept parsed by the decoder
+TIMESTAMP_CACHE_SIZE = 1024
+
+# Rolling statistics: samples kept per window (a 1 h window of a device
+# publishing every 10 s on both topic variants holds 720 samples)
+STATISTICS_WINDOW_CAPACITY = 720
+
+# Derived sensors per statistics window, "slope" is in units per hour
+STATISTIC_TYPES = {
+    "mean": {"name": "moyenne", "enabled_default": True},
+    "min": {"name": "min", "enabled_default": False},
+    "max": {"name": "max", "enabled_default": False},
+    "slope": {"name": "tendance", "enabled_default": True},
+}
+
+# Telemetry history (history.py): bytes of points per device, split evenly
+# between the "history" keys, then between the tiers
+HISTORY_MEMORY_BUDGET = 48 * 1024
+# tier -> (bucket seconds, 0 for raw samples; share of the key's budget)
+HISTORY_TIERS = {
+    "raw": (0, 0.5),
+    "1min": (60, 0.25),
+    "15min": (900, 0.25),
+}
+# Range returned by the history API when no start is given
+DEFAULT_HISTORY_RANGE = 3600
+
+# Availability: the device publishes online/offline on this key; the other
+# entities of the device are unavailable while it is offline
+AVAILABILITY_KEY = "availability"
+PAYLOAD_ONLINE = "online"
+PAYLOAD_OFFLINE = "offline"
+
+# Alerts: fired on every alert transition, recent ones kept per device
+EVENT_ALERT = f"{DOMAIN}_alert"
+ALERT_TYPE_NONE = "none"
+ALERT_HISTORY_SIZE = 20
+
+# Device scan: presence topics subscribed as <prefix>/+/<key>; the scan ends
+# once the retained burst has been quiet for SCAN_QUIET_PERIOD seconds (or
+# when nothing arrived within SCAN_FIRST_MESSAGE_TIMEOUT), at the latest
+# after the configured timeout.
+SCAN_PRESENCE_KEYS = ("availability", "firmware")
+DEFAULT_SCAN_TIMEOUT = 5.0
+SCAN_FIRST_MESSAGE_TIMEOUT = 1.0
+SCAN_QUIET_PERIOD = 0.3
 
 # Sensor types
+#
+# Optional write policy keys (any platform's *_TYPES entry may use the second):
+# - "deadband": numeric changes smaller than this are not written to the
+#   state machine (the last written value is the reference);
+# - "min_write_interval": seconds between two state writes, bursts in
+#   between are coalesced into one trailing write of the latest value.
+# Numeric sensors may also declare "statistics_windows": durations in seconds
+# of the rolling windows feeding the derived mean/min/max/slope sensors.
+# "history": True keeps the short-term telemetry history of the key.
+# "stale_after": seconds without a message after which the key's entity is
+# unavailable, until the device publishes it again (see watchdog.py).
 SENSOR_TYPES = {
     "temperature": {
         "name": "Temperature",
         "unit_of_measurement": "°C",
         "device_class": "temperature",
         "state_class": "measurement",
+        "deadband": 0.1,
+        "min_write_interval": None,
+        "statistics_windows": (3600,),
+        "history": True,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     "ph": {
         "name": "pH",
         "unit_of_measurement": "pH",
         "device_class": None,
         "state_class": "measurement",
+        "deadband": None,
+        "min_write_interval": None,
+        "statistics_windows": (3600,),
+        "history": True,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     "chlorine": {
         "name": "Chlore",
         "unit_of_measurement": "mV",
         "device_class": None,
         "state_class": "measurement",
+        "deadband": None,
+        "min_write_interval": None,
+        "statistics_windows": (3600,),
+        "history": True,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     "water_level": {
         "name": "Niveau d'eau",
         "unit_of_measurement": None,
         "device_class": None,
         "state_class": None,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     "chlorine_level": {
         "name": "Niveau de chlore",
         "unit_of_measurement": None,
         "device_class": None,
         "state_class": None,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     "ph_level": {
         "name": "Niveau de pH",
         "unit_of_measurement": None,
         "device_class": None,
         "state_class": None,
+        "stale_after": TELEMETRY_STALE_AFTER,
     },
     # Informational / text sensors
     "firmware": {
@@ -68,14 +190,18 @@ SENSOR_TYPES = {
     "last_pH_prob_cal": {
         "name": "Dernière calibration pH",
         "unit_of_measurement": None,
-        "device_class": None,
+        "device_class": "timestamp",
         "state_class": None,
+        # DD/MM/YY HH:MM device time, decoded to an aware datetime
+        "value_type": "timestamp",
     },
     "last_ORP_prob_cal": {
         "name": "Dernière calibration ORP",
         "unit_of_measurement": None,
-        "device_class": None,
+        "device_class": "timestamp",
         "state_class": None,
+        # DD/MM/YY HH:MM device time, decoded to an aware datetime
+        "value_type": "timestamp",
     },
     "availability": {
         "name": "Disponibilité",
@@ -88,12 +214,16 @@ SENSOR_TYPES = {
         "unit_of_measurement": None,
         "device_class": None,
         "state_class": None,
+        # JSON decoded once; the state is the alert type, see alerts.py
+        "value_type": "json",
     },
     "last_pump_cleaning": {
         "name": "Dernier nettoyage pompe",
         "unit_of_measurement": None,
-        "device_class": None,
+        "device_class": "timestamp",
         "state_class": None,
+        # DD/MM/YY HH:MM device time, decoded to an aware datetime
+        "value_type": "timestamp",
     },
     # `operating_mode` is implemented as a selectable entity (see SELECT_TYPES)
     # `screen_lock` is now implemented as a switch (moved to SWITCH_TYPES)
@@ -161,3 +291,80 @@ TEXT_TYPES = {
     },
 }
 
+
+# Diagnostic sensors reading the runtime counters of each device (metrics.py).
+# They are polled, so the counters cost nothing in the state machine between
+# two polls; "enabled_default" False leaves them disabled until enabled in the
+# entity registry.
+METRIC_SENSOR_TYPES = {
+    "messages": {
+        "name": "Messages reçus",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": True,
+    },
+    "message_rate": {
+        "name": "Débit de messages",
+        "unit_of_measurement": "msg/min",
+        "device_class": None,
+        "state_class": "measurement",
+        "enabled_default": True,
+    },
+    "bytes": {
+        "name": "Octets reçus",
+        "unit_of_measurement": "B",
+        "device_class": "data_size",
+        "state_class": "total_increasing",
+        "enabled_default": False,
+    },
+    "parse_failures": {
+        "name": "Erreurs de décodage",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": True,
+    },
+    "state_writes": {
+        "name": "Écritures d'état",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": False,
+    },
+    "suppressed_writes": {
+        "name": "Écritures évitées",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": False,
+    },
+    "commands_published": {
+        "name": "Commandes publiées",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": False,
+    },
+    "command_latency": {
+        "name": "Latence des commandes",
+        "unit_of_measurement": "ms",
+        "device_class": "duration",
+        "state_class": "measurement",
+        "enabled_default": False,
+    },
+    "command_ack_latency": {
+        "name": "Latence d'acquittement des commandes",
+        "unit_of_measurement": "ms",
+        "device_class": "duration",
+        "state_class": "measurement",
+        "enabled_default": False,
+    },
+    "command_timeouts": {
+        "name": "Commandes sans acquittement",
+        "unit_of_measurement": None,
+        "device_class": None,
+        "state_class": "total_increasing",
+        "enabled_default": False,
+    },
+}
@@ -0,0 +1,167 @@
+"""Payload decoders for the PoolNexus integration.
+
+The decoder table is compiled once at import from SENSOR_TYPES, SWITCH_TYPES,
+TEXT_TYPES and SELECT_TYPES: every key maps to one specialized function
+taking the raw `msg.payload` bytes. Decoders never raise for malformed
+payloads on the hot path; they return `INVALID` instead, so the message
+handlers are a dict lookup plus one parse.
+
+Value types:
+- "float": numeric measurement (default for sensors with a `state_class`)
+- "text": stripped UTF-8 string (default for the other sensors and texts)
+- "enum": one of the entry `options` (selects)
+- "bool": ON/OFF style switch state (switches)
+- "timestamp": `DD/MM/YY HH:MM` device time
+- "json": JSON document
+"""
+from __future__ import annotations
+
+from calendar import monthrange
+from collections.abc import Callable, Iterable
+from datetime import datetime, tzinfo
+from functools import lru_cache
+import json
+import re
+from typing import Any, Final
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    SELECT_TYPES,
+    SENSOR_TYPES,
+    SWITCH_TYPES,
+    TEXT_TYPES,
+    TIMESTAMP_CACHE_SIZE,
+)
+
+Decoder = Callable[[bytes], Any]
+
+# Returned instead of raising when a payload does not match its value type
+INVALID: Final = object()
+
+_FLOAT_RE = re.compile(rb"\s*[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?\s*")
+_TIMESTAMP_RE = re.compile(rb"\s*(\d{2})/(\d{2})/(\d{2}) (\d{2}):(\d{2})\s*")
+
+# Accepts: ON/OFF, true/false, 1/0, locked/unlocked (any case)
+_BOOL_VALUES: dict[bytes, bool] = {
+    b"on": True,
+    b"true": True,
+    b"1": True,
+    b"locked": True,
+    b"off": False,
+    b"false": False,
+    b"0": False,
+    b"unlocked": False,
+}
+
+# Setpoint formats accepted by the device (stricter than the UI patterns)
+TEXT_FORMATS: dict[str, re.Pattern[str]] = {
+    # Format: XX.X (ex: 07.2)
+    "set_ph": re.compile(r"\d{2}\.\d"),
+    # Format: X.XXX (ex: 6.500)
+    "set_redox": re.compile(r"\d\.\d{3}"),
+    # Format: XX.X (ex: 25.0)
+    "set_temperature": re.compile(r"\d{2}\.\d"),
+}
+
+
+def decode_text(payload: bytes) -> str:
+    """Decode a payload as a stripped string."""
+    return payload.decode("utf-8", "replace").strip()
+
+
+def decode_float(payload: bytes) -> float | object:
+    """Decode a numeric payload, INVALID if it is not a number."""
+    if _FLOAT_RE.fullmatch(payload) is None:
+        return INVALID
+    return float(payload)
+
+
+def decode_bool(payload: bytes) -> bool:
+    """Decode a switch state; unknown payloads are treated as off."""
+    value = _BOOL_VALUES.get(payload.strip().lower())
+    if value is not None:
+        return value
+    # numeric payloads: anything but zero is on
+    if _FLOAT_RE.fullmatch(payload) is not None:
+        return float(payload) != 0
+    return False
+
+
+def decode_timestamp(payload: bytes) -> datetime | object:
+    """Decode a `DD/MM/YY HH:MM` device time in the local time zone.
+
+    Devices republish the same time every cycle, so results are memoized
+    per payload (and time zone, which can change at runtime).
+    """
+    return _parse_timestamp(payload, dt_util.DEFAULT_TIME_ZONE)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_timestamp(payload: bytes, tz: tzinfo) -> datetime | object:
+    match = _TIMESTAMP_RE.fullmatch(payload)
+    if match is None:
+        return INVALID
+    day, month, year, hour, minute = map(int, match.groups())
+    year += 2000
+    if not (
+        1 <= month <= 12
+        and 1 <= day <= monthrange(year, month)[1]
+        and hour < 24
+        and minute < 60
+    ):
+        return INVALID
+    return datetime(year, month, day, hour, minute, tzinfo=tz)
+
+
+def decode_json(payload: bytes) -> Any:
+    """Decode a JSON object or array payload."""
+    if payload.lstrip()[:1] not in (b"{", b"["):
+        return INVALID
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return INVALID
+
+
+def _enum_decoder(options: Iterable[str]) -> Decoder:
+    """Build a decoder accepting only ``options``."""
+    lookup = {option.encode(): option for option in options}
+
+    def decode_enum(payload: bytes) -> str | object:
+        return lookup.get(payload.strip(), INVALID)
+
+    return decode_enum
+
+
+_DECODERS_BY_TYPE: dict[str, Decoder] = {
+    "float": decode_float,
+    "text": decode_text,
+    "bool": decode_bool,
+    "timestamp": decode_timestamp,
+    "json": decode_json,
+}
+
+
+def _build_table() -> dict[str, Decoder]:
+    table: dict[str, Decoder] = {}
+    for key, cfg in SENSOR_TYPES.items():
+        default = "float" if cfg.get("state_class") else "text"
+        table[key] = _DECODERS_BY_TYPE[cfg.get("value_type", default)]
+    for key in SWITCH_TYPES:
+        table[key] = decode_bool
+    for key in TEXT_TYPES:
+        table[key] = decode_text
+    for key, cfg in SELECT_TYPES.items():
+        table[key] = _enum_decoder(cfg.get("options", []))
+    return table
+
+
+# key -> decoder, compiled once at import
+DECODERS: Final[dict[str, Decoder]] = _build_table()
+
+
+def validate_text(text_type: str, value: str) -> bool:
+    """Return True if ``value`` matches the device format for ``text_type``."""
+    pattern = TEXT_FORMATS.get(text_type)
+    return pattern is None or pattern.fullmatch(value) is not None
@@ -0,0 +1,127 @@
+"""Per-device runtime state of the PoolNexus integration.
+
+The hub keeps one `PoolNexusDevice` per serial (reachable from
+``hass.data[DOMAIN][entry_id].devices``). It is built once when the device is
+configured or discovered and holds everything its entities share: the device
+identifiers and `DeviceInfo`, its topics, the dispatch tables and the
+per-device services (command queue and acknowledgements, metrics, alerts,
+statistics, history).
+Entities keep a reference to it instead of copies of their own.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from typing import TYPE_CHECKING
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+
+from .acks import CommandTracker
+from .alerts import AlertTracker
+from .commands import CommandQueue
+from .const import DOMAIN, MANUFACTURER, MODEL
+from .history import DeviceHistory
+from .metrics import DeviceMetrics
+from .rolling import DeviceStatistics
+from .topics import TopicPlan
+from .watchdog import KeyWatch
+
+if TYPE_CHECKING:
+    from .entity import PoolNexusEntity
+    from .profiling import CallbackProfiler
+
+MessageHandler = Callable[[ReceiveMessage], None]
+
+
+class PoolNexusDevice:
+    """Shared runtime state of one device (serial)."""
+
+    __slots__ = (
+        "serial",
+        "device_id",
+        "name",
+        "topic",
+        "command_topics",
+        "device_info",
+        "handlers",
+        "last_messages",
+        "pending_variants",
+        "state_variants",
+        "ignored_tails",
+        "commands",
+        "acks",
+        "metrics",
+        "alerts",
+        "statistics",
+        "history",
+        "available",
+        "replaying",
+        "restoring",
+        "entities",
+        "deferred",
+        "watches",
+        "stale_keys",
+    )
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        serial: str,
+        device_id: str,
+        name: str,
+        plan: TopicPlan,
+        revert_on_timeout: bool = False,
+        profiler: CallbackProfiler | None = None,
+    ) -> None:
+        """Initialize the device state."""
+        self.serial = serial
+        # Identifier of the device and prefix of its entities' unique ids
+        self.device_id = device_id
+        # Device name, prefixing entity names
+        self.name = name
+        # <prefix>/<serial> base topic
+        self.topic = plan.device_topic(serial)
+        # key -> <prefix>/<serial>/<key>/set, built once for the device
+        self.command_topics: Mapping[str, str] = plan.command_topics(serial)
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)},
+            name=name,
+            manufacturer=MANUFACTURER,
+            model=MODEL,
+            serial_number=serial,
+        )
+        # topic tail -> entity handler
+        self.handlers: dict[str, MessageHandler] = {}
+        # topic tail -> last message, replayed to handlers registering late
+        # (retained messages usually arrive before the entities are added)
+        self.last_messages: dict[str, ReceiveMessage] = {}
+        # tail -> other variant of its key, until one of them is received
+        self.pending_variants: dict[str, str] = dict(plan.state_variants)
+        # key -> variant (<key> or <key>/state) the device publishes
+        self.state_variants: dict[str, str] = {}
+        # Variants not used by the device, no longer dispatched
+        self.ignored_tails: set[str] = set()
+        self.acks = CommandTracker(hass, revert_on_timeout=revert_on_timeout)
+        self.commands = CommandQueue(hass, profiler=profiler, tracker=self.acks)
+        self.metrics = DeviceMetrics(self.commands, self.acks)
+        self.alerts = AlertTracker(hass, serial)
+        self.statistics = DeviceStatistics()
+        self.history = DeviceHistory()
+        # False while the device reports itself offline
+        self.available = True
+        # True while the hub dispatches a replayed, restored or deferred
+        # message instead of a live one
+        self.replaying = False
+        # True while the replayed message holds a payload restored from the
+        # snapshot, not yet received from the broker
+        self.restoring = False
+        # key -> entity following the device availability (while added)
+        self.entities: dict[str, PoolNexusEntity] = {}
+        # topic tail -> latest message received while offline, dispatched
+        # when the device comes back online
+        self.deferred: dict[str, ReceiveMessage] = {}
+        # topic tail -> staleness watch of its key (both variants share it)
+        self.watches: dict[str, KeyWatch] = {}
+        # Watched keys silent for longer than their interval
+        self.stale_keys: set[str] = set()
@@ -0,0 +1,25 @@
+"""Diagnostics support for the PoolNexus integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_MQTT_PASSWORD, CONF_MQTT_USERNAME, DOMAIN
+from .hub import PoolNexusHub
+
+TO_REDACT = {CONF_MQTT_PASSWORD, CONF_MQTT_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the entry configuration and the runtime counters of its devices."""
+    hub: PoolNexusHub | None = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": dict(entry.options),
+        "hub": hub.diagnostics() if hub is not None else None,
+    }
@@ -0,0 +1,230 @@
+"""Base entity for the PoolNexus integration."""
+from __future__ import annotations
+
+from abc import abstractmethod
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .acks import NO_STATE
+from .device import PoolNexusDevice
+from .metrics import DeviceMetrics
+
+if TYPE_CHECKING:
+    from .hub import PoolNexusHub
+
+_LOGGER = logging.getLogger(__name__)
+
+# Marker for "nothing written to the state machine yet"
+_UNSET: Any = object()
+
+
+class PoolNexusEntity(Entity):
+    """Common state write handling for PoolNexus entities.
+
+    Entities only keep their key and a reference to the shared
+    `PoolNexusDevice` (device info, topics, counters); names and unique ids
+    are the only per-entity strings. The handler is registered on the hub
+    for the key's topic tails from the entry's topic plan while the entity
+    is added.
+
+    Devices republish every key each cycle, so handlers pass decoded values
+    to `_async_write_value` which only writes the state when it changed:
+    - values equal to the last written one are dropped;
+    - numeric values within `_deadband` of the last written one are dropped;
+    - with `_min_write_interval`, writes closer than the interval are
+      coalesced into a single trailing write of the latest value.
+    Dropped and coalesced writes are counted in `suppressed_writes`, and
+    mirrored in the device's `DeviceMetrics`.
+    A value restored from the hub's snapshot carries a ``restored`` state
+    attribute, and the next value is written even when equal to it.
+
+    Entities sending commands show the commanded value through
+    `_async_command_sent` and pass the values reported by the device to
+    `_async_state_reported`, which acknowledge the pending command in the
+    device's `CommandTracker`.
+
+    With the profiling option the handler is timed by the hub's
+    `CallbackProfiler` (see profiling.py).
+
+    Entities are unavailable while the device reports itself offline on its
+    ``availability`` topic, or while their key is stale (see watchdog.py);
+    the hub writes them when that changes.
+    """
+
+    # False for entities staying available while the device is offline
+    _follows_availability = True
+    # Per-entity write policy, set from the *_TYPES config in the platforms
+    _deadband: float | None = None
+    _min_write_interval: float | None = None
+
+    def __init__(
+        self, hub: PoolNexusHub, device: PoolNexusDevice, key: str, name: str
+    ) -> None:
+        """Initialize the shared attributes and the write bookkeeping."""
+        self._hub = hub
+        self._device = device
+        self._key = key
+        self._metrics: DeviceMetrics = device.metrics
+        self._unsub: CALLBACK_TYPE | None = None
+        self._attr_name = f"{device.name} {name}"
+        self._attr_unique_id = f"{device.device_id}_{key}"
+        self._attr_device_info = device.device_info
+        self._written_value: Any = _UNSET
+        self._latest_value: Any = _UNSET
+        # Last value reported by the device, reverted to if a command times out
+        self._reported_value: Any = NO_STATE
+        self._last_write: float = 0.0
+        # True while the written value was restored from the snapshot
+        self._restored = False
+        self._cancel_trailing_write: CALLBACK_TYPE | None = None
+        self.state_writes = 0
+        self.suppressed_writes = 0
+
+    async def async_added_to_hass(self) -> None:
+        """Register the message handler on the hub.
+
+        Retained messages already received are replayed by the hub as soon
+        as the handler is registered.
+        """
+        if self._follows_availability:
+            self._device.entities[self._key] = self
+        handler = self._message_received
+        profiler = self._hub.profiler
+        if profiler is not None:
+            handler = profiler.wrap(self._device.serial, self._key, handler)
+        self._unsub = self._hub.async_register(
+            self._device.serial, self._hub.plan.keys[self._key].tails, handler
+        )
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Unregister the message handler on removal."""
+        self._async_cancel_trailing_write()
+        if self._device.entities.get(self._key) is self:
+            del self._device.entities[self._key]
+        if self._unsub is not None:
+            try:
+                self._unsub()
+            except Exception:
+                _LOGGER.debug("Unsubscribe failed for %s", self.entity_id)
+            self._unsub = None
+
+    @property
+    def available(self) -> bool:
+        """Return False while the device is offline or the key is stale."""
+        device = self._device
+        if not self._follows_availability:
+            return True
+        return device.available and self._key not in device.stale_keys
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the platform attributes, flagging a restored value."""
+        attributes = super().extra_state_attributes
+        if not self._restored:
+            return attributes
+        return {**(attributes or {}), "restored": True}
+
+    @abstractmethod
+    @callback
+    def _message_received(self, msg: ReceiveMessage) -> None:
+        """Handle a message published on one of the key's topics."""
+
+    @abstractmethod
+    def _apply_value(self, value: Any) -> None:
+        """Store ``value`` in the platform specific state attribute."""
+
+    @callback
+    def _async_command_sent(self, value: Any) -> None:
+        """Show a commanded value right away, pending its acknowledgement."""
+        self._device.acks.async_command(
+            self._key, value, self._reported_value, self._async_write_value
+        )
+        self._async_write_value(value)
+
+    @callback
+    def _async_state_reported(self, value: Any) -> None:
+        """Apply a value reported by the device, acknowledging a command."""
+        self._reported_value = value
+        self._device.acks.async_reported(self._key, value)
+        self._async_write_value(value)
+
+    def _is_unchanged(self, value: Any) -> bool:
+        """Return True if writing ``value`` would not change the state."""
+        written = self._written_value
+        if written is _UNSET or self._restored:
+            return False
+        if value == written:
+            return True
+        deadband = self._deadband
+        return (
+            deadband is not None
+            and isinstance(value, float)
+            and isinstance(written, float)
+            and abs(value - written) < deadband
+        )
+
+    @callback
+    def _async_write_value(self, value: Any) -> None:
+        """Apply a value received from the device and write it if it changed."""
+        self._latest_value = value
+        self._apply_value(value)
+        if self._is_unchanged(value):
+            self._count_suppressed_write()
+            return
+        interval = self._min_write_interval
+        if interval:
+            delay = self._last_write + interval - time.monotonic()
+            if delay > 0:
+                # Coalesce the burst into one write of the latest value
+                self._count_suppressed_write()
+                if self._cancel_trailing_write is None:
+                    self._cancel_trailing_write = async_call_later(
+                        self.hass, delay, self._async_trailing_write
+                    )
+                return
+        self._async_write_now(value)
+
+    @callback
+    def _async_trailing_write(self, _now: Any) -> None:
+        """Write the latest value at the end of a coalescing window."""
+        self._cancel_trailing_write = None
+        value = self._latest_value
+        if self._is_unchanged(value):
+            return
+        self._async_write_now(value)
+
+    @callback
+    def _async_write_now(self, value: Any) -> None:
+        self._written_value = value
+        self._last_write = time.monotonic()
+        self._restored = self._device.restoring
+        self.state_writes += 1
+        metrics = self._metrics
+        metrics.state_writes += 1
+        if metrics.dispatching is not None:
+            metrics.dispatching.state_writes += 1
+        self.async_write_ha_state()
+
+    def _count_suppressed_write(self) -> None:
+        self.suppressed_writes += 1
+        self._metrics.suppressed_writes += 1
+
+    def _count_parse_failure(self) -> None:
+        """Count a payload that could not be decoded."""
+        metrics = self._metrics
+        metrics.parse_failures += 1
+        if metrics.dispatching is not None:
+            metrics.dispatching.parse_failures += 1
+
+    @callback
+    def _async_cancel_trailing_write(self) -> None:
+        """Cancel a pending trailing write (on removal)."""
+        if self._cancel_trailing_write is not None:
+            self._cancel_trailing_write()
+            self._cancel_trailing_write = None
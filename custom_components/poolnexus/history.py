@@ -0,0 +1,209 @@
+"""Short-term telemetry history for the PoolNexus integration.
+
+Keys declaring ``history`` in SENSOR_TYPES are kept per device in three
+tiers of fixed-size rings: raw samples, 1-minute means and 15-minute means.
+Each ring is a pair of `array('d')` (epoch seconds, value), 16 bytes per
+point, sized once from `HISTORY_MEMORY_BUDGET` so a device never holds more
+than its budget. Dashboards and dosing logic read a time range in one call
+through the `poolnexus.get_history` service or the `poolnexus/history`
+websocket command (see api.py), without querying the recorder.
+
+Sample times come from the monotonic clock, shifted to epoch seconds by an
+offset taken when the device history is created: a wall clock stepping
+backwards (NTP, DST bugs, manual changes) never breaks the time order the
+rings are searched in, at the cost of drifting from the wall clock by the
+adjustments made since the start.
+"""
+from __future__ import annotations
+
+from array import array
+import time
+
+from .const import HISTORY_MEMORY_BUDGET, HISTORY_TIERS, SENSOR_TYPES
+
+# Bytes per stored point: one double for the time, one for the value
+POINT_SIZE = 16
+
+Point = tuple[float, float]
+
+
+class HistoryRing:
+    """Fixed-size ring of (time, value) points in increasing time order."""
+
+    __slots__ = ("capacity", "_times", "_values", "_next", "_count")
+
+    def __init__(self, capacity: int) -> None:
+        """Allocate the ring."""
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of points held."""
+        return self._count
+
+    @property
+    def oldest(self) -> float | None:
+        """Return the time of the oldest point."""
+        if not self._count:
+            return None
+        return self._times[(self._next - self._count) % self.capacity]
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Add a point, overwriting the oldest one when full."""
+        pos = self._next % self.capacity
+        self._times[pos] = timestamp
+        self._values[pos] = value
+        self._next += 1
+        if self._count < self.capacity:
+            self._count += 1
+
+    def _time_at(self, i: int) -> float:
+        return self._times[(self._next - self._count + i) % self.capacity]
+
+    def _bisect(self, timestamp: float) -> int:
+        """Return the logical index of the first point at or after ``timestamp``."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start: float, end: float) -> list[Point]:
+        """Return the points with ``start <= time <= end``."""
+        first = self._next - self._count
+        capacity = self.capacity
+        times = self._times
+        values = self._values
+        points = []
+        for i in range(self._bisect(start), self._count):
+            pos = (first + i) % capacity
+            timestamp = times[pos]
+            if timestamp > end:
+                break
+            points.append((timestamp, values[pos]))
+        return points
+
+
+class _Downsampler:
+    """Mean of the samples in the current bucket of an aggregated tier."""
+
+    __slots__ = ("interval", "ring", "bucket", "total", "count")
+
+    def __init__(self, interval: float, ring: HistoryRing) -> None:
+        self.interval = interval
+        self.ring = ring
+        self.bucket = 0.0
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = timestamp - timestamp % self.interval
+        if bucket != self.bucket:
+            if self.count:
+                self.ring.append(self.bucket, self.total / self.count)
+            self.bucket = bucket
+            self.total = 0.0
+            self.count = 0
+        self.total += value
+        self.count += 1
+
+    def pending(self) -> Point | None:
+        """Return the mean of the bucket not flushed yet."""
+        if not self.count:
+            return None
+        return self.bucket, self.total / self.count
+
+
+class KeyHistory:
+    """Raw and downsampled tiers of one key of a device."""
+
+    __slots__ = ("tiers", "_downsamplers", "_last")
+
+    def __init__(self, budget: int) -> None:
+        """Split ``budget`` bytes between the tiers."""
+        self.tiers: dict[str, HistoryRing] = {}
+        self._downsamplers: dict[str, _Downsampler] = {}
+        for name, (interval, share) in HISTORY_TIERS.items():
+            ring = HistoryRing(max(1, int(budget * share) // POINT_SIZE))
+            self.tiers[name] = ring
+            if interval:
+                self._downsamplers[name] = _Downsampler(interval, ring)
+        self._last = float("-inf")
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Record a sample in every tier.
+
+        A timestamp older than the previous sample is moved to the time of
+        that sample, keeping every tier in increasing time order.
+        """
+        if timestamp < self._last:
+            timestamp = self._last
+        self._last = timestamp
+        self.tiers["raw"].append(timestamp, value)
+        for downsampler in self._downsamplers.values():
+            downsampler.add(timestamp, value)
+
+    def select_tier(self, start: float) -> str:
+        """Return the finest tier covering ``start``.
+
+        A tier covers it when its oldest point is older, or when it never
+        wrapped (it still holds every sample received).
+        """
+        for name, ring in self.tiers.items():
+            oldest = ring.oldest
+            if oldest is not None and (oldest <= start or len(ring) < ring.capacity):
+                return name
+        if not len(self.tiers["raw"]):
+            return "raw"
+        # Nothing reaches back that far: the coarsest tier goes furthest
+        return next(reversed(self.tiers))
+
+    def query(self, start: float, end: float, tier: str | None = None) -> tuple[str, list[Point]]:
+        """Return the tier used and its points between ``start`` and ``end``."""
+        if tier is None:
+            tier = self.select_tier(start)
+        points = self.tiers[tier].range(start, end)
+        downsampler = self._downsamplers.get(tier)
+        if downsampler is not None:
+            # Include the bucket in progress
+            pending = downsampler.pending()
+            if pending is not None and start <= pending[0] <= end:
+                points.append(pending)
+        return tier, points
+
+
+class DeviceHistory:
+    """History of every history key of one device, within the memory budget."""
+
+    def __init__(self, budget: int = HISTORY_MEMORY_BUDGET) -> None:
+        """Allocate the tiers, sharing ``budget`` bytes evenly between keys."""
+        keys = [key for key, cfg in SENSOR_TYPES.items() if cfg.get("history")]
+        self.keys: dict[str, KeyHistory] = {
+            key: KeyHistory(budget // max(1, len(keys))) for key in keys
+        }
+        # Epoch seconds at monotonic time 0
+        self._epoch_offset = time.time() - time.monotonic()
+
+    def add(self, key: str, value: float, timestamp: float | None = None) -> None:
+        """Record a sample of ``key`` taken at ``timestamp`` (epoch seconds).
+
+        Without ``timestamp`` the sample is taken now, on the monotonic clock.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic() + self._epoch_offset
+        self.keys[key].add(timestamp, value)
+
+    @property
+    def memory(self) -> int:
+        """Return the bytes allocated for the points."""
+        return sum(
+            ring.capacity * POINT_SIZE
+            for history in self.keys.values()
+            for ring in history.tiers.values()
+        )
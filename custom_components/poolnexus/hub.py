@@ -0,0 +1,492 @@
+"""MQTT hub for the PoolNexus integration.
+
+Each config entry owns one hub which holds a single wildcard subscription:
+``<prefix>/<serial>/#`` for a single-device entry, or ``<prefix>/+/#`` in hub
+mode where one entry serves every device publishing under the prefix.
+Incoming messages are routed to the entity handlers through the per-device
+dicts of `PoolNexusDevice`, keyed by the topic tail (the part after
+``<prefix>/<serial>/``), so entities never subscribe to the broker
+themselves and adding a device in hub mode costs no extra subscription. The
+topics come from the entry's `TopicPlan` (topics.py).
+
+The ``availability`` topic drives the availability of every entity of the
+device: while it reports ``offline`` the other messages of the device are
+not dispatched, only the latest one per topic is kept and dispatched when
+the device comes back ``online``. Each transition writes every entity of
+the device once.
+
+Keys declaring ``stale_after`` are watched on the shared timer wheel of
+watchdog.py: a key silent for that long makes its entity unavailable until
+the device publishes it again. Messages only store their arrival time in
+the key's `KeyWatch`.
+
+The last payload of every topic is saved in a per-entry snapshot and loaded
+back while subscribing: entities start from their last known state, with a
+``restored`` state attribute until the broker delivers the topic again. The
+first live message then writes the entity even when its value equals the
+restored one, later ones go through the usual change detection.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import time
+from typing import Any
+
+from homeassistant.components.mqtt import ReceiveMessage, async_subscribe
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import PAYLOAD_OFFLINE, PAYLOAD_ONLINE
+from .device import MessageHandler, PoolNexusDevice
+from .profiling import CallbackProfiler
+from .snapshot import SnapshotStore
+from .topics import TopicPlan
+from .watchdog import KeyWatch, async_get_timer_wheel
+
+_LOGGER = logging.getLogger(__name__)
+
+DeviceListener = Callable[[str], None]
+
+
+class PoolNexusHub:
+    """Single subscription and topic dispatcher for one config entry."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        plan: TopicPlan,
+        revert_on_timeout: bool = False,
+        profiler: CallbackProfiler | None = None,
+    ) -> None:
+        """Initialize the hub.
+
+        Without a serial in ``plan`` the hub runs in hub mode and discovers
+        serials from the traffic under the prefix. With ``revert_on_timeout``
+        entities go back to the last state reported by the device when a
+        command is not acknowledged. With a ``profiler`` the entity callbacks
+        and the command publishes are timed (profiling option).
+        """
+        self._hass = hass
+        self.entry_id = entry_id
+        # Topics of the entry, shared with the platforms
+        self.plan = plan
+        self.prefix = plan.prefix
+        self.serial = serial = plan.serial
+        self._prefix_offset = len(plan.prefix) + 1
+        self._revert_on_timeout = revert_on_timeout
+        self.profiler = profiler
+        self._availability_tails = plan.availability_tails
+        self._wheel = async_get_timer_wheel(hass)
+        # serial -> shared runtime state of the device
+        self.devices: dict[str, PoolNexusDevice] = {}
+        # serial -> topic tails still holding a restored payload
+        self._stale: dict[str, set[str]] = {}
+        self._snapshot: SnapshotStore | None = None
+        self._device_listeners: list[DeviceListener] = []
+        self._unsub: CALLBACK_TYPE | None = None
+        if serial is not None:
+            self._async_add_serial(serial)
+
+    @property
+    def hub_mode(self) -> bool:
+        """Return True when the hub serves every serial under the prefix."""
+        return self.serial is None
+
+    @property
+    def serials(self) -> list[str]:
+        """Return the serials known to the hub."""
+        return list(self.devices)
+
+    def device(self, serial: str) -> PoolNexusDevice:
+        """Return the runtime state of a device."""
+        return self.devices[serial]
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return the hub state and the counters of every device."""
+        return {
+            "prefix": self.prefix,
+            "hub_mode": self.hub_mode,
+            "profiling": self.profiler.as_dict() if self.profiler is not None else None,
+            "devices": {
+                serial: {
+                    **device.metrics.as_dict(),
+                    "stale_topics": sorted(self._stale.get(serial, ())),
+                    "stale_keys": sorted(device.stale_keys),
+                    "state_variants": dict(sorted(device.state_variants.items())),
+                    "recent_alerts": device.alerts.recent(),
+                    "history_points": {
+                        key: {tier: len(ring) for tier, ring in history.tiers.items()}
+                        for key, history in device.history.keys.items()
+                    },
+                }
+                for serial, device in sorted(self.devices.items())
+            },
+        }
+
+    @callback
+    def async_publish_command(self, serial: str, key: str, payload: str) -> None:
+        """Queue a retained command on ``<prefix>/<serial>/<key>/set``."""
+        device = self.devices[serial]
+        device.commands.async_enqueue(device.command_topics[key], payload)
+
+    async def async_flush_commands(self) -> None:
+        """Publish the commands still queued for every device."""
+        for device in list(self.devices.values()):
+            await device.commands.async_flush()
+
+    async def async_start(self) -> None:
+        """Restore the last known payloads and subscribe to the device(s).
+
+        The snapshot is read while the subscription is set up; payloads
+        received live before the snapshot is loaded are not overwritten.
+        """
+        self._snapshot = SnapshotStore(
+            self._hass, self.entry_id, self._snapshot_payloads
+        )
+        await asyncio.gather(self._async_restore_snapshot(), self._async_subscribe())
+
+    async def _async_subscribe(self) -> None:
+        topic = self.plan.subscription
+        # encoding=None keeps payloads as bytes, as the entity handlers expect
+        self._unsub = await async_subscribe(
+            self._hass, topic, self._async_message_received, encoding=None
+        )
+        _LOGGER.debug("Subscribed to %s", topic)
+
+    async def async_save_snapshot(self) -> None:
+        """Save the last known payloads now."""
+        if self._snapshot is not None:
+            await self._snapshot.async_save()
+
+    async def _async_restore_snapshot(self) -> None:
+        """Seed the replay cache with the payloads of the last snapshot."""
+        assert self._snapshot is not None
+        devices = await self._snapshot.async_load()
+        now = dt_util.utcnow()
+        for serial, payloads in devices.items():
+            if not self.hub_mode and serial != self.serial:
+                continue
+            device = self.devices.get(serial) or self._async_add_serial(serial)
+            last_messages = device.last_messages
+            stale = set()
+            for tail, payload in payloads.items():
+                if tail in last_messages:
+                    # Already received live
+                    continue
+                msg = last_messages[tail] = ReceiveMessage(
+                    f"{device.topic}/{tail}", payload.encode("utf-8"), 0, True, "", now
+                )
+                stale.add(tail)
+                if tail in self._availability_tails:
+                    # Offline at the last save: defer its traffic as usual
+                    self._async_update_availability(device, msg)
+            if stale:
+                self._stale[serial] = stale
+        _LOGGER.debug(
+            "Restored %d device(s) from the snapshot of %s", len(self._stale), self.entry_id
+        )
+
+    def _snapshot_payloads(self) -> dict[str, dict[str, str]]:
+        return {
+            serial: {
+                tail: msg.payload.decode("utf-8", "replace")
+                if isinstance(msg.payload, bytes)
+                else str(msg.payload)
+                for tail, msg in device.last_messages.items()
+            }
+            for serial, device in self.devices.items()
+        }
+
+    @callback
+    def async_stop(self) -> None:
+        """Drop the subscription, handlers and device listeners."""
+        if self._unsub is not None:
+            try:
+                self._unsub()
+            except Exception:
+                _LOGGER.debug("Unsubscribe failed for hub %s", self.entry_id)
+            self._unsub = None
+        for device in self.devices.values():
+            device.acks.async_cancel()
+            for watch in set(device.watches.values()):
+                self._wheel.cancel(watch)
+        self.devices.clear()
+        self._stale.clear()
+        self._device_listeners.clear()
+
+    @callback
+    def async_add_device_listener(self, listener: DeviceListener) -> CALLBACK_TYPE:
+        """Call ``listener(serial)`` for every known and future device.
+
+        Platforms use this to create the entity set of a device the first
+        time its serial is seen. Returns a callable removing the listener.
+        """
+        self._device_listeners.append(listener)
+        for serial in self.serials:
+            listener(serial)
+
+        @callback
+        def _remove() -> None:
+            if listener in self._device_listeners:
+                self._device_listeners.remove(listener)
+
+        return _remove
+
+    @callback
+    def async_register(
+        self, serial: str, tails: tuple[str, ...], handler: MessageHandler
+    ) -> CALLBACK_TYPE:
+        """Route messages published on ``<prefix>/<serial>/<tail>`` to ``handler``.
+
+        The last message of each tail is replayed right away, with
+        ``device.replaying`` set. Returns one callable removing the
+        registration of every tail.
+        """
+        device = self.devices[serial]
+        handlers = device.handlers
+        for tail in tails:
+            if tail in device.ignored_tails:
+                continue
+            handlers[tail] = handler
+            last = device.last_messages.get(tail)
+            if last is not None:
+                device.replaying = True
+                device.restoring = tail in self._stale.get(serial, ())
+                try:
+                    self._async_call_handler(device, tail, handler, last)
+                finally:
+                    device.replaying = device.restoring = False
+
+        @callback
+        def _unregister() -> None:
+            for tail in tails:
+                if handlers.get(tail) is handler:
+                    del handlers[tail]
+
+        return _unregister
+
+    @callback
+    def _async_add_serial(self, serial: str) -> PoolNexusDevice:
+        """Create the runtime state of a newly seen device.
+
+        Single-device entries keep using the entry id as device identifier
+        so existing unique ids stay stable.
+        """
+        if self.hub_mode:
+            device_id = f"{self.entry_id}_{serial}"
+            name = f"PoolNexus {serial}"
+        else:
+            device_id = self.entry_id
+            name = "PoolNexus"
+        device = PoolNexusDevice(
+            self._hass,
+            serial,
+            device_id,
+            name,
+            self.plan,
+            self._revert_on_timeout,
+            self.profiler,
+        )
+        for key, topics in self.plan.keys.items():
+            if topics.stale_after is None:
+                continue
+            watch = KeyWatch(serial, key, topics.stale_after, self._async_key_stale)
+            for tail in topics.tails:
+                device.watches[tail] = watch
+            self._wheel.schedule(watch, watch.deadline)
+        self.devices[serial] = device
+        return device
+
+    @callback
+    def _async_message_received(self, msg: ReceiveMessage) -> None:
+        """Dispatch a message to the handler registered for its topic tail."""
+        serial, _, tail = msg.topic[self._prefix_offset :].partition("/")
+        device = self.devices.get(serial)
+        if device is None:
+            # Only reachable in hub mode: first message of an unknown device.
+            # Only known keys create a device, so stray topics under the
+            # prefix do not spawn empty devices.
+            if tail.partition("/")[0] not in self.plan.keys:
+                return
+            _LOGGER.info("Discovered PoolNexus device %s under %s", serial, self.prefix)
+            device = self._async_add_serial(serial)
+            # The message then takes the normal path: entities registering
+            # from the listeners get it dispatched or replayed.
+            for listener in list(self._device_listeners):
+                listener(serial)
+        device.metrics.record_message(tail, len(msg.payload))
+        if device.pending_variants:
+            self._async_detect_variant(device, tail)
+        if tail in device.ignored_tails:
+            # Other variant of a key the device publishes on its sibling
+            return
+        if tail in self._availability_tails:
+            self._async_update_availability(device, msg)
+        elif not device.available:
+            # Late traffic of an offline device, dispatched once it is back
+            device.deferred[tail] = msg
+            return
+        device.last_messages[tail] = msg
+        if self._stale:
+            self._async_clear_stale(serial, tail)
+        if self._snapshot is not None:
+            self._snapshot.async_schedule_save()
+        watch = device.watches.get(tail)
+        if watch is not None:
+            watch.last_seen = time.monotonic()
+            if watch.stale:
+                # Watched keys are read-only: no command echo to check
+                self._async_key_recovered(device, watch, tail, msg)
+                return
+        commands = device.commands
+        if commands.in_flight and commands.async_consume_echo(msg.topic, msg.payload):
+            # Our own command coming back: the entity already holds the value
+            return
+        handler = device.handlers.get(tail)
+        if handler is None:
+            return
+        self._async_call_handler(device, tail, handler, msg)
+
+    @staticmethod
+    @callback
+    def _async_call_handler(
+        device: PoolNexusDevice, tail: str, handler: MessageHandler, msg: ReceiveMessage
+    ) -> None:
+        """Call a handler, charging its entity counters to the topic ``tail``."""
+        metrics = device.metrics
+        metrics.dispatching = metrics.topics.get(tail)
+        try:
+            handler(msg)
+        finally:
+            metrics.dispatching = None
+
+    @callback
+    def _async_update_availability(self, device: PoolNexusDevice, msg: ReceiveMessage) -> None:
+        """Apply an availability report to every entity of the device."""
+        payload = msg.payload
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8", "replace")
+        state = str(payload).strip().lower()
+        if state == PAYLOAD_ONLINE:
+            available = True
+        elif state == PAYLOAD_OFFLINE:
+            available = False
+        else:
+            _LOGGER.debug("Unknown availability of %s: %s", device.serial, state)
+            return
+        if available == device.available:
+            return
+        device.available = available
+        _LOGGER.info("PoolNexus device %s is %s", device.serial, state)
+        entities = list(device.entities.values())
+        if available and device.deferred:
+            # Entities written by the deferred values need no other write
+            writes = [entity.state_writes for entity in entities]
+            self._async_dispatch_deferred(device)
+            entities = [
+                entity
+                for entity, before in zip(entities, writes)
+                if entity.state_writes == before
+            ]
+        for entity in entities:
+            entity.async_write_ha_state()
+
+    @callback
+    def _async_dispatch_deferred(self, device: PoolNexusDevice) -> None:
+        """Dispatch the latest message of each topic received while offline."""
+        deferred, device.deferred = device.deferred, {}
+        device.replaying = True
+        try:
+            for tail, msg in deferred.items():
+                device.last_messages[tail] = msg
+                if self._stale:
+                    self._async_clear_stale(device.serial, tail)
+                watch = device.watches.get(tail)
+                if watch is not None:
+                    # The availability transition writes the entity
+                    watch.last_seen = time.monotonic()
+                    if watch.stale:
+                        self._async_watch_fresh(device, watch)
+                handler = device.handlers.get(tail)
+                if handler is not None:
+                    self._async_call_handler(device, tail, handler, msg)
+        finally:
+            device.replaying = False
+        if self._snapshot is not None:
+            self._snapshot.async_schedule_save()
+
+    @callback
+    def _async_detect_variant(self, device: PoolNexusDevice, tail: str) -> None:
+        """Settle which variant of a key the device publishes.
+
+        The first live message on ``<key>`` or ``<key>/state`` decides: the
+        other variant is unregistered, dropped from the replay cache (and so
+        from the snapshot) and ignored from then on. Reload the entry to
+        detect again, e.g. after a firmware update changing the variant.
+        """
+        sibling = device.pending_variants.pop(tail, None)
+        if sibling is None:
+            return
+        device.pending_variants.pop(sibling, None)
+        key = tail.partition("/")[0]
+        device.state_variants[key] = tail
+        device.ignored_tails.add(sibling)
+        device.handlers.pop(sibling, None)
+        device.last_messages.pop(sibling, None)
+        if self._stale:
+            self._async_clear_stale(device.serial, sibling)
+        _LOGGER.debug("%s publishes %s on %s, ignoring %s", device.serial, key, tail, sibling)
+
+    @callback
+    def _async_clear_stale(self, serial: str, tail: str) -> None:
+        """Mark a restored topic as received live."""
+        stale = self._stale.get(serial)
+        if stale is None:
+            return
+        stale.discard(tail)
+        if not stale:
+            del self._stale[serial]
+            _LOGGER.debug("All restored topics of %s received again", serial)
+
+    @callback
+    def _async_key_stale(self, watch: KeyWatch) -> None:
+        """Make the entity of a key silent for its whole interval unavailable."""
+        device = self.devices.get(watch.serial)
+        if device is None:
+            return
+        device.stale_keys.add(watch.key)
+        _LOGGER.info(
+            "No %s from PoolNexus device %s for %ss, marking it unavailable",
+            watch.key,
+            watch.serial,
+            watch.interval,
+        )
+        entity = device.entities.get(watch.key)
+        if entity is not None and device.available:
+            entity.async_write_ha_state()
+
+    @callback
+    def _async_watch_fresh(self, device: PoolNexusDevice, watch: KeyWatch) -> None:
+        """Clear the staleness of a key received again and watch it anew."""
+        watch.stale = False
+        device.stale_keys.discard(watch.key)
+        self._wheel.schedule(watch, watch.deadline)
+
+    @callback
+    def _async_key_recovered(
+        self, device: PoolNexusDevice, watch: KeyWatch, tail: str, msg: ReceiveMessage
+    ) -> None:
+        """Dispatch the first message of a stale key, writing its entity once."""
+        self._async_watch_fresh(device, watch)
+        _LOGGER.debug("%s of %s received again", watch.key, device.serial)
+        entity = device.entities.get(watch.key)
+        writes = entity.state_writes if entity is not None else 0
+        handler = device.handlers.get(tail)
+        if handler is not None:
+            self._async_call_handler(device, tail, handler, msg)
+        if entity is not None and entity.state_writes == writes:
+            # Same value as before it went stale: only availability changed
+            entity.async_write_ha_state()
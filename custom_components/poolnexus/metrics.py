@@ -0,0 +1,127 @@
+"""Runtime metrics for the PoolNexus integration.
+
+Every device gets a `DeviceMetrics` holding plain integer counters, updated
+by the hub dispatcher (messages and bytes, per device and per topic tail) and
+by the entities (parse failures, state writes and suppressed writes). The
+entity counters are also charged to the topic whose message the hub is
+dispatching; writes not caused by a message (commands, reverts) only count
+per device. All
+updates happen in event loop callbacks, so the counters need no locking and
+an update costs an attribute increment. The counters are read by the
+diagnostic sensors on their poll and by the diagnostics download.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from .acks import CommandTracker
+from .commands import CommandQueue
+
+
+class TopicMetrics:
+    """Counters of one topic tail of a device."""
+
+    __slots__ = ("messages", "bytes", "parse_failures", "state_writes")
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.messages = 0
+        self.bytes = 0
+        self.parse_failures = 0
+        self.state_writes = 0
+
+
+class DeviceMetrics:
+    """Counters of one device (serial)."""
+
+    __slots__ = (
+        "messages",
+        "bytes",
+        "parse_failures",
+        "state_writes",
+        "suppressed_writes",
+        "last_message",
+        "topics",
+        "dispatching",
+        "_commands",
+        "_acks",
+    )
+
+    def __init__(
+        self, commands: CommandQueue | None = None, acks: CommandTracker | None = None
+    ) -> None:
+        """Initialize the counters.
+
+        Command statistics are read from the device's `CommandQueue` and
+        `CommandTracker`.
+        """
+        self.messages = 0
+        self.bytes = 0
+        self.parse_failures = 0
+        self.state_writes = 0
+        self.suppressed_writes = 0
+        # time.monotonic() of the last message, 0.0 before the first one
+        self.last_message = 0.0
+        self.topics: dict[str, TopicMetrics] = {}
+        # Topic of the message being dispatched, set by the hub
+        self.dispatching: TopicMetrics | None = None
+        self._commands = commands
+        self._acks = acks
+
+    def record_message(self, tail: str, size: int) -> None:
+        """Count a message of ``size`` bytes received on ``tail``."""
+        self.messages += 1
+        self.bytes += size
+        self.last_message = time.monotonic()
+        topic = self.topics.get(tail)
+        if topic is None:
+            topic = self.topics[tail] = TopicMetrics()
+        topic.messages += 1
+        topic.bytes += size
+
+    @property
+    def commands_published(self) -> int:
+        """Return the number of commands published to the device."""
+        return self._commands.published if self._commands is not None else 0
+
+    @property
+    def command_latency(self) -> float:
+        """Return the latency in seconds of the last command flush."""
+        return self._commands.last_flush_latency if self._commands is not None else 0.0
+
+    @property
+    def command_ack_latency(self) -> float:
+        """Return the acknowledgement latency in seconds of the last command."""
+        return self._acks.last_latency if self._acks is not None else 0.0
+
+    @property
+    def command_timeouts(self) -> int:
+        """Return the number of commands never acknowledged by the device."""
+        return self._acks.total_timeouts if self._acks is not None else 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a JSON serializable dict."""
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "parse_failures": self.parse_failures,
+            "state_writes": self.state_writes,
+            "suppressed_writes": self.suppressed_writes,
+            "seconds_since_last_message": (
+                round(time.monotonic() - self.last_message, 3)
+                if self.last_message
+                else None
+            ),
+            "commands": self._commands.stats if self._commands is not None else {},
+            "command_acks": self._acks.as_dict() if self._acks is not None else {},
+            "topics": {
+                tail: {
+                    "messages": topic.messages,
+                    "bytes": topic.bytes,
+                    "parse_failures": topic.parse_failures,
+                    "state_writes": topic.state_writes,
+                }
+                for tail, topic in sorted(self.topics.items())
+            },
+        }
@@ -0,0 +1,208 @@
+"""Opt-in profiling of the PoolNexus callbacks and command publishes.
+
+With the ``profiling`` option, every entity message callback and every
+command `async_publish` of the entry is timed into per-key histograms of its
+`CallbackProfiler`, reported in the diagnostics. A callback running longer
+than the ``loop_budget`` option held the event loop too long: it is counted,
+kept among the recent slow callbacks and logged. Without the option no
+profiler is created and nothing is wrapped.
+
+The `poolnexus.profile` service runs cProfile on the event loop for a given
+duration, dumps the pstats to the configuration directory and returns the
+PoolNexus functions with the most cumulative time.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable
+import cProfile
+import logging
+import os
+import pstats
+import time
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.util import dt as dt_util
+
+from .acks import LatencyHistogram
+from .const import (
+    DEFAULT_LOOP_BUDGET,
+    DEFAULT_PROFILE_DURATION,
+    DOMAIN,
+    MAX_PROFILE_DURATION,
+    PROFILE_TOP_FUNCTIONS,
+    PROFILING_BUCKETS,
+    PROFILING_SLOW_HISTORY,
+)
+
+if TYPE_CHECKING:
+    from .device import MessageHandler
+    from .hub import PoolNexusHub
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE = "profile"
+
+SERVICE_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=DEFAULT_PROFILE_DURATION): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=MAX_PROFILE_DURATION)
+        ),
+    }
+)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class CallbackProfiler:
+    """Callback and publish durations of one config entry."""
+
+    def __init__(self, loop_budget: float = DEFAULT_LOOP_BUDGET) -> None:
+        """Initialize the profiler; ``loop_budget`` is in milliseconds."""
+        self.budget = loop_budget / 1000
+        # key -> durations of its message callbacks
+        self.callbacks: dict[str, LatencyHistogram] = {}
+        # key -> durations of its command publishes
+        self.publishes: dict[str, LatencyHistogram] = {}
+        # key -> callbacks over the loop budget
+        self.over_budget: dict[str, int] = {}
+        self.recent_slow: deque[dict[str, Any]] = deque(maxlen=PROFILING_SLOW_HISTORY)
+
+    @staticmethod
+    def _histogram(histograms: dict[str, LatencyHistogram], key: str) -> LatencyHistogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram(PROFILING_BUCKETS)
+        return histogram
+
+    def wrap(self, serial: str, key: str, handler: MessageHandler) -> MessageHandler:
+        """Return ``handler`` timed into the histogram of ``key``."""
+        histogram = self._histogram(self.callbacks, key)
+        budget = self.budget
+        perf_counter = time.perf_counter
+
+        @callback
+        def _timed_handler(msg: ReceiveMessage) -> None:
+            start = perf_counter()
+            try:
+                handler(msg)
+            finally:
+                elapsed = perf_counter() - start
+                histogram.record(elapsed)
+                if elapsed > budget:
+                    self._record_over_budget(serial, key, msg.topic, elapsed)
+
+        return _timed_handler
+
+    def _record_over_budget(self, serial: str, key: str, topic: str, elapsed: float) -> None:
+        count = self.over_budget[key] = self.over_budget.get(key, 0) + 1
+        self.recent_slow.append(
+            {
+                "time": dt_util.utcnow().isoformat(),
+                "serial": serial,
+                "topic": topic,
+                "ms": round(elapsed * 1000, 3),
+            }
+        )
+        # Warn once per key, the counts are in the diagnostics
+        _LOGGER.log(
+            logging.WARNING if count == 1 else logging.DEBUG,
+            "PoolNexus callback for %s of %s blocked the event loop for %.2f ms (budget %.2f ms)",
+            key,
+            serial,
+            elapsed * 1000,
+            self.budget * 1000,
+        )
+
+    async def async_timed_publish(self, topic: str, publish: Awaitable[None]) -> None:
+        """Await ``publish`` on ``<...>/<key>/set``, timing it for the key."""
+        start = time.perf_counter()
+        try:
+            await publish
+        finally:
+            key = topic.rsplit("/", 2)[-2]
+            self._histogram(self.publishes, key).record(time.perf_counter() - start)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histograms and the slow callbacks for the diagnostics."""
+        return {
+            "loop_budget_ms": self.budget * 1000,
+            "callbacks": {
+                key: histogram.as_dict() for key, histogram in sorted(self.callbacks.items())
+            },
+            "publishes": {
+                key: histogram.as_dict() for key, histogram in sorted(self.publishes.items())
+            },
+            "over_budget": dict(sorted(self.over_budget.items())),
+            "recent_slow": list(self.recent_slow),
+        }
+
+
+def _dump_profile(profile: cProfile.Profile, path: str) -> list[dict[str, Any]]:
+    """Write the pstats of ``profile`` and return its top PoolNexus functions."""
+    profile.dump_stats(path)
+    stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    functions = [
+        (func, calls, total, cumulative)
+        for func, (_, calls, total, cumulative, _) in stats.items()
+        if func[0].startswith(_PACKAGE_DIR)
+    ]
+    functions.sort(key=lambda item: item[3], reverse=True)
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), calls, total, cumulative in functions[:PROFILE_TOP_FUNCTIONS]
+    ]
+
+
+@callback
+def async_setup_profiling(hass: HomeAssistant) -> None:
+    """Register the profile service."""
+    running = asyncio.Lock()
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        hubs: list[PoolNexusHub] = list(hass.data.get(DOMAIN, {}).values())
+        if not any(hub.profiler is not None for hub in hubs):
+            raise ServiceValidationError("Enable the profiling option of a PoolNexus entry first")
+        if running.locked():
+            raise ServiceValidationError("A PoolNexus profile is already running")
+        duration = call.data["duration"]
+        async with running:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as err:
+                # Another profiler (e.g. the profiler integration) is running
+                raise HomeAssistantError(f"Cannot start the profiler: {err}") from err
+            try:
+                await asyncio.sleep(duration)
+            finally:
+                profile.disable()
+            path = hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.prof")
+            top = await hass.async_add_executor_job(_dump_profile, profile, path)
+        _LOGGER.info("PoolNexus profile of %ss written to %s", duration, path)
+        return {"path": path, "duration": duration, "functions": top}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=SERVICE_PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
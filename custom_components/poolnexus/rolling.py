@@ -0,0 +1,211 @@
+"""Rolling statistics of the PoolNexus measurements.
+
+Keys declaring ``statistics_windows`` in SENSOR_TYPES get one
+`RollingWindow` per window duration and device. Every decoded sample is
+added in O(1) (amortized): values and times live in fixed-size `array('d')`
+rings, the mean and the least-squares slope come from running sums, and
+min/max from monotonic index queues. Old samples leave the window when they
+are older than its duration, or when the ring is full (the window then
+covers less than its duration).
+
+Running sums drift under repeated add/subtract, so they are recomputed from
+the ring (and times re-based) once per ring length of evictions.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from dataclasses import dataclass
+import time
+
+from .const import SENSOR_TYPES, STATISTICS_WINDOW_CAPACITY
+
+
+@dataclass(frozen=True)
+class WindowSummary:
+    """Statistics of the samples in a window."""
+
+    count: int
+    mean: float | None
+    minimum: float | None
+    maximum: float | None
+    # Least-squares slope in units per hour, None until the samples span a
+    # tenth of the window
+    slope: float | None
+
+
+class RollingWindow:
+    """Samples of the last ``duration`` seconds, at most ``capacity``."""
+
+    __slots__ = (
+        "duration",
+        "capacity",
+        "_times",
+        "_values",
+        "_next",
+        "_count",
+        "_origin",
+        "_sum_t",
+        "_sum_v",
+        "_sum_tt",
+        "_sum_tv",
+        "_min_queue",
+        "_max_queue",
+        "_evictions",
+    )
+
+    def __init__(self, duration: float, capacity: int = STATISTICS_WINDOW_CAPACITY) -> None:
+        """Initialize an empty window."""
+        self.duration = duration
+        self.capacity = capacity
+        # Times are stored relative to _origin to keep the sums well scaled
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        # Absolute index of the next sample; the window holds the _count
+        # samples before it, at position index % capacity
+        self._next = 0
+        self._count = 0
+        self._origin = 0.0
+        self._sum_t = 0.0
+        self._sum_v = 0.0
+        self._sum_tt = 0.0
+        self._sum_tv = 0.0
+        # Absolute indexes with increasing values / decreasing values
+        self._min_queue: deque[int] = deque()
+        self._max_queue: deque[int] = deque()
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return self._count
+
+    def add(self, value: float, now: float | None = None) -> None:
+        """Add a sample taken at ``now`` (time.monotonic())."""
+        if now is None:
+            now = time.monotonic()
+        self.expire(now)
+        if self._count == self.capacity:
+            self._evict()
+        if not self._count:
+            self._origin = now
+        index = self._next
+        pos = index % self.capacity
+        t = now - self._origin
+        self._times[pos] = t
+        self._values[pos] = value
+        self._next = index + 1
+        self._count += 1
+        self._sum_t += t
+        self._sum_v += value
+        self._sum_tt += t * t
+        self._sum_tv += t * value
+        values = self._values
+        capacity = self.capacity
+        min_queue = self._min_queue
+        while min_queue and values[min_queue[-1] % capacity] >= value:
+            min_queue.pop()
+        min_queue.append(index)
+        max_queue = self._max_queue
+        while max_queue and values[max_queue[-1] % capacity] <= value:
+            max_queue.pop()
+        max_queue.append(index)
+
+    def expire(self, now: float | None = None) -> None:
+        """Drop the samples older than the window duration."""
+        if now is None:
+            now = time.monotonic()
+        # _evict() may re-base _origin, so compare absolute times
+        cutoff = now - self.duration
+        times = self._times
+        while (
+            self._count
+            and times[(self._next - self._count) % self.capacity] + self._origin < cutoff
+        ):
+            self._evict()
+
+    def summary(self, now: float | None = None) -> WindowSummary:
+        """Return the statistics of the window."""
+        self.expire(now)
+        n = self._count
+        if not n:
+            return WindowSummary(0, None, None, None, None)
+        capacity = self.capacity
+        times = self._times
+        span = times[(self._next - 1) % capacity] - times[(self._next - n) % capacity]
+        slope = None
+        denominator = n * self._sum_tt - self._sum_t * self._sum_t
+        # A slope over a burst of samples is noise: require a tenth of the
+        # window between the oldest and the newest sample
+        if span >= self.duration / 10 and denominator > 1e-9:
+            slope = (n * self._sum_tv - self._sum_t * self._sum_v) / denominator * 3600
+        return WindowSummary(
+            n,
+            self._sum_v / n,
+            self._values[self._min_queue[0] % capacity],
+            self._values[self._max_queue[0] % capacity],
+            slope,
+        )
+
+    def _evict(self) -> None:
+        """Remove the oldest sample."""
+        index = self._next - self._count
+        pos = index % self.capacity
+        t = self._times[pos]
+        value = self._values[pos]
+        self._count -= 1
+        self._sum_t -= t
+        self._sum_v -= value
+        self._sum_tt -= t * t
+        self._sum_tv -= t * value
+        if self._min_queue and self._min_queue[0] == index:
+            self._min_queue.popleft()
+        if self._max_queue and self._max_queue[0] == index:
+            self._max_queue.popleft()
+        self._evictions += 1
+        if self._evictions >= self.capacity:
+            self._resync()
+
+    def _resync(self) -> None:
+        """Re-base the times on the oldest sample and recompute the sums."""
+        self._evictions = 0
+        self._sum_t = self._sum_v = self._sum_tt = self._sum_tv = 0.0
+        if not self._count:
+            return
+        capacity = self.capacity
+        times = self._times
+        values = self._values
+        first = self._next - self._count
+        shift = times[first % capacity]
+        self._origin += shift
+        for index in range(first, self._next):
+            pos = index % capacity
+            t = times[pos] - shift
+            times[pos] = t
+            value = values[pos]
+            self._sum_t += t
+            self._sum_v += value
+            self._sum_tt += t * t
+            self._sum_tv += t * value
+
+
+class DeviceStatistics:
+    """Rolling windows of every statistics key of one device."""
+
+    def __init__(self) -> None:
+        """Create the windows declared in SENSOR_TYPES."""
+        # key -> window duration -> window
+        self.windows: dict[str, dict[float, RollingWindow]] = {
+            key: {duration: RollingWindow(duration) for duration in cfg["statistics_windows"]}
+            for key, cfg in SENSOR_TYPES.items()
+            if cfg.get("statistics_windows")
+        }
+
+    def add(self, key: str, value: float) -> None:
+        """Add a sample of ``key`` to all its windows."""
+        now = time.monotonic()
+        for window in self.windows[key].values():
+            window.add(value, now)
+
+    def window(self, key: str, duration: float) -> RollingWindow:
+        """Return the window of ``key`` lasting ``duration`` seconds."""
+        return self.windows[key][duration]
@@ -1,25 +1,37 @@
 """Sensor platform for PoolNexus integration."""
 from __future__ import annotations
 
+from datetime import timedelta
 import logging
+import time
 from typing import Any
 
-from homeassistant.components.mqtt import async_subscribe
+from homeassistant.components.mqtt import ReceiveMessage
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, Platform
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import StateType
 
+from .alerts import Alert
 from .const import (
-    CONF_MQTT_TOPIC_PREFIX,
-    CONF_SERIAL,
+    AVAILABILITY_KEY,
     DOMAIN,
+    METRIC_SENSOR_TYPES,
     SENSOR_TYPES,
+    STATISTIC_TYPES,
 )
+from .decoder import DECODERS, INVALID, decode_text
+from .device import PoolNexusDevice
+from .entity import PoolNexusEntity
+from .hub import PoolNexusHub
 
 _LOGGER = logging.getLogger(__name__)
 
+# Poll interval of the metric and statistic sensors (the others are pushed)
+SCAN_INTERVAL = timedelta(seconds=30)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -27,128 +39,244 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up PoolNexus sensors from a config entry."""
-    config = config_entry.data
-    topic_prefix = config.get(CONF_MQTT_TOPIC_PREFIX, "poolnexus")
-    # Use the device serial to build topics like <prefix>/<serial>/...
-    serial = config.get(CONF_SERIAL)
-    if not serial:
-        _LOGGER.error(
-            "PoolNexus config entry %s missing 'serial' — topics must use the format <prefix>/<serial>/...; skipping sensor setup",
-            config_entry.entry_id,
+    hub: PoolNexusHub = hass.data[DOMAIN][config_entry.entry_id]
+
+    @callback
+    def _async_add_device(serial: str) -> None:
+        device = hub.device(serial)
+        # Create sensors dynamically from SENSOR_TYPES so docs and code remain consistent
+        sensors = [
+            SENSOR_CLASSES.get(sensor_type, PoolNexusSensor)(hub, device, sensor_type)
+            for sensor_type in hub.plan.platform_keys(Platform.SENSOR)
+        ]
+        sensors.extend(
+            PoolNexusStatisticSensor(device, sensor_type, duration, statistic)
+            for sensor_type, sensor_config in SENSOR_TYPES.items()
+            for duration in sensor_config.get("statistics_windows", ())
+            for statistic in STATISTIC_TYPES
+        )
+        sensors.extend(
+            PoolNexusMetricSensor(device, metric_type)
+            for metric_type in METRIC_SENSOR_TYPES
         )
-        return
-    topic_prefix = f"{topic_prefix}/{serial}"
-    
-    # Create sensors dynamically from SENSOR_TYPES so docs and code remain consistent
-    sensors = [
-        PoolNexusSensor(hass, config_entry, topic_prefix, sensor_type)
-        for sensor_type in SENSOR_TYPES.keys()
-    ]
 
-    async_add_entities(sensors)
+        async_add_entities(sensors)
 
+    # Called right away for a configured serial, and on first sight of each
+    # new serial in hub mode
+    config_entry.async_on_unload(hub.async_add_device_listener(_async_add_device))
 
-class PoolNexusSensor(SensorEntity):
+
+class PoolNexusSensor(PoolNexusEntity, SensorEntity):
     """Representation of a PoolNexus sensor."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, topic_prefix: str, sensor_type: str) -> None:
+    def __init__(self, hub: PoolNexusHub, device: PoolNexusDevice, sensor_type: str) -> None:
         """Initialize the sensor."""
-        self._hass = hass
-        self._config_entry = config_entry
-        self._topic_prefix = topic_prefix
-        self._sensor_type = sensor_type
-        
         sensor_config = SENSOR_TYPES[sensor_type]
-        
-        self._attr_name = f"PoolNexus {sensor_config['name']}"
-        self._attr_unique_id = f"{config_entry.entry_id}_{sensor_type}"
+        super().__init__(hub, device, sensor_type, sensor_config["name"])
+
         self._attr_device_class = sensor_config.get("device_class")
         self._attr_native_unit_of_measurement = sensor_config.get("unit_of_measurement")
         self._attr_state_class = sensor_config.get("state_class")
         self._attr_native_value = None
-        # MQTT unsubscription handles (set when subscribed)
-        self._unsubs: list = []
-
-        # Configuration du device
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, config_entry.entry_id)},
-            "name": "PoolNexus",
-            "manufacturer": "PoolNexus",
-            "model": "PoolNexus Device",
-        }
+        # Per-key payload decoder, resolved once
+        self._decode = DECODERS[sensor_type]
+        self._deadband = sensor_config.get("deadband")
+        self._min_write_interval = sensor_config.get("min_write_interval")
+        # Rolling windows and history fed with every valid live sample, if configured
+        self._statistics = (
+            device.statistics if sensor_config.get("statistics_windows") else None
+        )
+        self._history = device.history if sensor_config.get("history") else None
 
-    async def async_added_to_hass(self) -> None:
-        """Subscribe to MQTT topic when entity is added to hass."""
-        base_topic = f"{self._topic_prefix}/{self._sensor_type}"
-
-        @callback
-        def _message_received(msg):
-            """Handle new MQTT messages for either topic or topic/state."""
-            try:
-                payload = msg.payload.decode("utf-8").strip()
-
-                # Treat some sensor types as textual values (don't coerce to float)
-                textual_types = {
-                    "water_level",
-                    "chlorine_level",
-                    "ph_level",
-                    "firmware",
-                    "last_pH_prob_cal",
-                    "last_ORP_prob_cal",
-                    "availability",
-                    "alert",
-                    "last_pump_cleaning",
-                }
-
-                if self._sensor_type in textual_types:
-                    # Keep raw payload (string). Alerts may be JSON strings.
-                    self._attr_native_value = payload
+    @callback
+    def _message_received(self, msg: ReceiveMessage) -> None:
+        """Handle new MQTT messages for either topic or topic/state."""
+        try:
+            # Typed decode straight from the payload bytes (float for
+            # measurements, datetime for device times, stripped text for the
+            # informational sensors)
+            value = self._decode(msg.payload)
+            if value is INVALID:
+                self._count_parse_failure()
+                if self._attr_device_class is None and self._attr_state_class is None:
+                    # fallback: keep raw if the typed parse fails
+                    value = decode_text(msg.payload)
+                    _LOGGER.debug("Failed typed parse for %s, keeping raw: %s", self._key, value)
                 else:
-                    # Attempt numeric conversion for measurement sensors
-                    # Some devices may publish integers or floats with varying formats
-                    try:
-                        # prefer float for numeric sensors
-                        value = float(payload)
-                    except Exception:
-                        # fallback: keep raw if conversion fails
-                        _LOGGER.debug("Failed numeric parse for %s, keeping raw: %s", self._sensor_type, payload)
-                        self._attr_native_value = payload
-                    else:
-                        self._attr_native_value = value
-
-                self.async_write_ha_state()
-                _LOGGER.debug("Received %s: %s", self._sensor_type, payload)
-            except Exception:
-                _LOGGER.exception("Failed to parse message for %s", self._sensor_type)
-
-        # Subscribe to both the base topic and the possible '/state' variant to
-        # maximize compatibility with different device implementations.
-        topics_to_try = [base_topic, f"{base_topic}/state"]
-        for t in topics_to_try:
-            try:
-                unsub = await async_subscribe(self._hass, t, _message_received)
-                if callable(unsub):
-                    self._unsubs.append(unsub)
-                _LOGGER.debug("Subscribed to %s for %s", t, self.entity_id)
-            except Exception:
-                _LOGGER.debug("No topic %s available for %s", t, self.entity_id)
-
-        # If neither subscription succeeded, log a warning so user can check topics
-        if not self._unsubs:
-            _LOGGER.warning("No MQTT topic subscriptions could be created for %s (expected %s)", self.entity_id, base_topic)
-
-        return
+                    # numeric and timestamp states cannot hold raw text
+                    _LOGGER.debug("Failed typed parse for %s: %s", self._key, msg.payload)
+                    value = None
+            elif not self._device.replaying:
+                # Replayed, restored and deferred values are not new samples
+                if self._statistics is not None:
+                    self._statistics.add(self._key, value)
+                if self._history is not None:
+                    self._history.add(self._key, value)
+
+            # Only written to the state machine when it actually changed
+            self._async_write_value(value)
+            _LOGGER.debug("Received %s: %s", self._key, value)
+        except Exception:
+            self._count_parse_failure()
+            _LOGGER.exception("Failed to parse message for %s", self._key)
+
+    def _apply_value(self, value: Any) -> None:
+        self._attr_native_value = value
 
     @property
     def native_value(self) -> StateType:
         """Return the state of the sensor."""
         return self._attr_native_value
 
-    async def async_will_remove_from_hass(self) -> None:
-        """Cleanup MQTT subscriptions on removal."""
-        for unsub in list(self._unsubs):
-            try:
-                if callable(unsub):
-                    unsub()
-            except Exception:
-                _LOGGER.debug("Unsubscribe failed for %s", self.entity_id)
+
+class PoolNexusAlertSensor(PoolNexusSensor):
+    """Alert sensor: the state is the alert type, details are attributes.
+
+    The JSON payload is decoded once here; the device's tracker only
+    reports a new alert on a change of type or message, so the alert
+    republished every cycle is not written again.
+    """
+
+    # The history is for the UI and diagnostics, not for the recorder
+    _unrecorded_attributes = frozenset({"recent_alerts"})
+
+    def __init__(self, hub: PoolNexusHub, device: PoolNexusDevice, sensor_type: str) -> None:
+        """Initialize the alert sensor."""
+        super().__init__(hub, device, sensor_type)
+        self._tracker = device.alerts
+        self._attr_extra_state_attributes = {}
+
+    @callback
+    def _message_received(self, msg: ReceiveMessage) -> None:
+        """Handle an alert published on either topic or topic/state."""
+        try:
+            data = self._decode(msg.payload)
+            if data is INVALID:
+                # Not JSON: keep the raw text as the message of an unknown alert
+                self._count_parse_failure()
+                text = decode_text(msg.payload)
+                alert = Alert("unknown", text) if text else Alert("none")
+                _LOGGER.debug("Failed JSON parse for %s, keeping raw: %s", self._key, text)
+            else:
+                alert = Alert.from_payload(data)
+            self._async_write_value(self._tracker.async_update(alert))
+        except Exception:
+            self._count_parse_failure()
+            _LOGGER.exception("Failed to parse message for %s", self._key)
+
+    def _apply_value(self, value: Alert) -> None:
+        self._attr_native_value = value.type
+        self._attr_extra_state_attributes = {
+            "message": value.message,
+            "timestamp": value.timestamp,
+            "active": value.active,
+            "recent_alerts": self._tracker.recent(),
+        }
+
+
+class PoolNexusAvailabilitySensor(PoolNexusSensor):
+    """Availability sensor, available while the device is offline to show it."""
+
+    _follows_availability = False
+
+
+# Sensor types with a dedicated entity class
+SENSOR_CLASSES: dict[str, type[PoolNexusSensor]] = {
+    "alert": PoolNexusAlertSensor,
+    AVAILABILITY_KEY: PoolNexusAvailabilitySensor,
+}
+
+
+def _window_label(duration: float) -> str:
+    """Return a short label of a window duration (``15 min``, ``1 h``)."""
+    if duration % 3600 == 0:
+        return f"{int(duration // 3600)} h"
+    return f"{int(duration // 60)} min"
+
+
+class PoolNexusStatisticSensor(SensorEntity):
+    """Rolling mean, min, max or slope of a measurement over a window.
+
+    Reads the device's rolling window on each poll; the window itself is
+    updated by the measurement sensor for every sample.
+    """
+
+    _attr_should_poll = True
+
+    def __init__(self, device: PoolNexusDevice, sensor_type: str, duration: float, statistic: str) -> None:
+        """Initialize the statistic sensor."""
+        self._window = device.statistics.window(sensor_type, duration)
+        self._statistic = statistic
+
+        sensor_config = SENSOR_TYPES[sensor_type]
+        statistic_config = STATISTIC_TYPES[statistic]
+        unit = sensor_config.get("unit_of_measurement")
+
+        self._attr_name = (
+            f"{device.name} {sensor_config['name']} "
+            f"{statistic_config['name']} {_window_label(duration)}"
+        )
+        self._attr_unique_id = f"{device.device_id}_{sensor_type}_{statistic}_{int(duration)}"
+        self._attr_state_class = "measurement"
+        self._attr_entity_registry_enabled_default = statistic_config["enabled_default"]
+        if statistic == "slope":
+            self._attr_native_unit_of_measurement = f"{unit}/h" if unit else None
+        else:
+            self._attr_device_class = sensor_config.get("device_class")
+            self._attr_native_unit_of_measurement = unit
+        self._attr_device_info = device.device_info
+
+    async def async_update(self) -> None:
+        """Read the statistic from the window."""
+        summary = self._window.summary()
+        value = {
+            "mean": summary.mean,
+            "min": summary.minimum,
+            "max": summary.maximum,
+            "slope": summary.slope,
+        }[self._statistic]
+        self._attr_native_value = round(value, 3) if value is not None else None
+        self._attr_extra_state_attributes = {"samples": summary.count}
+
+
+class PoolNexusMetricSensor(SensorEntity):
+    """Diagnostic sensor exposing one runtime counter of a device."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = True
+
+    def __init__(self, device: PoolNexusDevice, metric_type: str) -> None:
+        """Initialize the metric sensor."""
+        self._metrics = device.metrics
+        self._metric_type = metric_type
+
+        metric_config = METRIC_SENSOR_TYPES[metric_type]
+
+        self._attr_name = f"{device.name} {metric_config['name']}"
+        self._attr_unique_id = f"{device.device_id}_metric_{metric_type}"
+        self._attr_device_class = metric_config.get("device_class")
+        self._attr_native_unit_of_measurement = metric_config.get("unit_of_measurement")
+        self._attr_state_class = metric_config.get("state_class")
+        self._attr_entity_registry_enabled_default = metric_config["enabled_default"]
+        # Message count and time of the previous poll, for the rate
+        self._last_messages = self._metrics.messages
+        self._last_poll = time.monotonic()
+        self._attr_device_info = device.device_info
+
+    async def async_update(self) -> None:
+        """Read the counter."""
+        metrics = self._metrics
+        if self._metric_type == "message_rate":
+            now = time.monotonic()
+            elapsed = now - self._last_poll
+            if elapsed > 0:
+                self._attr_native_value = round(
+                    (metrics.messages - self._last_messages) * 60 / elapsed, 1
+                )
+            self._last_messages = metrics.messages
+            self._last_poll = now
+        elif self._metric_type in ("command_latency", "command_ack_latency"):
+            self._attr_native_value = round(getattr(metrics, self._metric_type) * 1000, 1)
+        else:
+            self._attr_native_value = getattr(metrics, self._metric_type)
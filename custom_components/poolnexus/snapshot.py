@@ -0,0 +1,79 @@
+"""Last-known state snapshot for the PoolNexus integration.
+
+The hub keeps the last message of every topic tail of its devices. This
+module saves those payloads per config entry in `.storage` (one small JSON
+document, `{"devices": {serial: {tail: payload}}}`) and loads them back at
+startup, so entities start from their last known state instead of empty
+values while the broker replays the retained messages.
+
+Saves are delayed: the first message after a save schedules the next one
+`SNAPSHOT_SAVE_DELAY` seconds later and the messages in between are covered
+by that save, so the cost on the message path is one flag check.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, SNAPSHOT_SAVE_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+Payloads = dict[str, dict[str, str]]
+
+
+def _storage_key(entry_id: str) -> str:
+    return f"{DOMAIN}.{entry_id}.snapshot"
+
+
+class SnapshotStore:
+    """Delayed saving and loading of a hub's last payloads."""
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, collect: Callable[[], Payloads]
+    ) -> None:
+        """Initialize the store; ``collect`` returns the payloads to save."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, _storage_key(entry_id)
+        )
+        self._collect = collect
+        self._scheduled = False
+
+    async def async_load(self) -> Payloads:
+        """Return serial -> topic tail -> payload from the last save."""
+        try:
+            data = await self._store.async_load()
+        except Exception:
+            _LOGGER.warning("Ignoring unreadable snapshot %s", self._store.key)
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data.get("devices", {})
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Save the payloads within ``SNAPSHOT_SAVE_DELAY`` seconds."""
+        if self._scheduled:
+            return
+        self._scheduled = True
+        self._store.async_delay_save(self._data, SNAPSHOT_SAVE_DELAY)
+
+    async def async_save(self) -> None:
+        """Save the payloads now."""
+        await self._store.async_save(self._data())
+
+    @callback
+    def _data(self) -> dict[str, Any]:
+        self._scheduled = False
+        return {"devices": self._collect()}
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the snapshot of a removed config entry."""
+    await Store(hass, STORAGE_VERSION, _storage_key(entry_id)).async_remove()
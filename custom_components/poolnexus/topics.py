@@ -0,0 +1,146 @@
+"""Topic plan of the PoolNexus integration.
+
+Every topic the integration handles is known from the *_TYPES tables in
+const.py: which platform owns a key, the topic tails its entity listens to
+(the part after ``<prefix>/<serial>/``) and the tail its commands are
+published on. `KEY_TOPICS` computes them once at import; a config entry only
+adds its prefix and serial in a frozen `TopicPlan`, built by the entry setup
+and shared by the hub and the four platforms, so nothing re-reads the entry
+data or rebuilds topic strings per entity.
+
+Sensors and switches accept both ``<key>`` and ``<key>/state``, but a device
+uses one of them. With state variant detection (the default), the first
+live message of either variant decides which one the device uses and the
+hub ignores the other from then on (see `PoolNexusHub`).
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from homeassistant.const import Platform
+
+from .const import AVAILABILITY_KEY, SELECT_TYPES, SENSOR_TYPES, SWITCH_TYPES, TEXT_TYPES
+
+# Tails listened to by the entities of each platform, appended to the key
+# ("" is the key itself). Sensors accept the possible '/state' variant;
+# switches listen on both possible state topics to capture retained
+# messages; text and select entities also read back retained values
+# published on their '/set' topic.
+PLATFORM_TAIL_SUFFIXES: dict[Platform, tuple[str, ...]] = {
+    Platform.SENSOR: ("", "/state"),
+    Platform.SWITCH: ("/state", ""),
+    Platform.TEXT: ("", "/set"),
+    Platform.SELECT: ("", "/set"),
+}
+
+# Platforms whose entities send commands on ``<key>/set``
+COMMAND_PLATFORMS = frozenset((Platform.SWITCH, Platform.TEXT, Platform.SELECT))
+
+
+@dataclass(frozen=True, slots=True)
+class KeyTopics:
+    """Topic tails of one key."""
+
+    key: str
+    platform: Platform
+    # Tails routed to the key's entity
+    tails: tuple[str, ...]
+    # Tail commands are published on, None for read-only keys
+    command_tail: str | None
+    # Seconds without a message before the key is stale, None if not watched
+    stale_after: float | None = None
+
+
+def _build_key_topics() -> Mapping[str, KeyTopics]:
+    keys: dict[str, KeyTopics] = {}
+    for platform, types in (
+        (Platform.SENSOR, SENSOR_TYPES),
+        (Platform.SWITCH, SWITCH_TYPES),
+        (Platform.TEXT, TEXT_TYPES),
+        (Platform.SELECT, SELECT_TYPES),
+    ):
+        for key, cfg in types.items():
+            keys[key] = KeyTopics(
+                key,
+                platform,
+                tuple(f"{key}{suffix}" for suffix in PLATFORM_TAIL_SUFFIXES[platform]),
+                f"{key}/set" if platform in COMMAND_PLATFORMS else None,
+                cfg.get("stale_after"),
+            )
+    return MappingProxyType(keys)
+
+
+KEY_TOPICS = _build_key_topics()
+
+# Tail -> the other variant of the same key, for the keys handled on both
+# <key> and <key>/state
+STATE_VARIANTS: Mapping[str, str] = MappingProxyType(
+    {
+        tail: sibling
+        for key in KEY_TOPICS
+        if f"{key}/state" in KEY_TOPICS[key].tails and key in KEY_TOPICS[key].tails
+        for tail, sibling in ((key, f"{key}/state"), (f"{key}/state", key))
+    }
+)
+_NO_VARIANTS: Mapping[str, str] = MappingProxyType({})
+
+PLATFORM_KEYS: Mapping[Platform, tuple[str, ...]] = MappingProxyType(
+    {
+        platform: tuple(key for key, topics in KEY_TOPICS.items() if topics.platform is platform)
+        for platform in PLATFORM_TAIL_SUFFIXES
+    }
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TopicPlan:
+    """Topics of one config entry.
+
+    Without ``serial`` the entry runs in hub mode and serves every serial
+    publishing under ``prefix``.
+    """
+
+    prefix: str
+    serial: str | None = None
+    detect_state_variant: bool = True
+
+    @property
+    def subscription(self) -> str:
+        """Return the wildcard topic the entry subscribes to."""
+        return f"{self.prefix}/{self.serial or '+'}/#"
+
+    @property
+    def keys(self) -> Mapping[str, KeyTopics]:
+        """Return the topic tails of every key."""
+        return KEY_TOPICS
+
+    @property
+    def availability_tails(self) -> frozenset[str]:
+        """Return the tails the device publishes its availability on."""
+        return frozenset(KEY_TOPICS[AVAILABILITY_KEY].tails)
+
+    @property
+    def state_variants(self) -> Mapping[str, str]:
+        """Return the tails whose variant is detected, with their sibling."""
+        return STATE_VARIANTS if self.detect_state_variant else _NO_VARIANTS
+
+    def platform_keys(self, platform: Platform) -> tuple[str, ...]:
+        """Return the keys with an entity on ``platform``, in table order."""
+        return PLATFORM_KEYS[platform]
+
+    def device_topic(self, serial: str) -> str:
+        """Return the ``<prefix>/<serial>`` base topic of a device."""
+        return f"{self.prefix}/{serial}"
+
+    def command_topics(self, serial: str) -> Mapping[str, str]:
+        """Return the full command topic of every writable key of a device."""
+        base = self.device_topic(serial)
+        return MappingProxyType(
+            {
+                key: f"{base}/{topics.command_tail}"
+                for key, topics in KEY_TOPICS.items()
+                if topics.command_tail is not None
+            }
+        )
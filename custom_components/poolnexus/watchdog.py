@@ -0,0 +1,169 @@
+"""Staleness watchdog for the PoolNexus integration.
+
+Keys declaring ``stale_after`` in SENSOR_TYPES are watched per device: when
+no message arrived on the key for that long, its entity becomes unavailable
+until the device publishes it again, so a hung controller does not keep its
+last pH forever.
+
+Every watched key of every entry shares one hashed timer wheel per Home
+Assistant instance, ticking every `WATCHDOG_RESOLUTION` seconds while it
+holds timers, instead of one scheduled callback per key. Messages do not
+touch the wheel: the hub only stores the time of the last message in the
+key's `KeyWatch`. When its slot comes up, a watch whose key was received
+since moves to its new deadline; only a key silent for the whole interval
+becomes stale.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import timedelta
+import logging
+import math
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, WATCHDOG_RESOLUTION, WATCHDOG_WHEEL_SLOTS
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_TIMER_WHEEL = f"{DOMAIN}_timer_wheel"
+
+
+class KeyWatch:
+    """Deadline of one watched key of a device."""
+
+    __slots__ = ("serial", "key", "interval", "last_seen", "stale", "tick", "slot", "_on_stale")
+
+    def __init__(
+        self, serial: str, key: str, interval: float, on_stale: Callable[[KeyWatch], None]
+    ) -> None:
+        """Initialize the watch, counting the interval from now."""
+        self.serial = serial
+        self.key = key
+        self.interval = interval
+        # time.monotonic() of the last message of the key
+        self.last_seen = time.monotonic()
+        self.stale = False
+        # Wheel tick and slot while scheduled, slot -1 otherwise
+        self.tick = 0
+        self.slot = -1
+        self._on_stale = on_stale
+
+    @property
+    def deadline(self) -> float:
+        """Return the time the key becomes stale if nothing arrives."""
+        return self.last_seen + self.interval
+
+    def expire(self, wheel: TimerWheel, now: float) -> None:
+        """Handle the watch's slot coming up."""
+        deadline = self.deadline
+        if deadline > now:
+            # Received since it was scheduled
+            wheel.schedule(self, deadline)
+            return
+        self.stale = True
+        self._on_stale(self)
+
+
+class TimerWheel:
+    """Hashed timer wheel of `KeyWatch` deadlines.
+
+    Slot ``n`` holds the watches due in tick ``n`` modulo the number of
+    slots; a watch further away than one revolution stays in its slot until
+    its own tick comes. Deadlines are rounded up to the next tick, so a
+    watch never expires early nor waits for another revolution.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        resolution: float = WATCHDOG_RESOLUTION,
+        slots: int = WATCHDOG_WHEEL_SLOTS,
+    ) -> None:
+        """Initialize the wheel, not ticking until a watch is scheduled."""
+        self._hass = hass
+        self._resolution = resolution
+        self._slots: list[set[KeyWatch]] = [set() for _ in range(slots)]
+        self._count = 0
+        # Last tick processed
+        self._tick = int(time.monotonic() / resolution)
+        self._cancel_tick: CALLBACK_TYPE | None = None
+
+    def __len__(self) -> int:
+        """Return the number of scheduled watches."""
+        return self._count
+
+    @callback
+    def schedule(self, watch: KeyWatch, when: float) -> None:
+        """Schedule ``watch`` to expire at ``when`` (time.monotonic())."""
+        if watch.slot >= 0:
+            self.cancel(watch)
+        start = self._cancel_tick is None
+        if start:
+            # Stopped: the last tick processed is out of date
+            self._tick = int(time.monotonic() / self._resolution)
+        # Never in a tick already processed
+        tick = max(math.ceil(when / self._resolution), self._tick + 1)
+        watch.tick = tick
+        watch.slot = tick % len(self._slots)
+        self._slots[watch.slot].add(watch)
+        self._count += 1
+        if start:
+            self._cancel_tick = async_track_time_interval(
+                self._hass,
+                self._async_tick,
+                timedelta(seconds=self._resolution),
+                name="PoolNexus staleness watchdog",
+                cancel_on_shutdown=True,
+            )
+
+    @callback
+    def cancel(self, watch: KeyWatch) -> None:
+        """Unschedule ``watch`` if scheduled."""
+        if watch.slot < 0:
+            return
+        self._slots[watch.slot].discard(watch)
+        watch.slot = -1
+        self._count -= 1
+        if not self._count:
+            self._async_stop()
+
+    @callback
+    def _async_tick(self, _now: Any) -> None:
+        """Expire the watches of the ticks elapsed since the last one."""
+        now = time.monotonic()
+        current = int(now / self._resolution)
+        slots = self._slots
+        # A whole revolution visits every slot once
+        first = max(self._tick + 1, current - len(slots) + 1)
+        self._tick = current
+        for tick in range(first, current + 1):
+            slot = slots[tick % len(slots)]
+            if not slot:
+                continue
+            # Watches of a later revolution stay
+            for watch in [watch for watch in slot if watch.tick <= current]:
+                slot.discard(watch)
+                watch.slot = -1
+                self._count -= 1
+                watch.expire(self, now)
+        if not self._count:
+            self._async_stop()
+
+    @callback
+    def _async_stop(self) -> None:
+        if self._cancel_tick is not None:
+            self._cancel_tick()
+            self._cancel_tick = None
+
+
+@callback
+def async_get_timer_wheel(hass: HomeAssistant) -> TimerWheel:
+    """Return the timer wheel shared by every entry."""
+    wheel: TimerWheel | None = hass.data.get(DATA_TIMER_WHEEL)
+    if wheel is None:
+        wheel = hass.data[DATA_TIMER_WHEEL] = TimerWheel(hass)
+    return wheel
@@ -0,0 +1,36 @@
+"""Fixtures for the PoolNexus tests."""
+from __future__ import annotations
+
+from collections.abc import Generator
+
+import pytest
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.core import HomeAssistant
+
+from custom_components.poolnexus.hub import PoolNexusHub
+from custom_components.poolnexus.topics import TopicPlan
+
+PREFIX = "poolnexus"
+SERIAL = "SN0001"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load custom_components/poolnexus in every test."""
+    yield
+
+
+def make_message(topic: str, payload: bytes | str) -> ReceiveMessage:
+    """Return a message as delivered by the MQTT integration with encoding=None."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return ReceiveMessage(topic, payload, 0, False, f"{PREFIX}/{SERIAL}/#", 0.0)
+
+
+@pytest.fixture
+def hub(hass: HomeAssistant) -> Generator[PoolNexusHub, None, None]:
+    """Return a single-device hub, not subscribed, stopped at teardown."""
+    hub = PoolNexusHub(hass, "entry", TopicPlan(PREFIX, SERIAL))
+    yield hub
+    hub.async_stop()
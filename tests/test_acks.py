@@ -0,0 +1,129 @@
+"""Tests for the command acknowledgement tracker."""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.poolnexus.acks import NO_STATE, CommandTracker, LatencyHistogram
+from custom_components.poolnexus.const import COMMAND_ACK_TIMEOUT
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+
+def _expire(hass: HomeAssistant) -> None:
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=COMMAND_ACK_TIMEOUT + 1))
+
+
+def test_latency_histogram() -> None:
+    """Latencies land in the first bucket whose bound is not below them."""
+    histogram = LatencyHistogram((0.1, 1.0))
+    for latency in (0.05, 0.1, 0.5, 3.0):
+        histogram.record(latency)
+    assert histogram.buckets == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.maximum == 3.0
+    assert histogram.as_dict()["buckets"] == {"le_100ms": 2, "le_1000ms": 1, "inf": 1}
+    assert histogram.as_dict()["mean_ms"] == 912.5
+
+
+async def test_report_acknowledges(hass: HomeAssistant) -> None:
+    """The commanded value reported by the device settles the command."""
+    tracker = CommandTracker(hass)
+    tracker.async_command("pump", True, False)
+    assert tracker.pending.keys() == {"pump"}
+    tracker.async_reported("pump", True)
+    assert not tracker.pending
+    assert tracker.acknowledged == 1
+    assert tracker.latency["pump"].count == 1
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 0
+
+
+async def test_latency_counts_from_the_publish(hass: HomeAssistant) -> None:
+    """The time spent in the command queue is not acknowledgement latency."""
+    tracker = CommandTracker(hass)
+    clock = Mock(monotonic=Mock(return_value=100.0))
+    with patch("custom_components.poolnexus.acks.time", clock):
+        tracker.async_command("pump", True, False)
+        clock.monotonic.return_value = 100.05
+        tracker.async_published("pump")
+        clock.monotonic.return_value = 100.25
+        tracker.async_reported("pump", True)
+    assert round(tracker.last_latency, 6) == 0.2
+
+
+async def test_failed_publish_reverts(hass: HomeAssistant) -> None:
+    """A command never published is settled and reverted at once."""
+    revert = Mock()
+    tracker = CommandTracker(hass)
+    tracker.async_command("pump", True, False, revert)
+    tracker.async_failed("pump")
+    assert not tracker.pending
+    assert tracker.failed == 1
+    revert.assert_called_once_with(False)
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 0
+
+
+async def test_other_value_does_not_acknowledge(hass: HomeAssistant) -> None:
+    """The previous state republished before the command applies is not an ack."""
+    revert = Mock()
+    tracker = CommandTracker(hass, revert_on_timeout=True)
+    tracker.async_command("pump", True, False, revert)
+    tracker.async_reported("pump", False)
+    assert "pump" in tracker.pending
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.timeouts == {"pump": 1}
+    assert tracker.reverted == 1
+    revert.assert_called_once_with(False)
+
+
+async def test_timeout_without_revert(hass: HomeAssistant) -> None:
+    """Without revert_on_timeout a timeout is only counted."""
+    revert = Mock()
+    tracker = CommandTracker(hass)
+    tracker.async_command("pump", True, False, revert)
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 1
+    revert.assert_not_called()
+
+
+async def test_no_revert_without_reported_state(hass: HomeAssistant) -> None:
+    """Nothing to revert to before the device reported anything."""
+    revert = Mock()
+    tracker = CommandTracker(hass, revert_on_timeout=True)
+    tracker.async_command("pump", True, NO_STATE, revert)
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 1
+    revert.assert_not_called()
+
+
+async def test_new_command_replaces_pending(hass: HomeAssistant) -> None:
+    """A second command keeps the state to revert to and one timer."""
+    revert = Mock()
+    tracker = CommandTracker(hass, revert_on_timeout=True)
+    tracker.async_command("pump", True, False, revert)
+    tracker.async_command("pump", False, True, revert)
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 1
+    revert.assert_called_once_with(False)
+
+
+async def test_cancel(hass: HomeAssistant) -> None:
+    """Cancelling drops the pending commands and their timers."""
+    tracker = CommandTracker(hass)
+    tracker.async_command("pump", True, False)
+    tracker.async_cancel()
+    assert not tracker.pending
+    _expire(hass)
+    await hass.async_block_till_done()
+    assert tracker.total_timeouts == 0
@@ -0,0 +1,125 @@
+"""Tests for the write-behind command queue."""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.poolnexus.acks import CommandTracker
+from custom_components.poolnexus.commands import CommandQueue
+from custom_components.poolnexus.const import DEFAULT_COMMAND_WINDOW
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+TOPIC = "poolnexus/SN0001/pump/set"
+OTHER_TOPIC = "poolnexus/SN0001/set_ph/set"
+
+
+async def test_commands_are_batched_after_the_window(hass: HomeAssistant) -> None:
+    """Commands wait for the window, the last value per topic wins."""
+    queue = CommandQueue(hass)
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()) as publish:
+        queue.async_enqueue(TOPIC, "ON")
+        queue.async_enqueue(OTHER_TOPIC, "07.2")
+        queue.async_enqueue(TOPIC, "OFF")
+        assert queue.depth == 2
+        await hass.async_block_till_done()
+        publish.assert_not_called()
+
+        async_fire_time_changed(
+            hass, dt_util.utcnow() + timedelta(seconds=DEFAULT_COMMAND_WINDOW * 2)
+        )
+        await hass.async_block_till_done()
+
+    assert sorted(call.args[1:] for call in publish.call_args_list) == [
+        (TOPIC, "OFF"),
+        (OTHER_TOPIC, "07.2"),
+    ]
+    assert all(call.kwargs == {"retain": True} for call in publish.call_args_list)
+    assert queue.depth == 0
+    assert queue.stats["enqueued"] == 3
+    assert queue.stats["collapsed"] == 1
+    assert queue.stats["published"] == 2
+    assert queue.stats["flushes"] == 1
+
+
+async def test_flush_now(hass: HomeAssistant) -> None:
+    """An explicit flush publishes right away and cancels the timer."""
+    queue = CommandQueue(hass)
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()) as publish:
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+        publish.assert_called_once()
+        # Nothing left to publish when the window would have ended
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=1))
+        await hass.async_block_till_done()
+    publish.assert_called_once()
+
+
+async def test_echo_is_consumed_once(hass: HomeAssistant) -> None:
+    """The echo of a published command is recognized, once."""
+    queue = CommandQueue(hass)
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()):
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+    assert queue.in_flight
+    assert queue.async_consume_echo(TOPIC, b"ON")
+    assert not queue.async_consume_echo(TOPIC, b"ON")
+    assert queue.stats["echoes"] == 1
+
+
+async def test_other_payload_is_not_an_echo(hass: HomeAssistant) -> None:
+    """A different payload on the /set topic is a change made elsewhere."""
+    queue = CommandQueue(hass)
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()):
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+    assert not queue.async_consume_echo(TOPIC, b"OFF")
+    # The in-flight command is settled either way
+    assert not queue.in_flight
+    assert not queue.async_consume_echo(OTHER_TOPIC, b"07.2")
+
+
+async def test_late_echo_is_dispatched(hass: HomeAssistant) -> None:
+    """An echo arriving after COMMAND_ECHO_TIMEOUT is not dropped."""
+    queue = CommandQueue(hass)
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()):
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+    # Deadline (COMMAND_ECHO_TIMEOUT after the flush) already passed
+    queue.in_flight[TOPIC] = (b"ON", 0.0)
+    assert not queue.async_consume_echo(TOPIC, b"ON")
+
+
+async def test_failed_publish(hass: HomeAssistant) -> None:
+    """A failed publish is counted and not kept in flight."""
+    queue = CommandQueue(hass)
+    with patch(
+        "custom_components.poolnexus.commands.async_publish",
+        AsyncMock(side_effect=OSError("broker gone")),
+    ):
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+    assert queue.stats["failed"] == 1
+    assert queue.stats["published"] == 0
+    assert not queue.in_flight
+
+
+async def test_publishes_are_reported_to_the_tracker(hass: HomeAssistant) -> None:
+    """Published commands start their ack clock, failed ones are settled."""
+    tracker = Mock(spec=CommandTracker)
+    queue = CommandQueue(hass, tracker=tracker)
+    with patch(
+        "custom_components.poolnexus.commands.async_publish",
+        AsyncMock(side_effect=[None, OSError("broker gone")]),
+    ):
+        queue.async_enqueue(OTHER_TOPIC, "07.2")
+        queue.async_enqueue(TOPIC, "ON")
+        await queue.async_flush()
+    assert [call.args for call in tracker.async_published.call_args_list] == [
+        ("set_ph",),
+        ("pump",),
+    ]
+    tracker.async_failed.assert_called_once_with("pump")
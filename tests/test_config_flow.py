@@ -0,0 +1,57 @@
+"""Tests for the PoolNexus options flow."""
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.poolnexus.config_flow import OptionsFlowHandler
+from custom_components.poolnexus.const import (
+    CONF_DETECT_STATE_VARIANT,
+    CONF_LOOP_BUDGET,
+    CONF_MQTT_BROKER,
+    CONF_PROFILING,
+    CONF_REVERT_ON_TIMEOUT,
+    CONF_SERIAL,
+    DOMAIN,
+)
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import SERIAL
+
+
+async def test_options_flow(hass: HomeAssistant) -> None:
+    """The form defaults to the entry's values and saves the options."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_MQTT_BROKER: "broker",
+            CONF_SERIAL: SERIAL,
+            CONF_DETECT_STATE_VARIANT: False,
+        },
+    )
+    entry.add_to_hass(hass)
+    flow = OptionsFlowHandler(entry)
+    flow.hass = hass
+
+    result = await flow.async_step_init()
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "init"
+    defaults = {key: key.default() for key in result["data_schema"].schema}
+    # Entries created before the options flow hold the values in their data
+    assert defaults == {
+        CONF_DETECT_STATE_VARIANT: False,
+        CONF_REVERT_ON_TIMEOUT: False,
+        CONF_PROFILING: False,
+        CONF_LOOP_BUDGET: 5.0,
+    }
+
+    options = {
+        CONF_DETECT_STATE_VARIANT: True,
+        CONF_REVERT_ON_TIMEOUT: True,
+        CONF_PROFILING: True,
+        CONF_LOOP_BUDGET: 2.5,
+    }
+    result = await flow.async_step_init(options)
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"] == options
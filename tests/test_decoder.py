@@ -0,0 +1,132 @@
+"""Tests for the payload decoders."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.poolnexus.const import (
+    SELECT_TYPES,
+    SENSOR_TYPES,
+    SWITCH_TYPES,
+    TEXT_TYPES,
+)
+from custom_components.poolnexus.decoder import (
+    DECODERS,
+    INVALID,
+    decode_bool,
+    decode_float,
+    decode_json,
+    decode_text,
+    decode_timestamp,
+    validate_text,
+)
+
+
+@pytest.mark.parametrize(
+    ("payload", "expected"),
+    [
+        (b"7.2", 7.2),
+        (b" 25 ", 25.0),
+        (b"-1.5", -1.5),
+        (b".5", 0.5),
+        (b"1e3", 1000.0),
+    ],
+)
+def test_decode_float(payload: bytes, expected: float) -> None:
+    """Numeric payloads decode to floats."""
+    assert decode_float(payload) == expected
+
+
+@pytest.mark.parametrize("payload", [b"", b"abc", b"7.2.1", b"nan", b"inf", b"1,5"])
+def test_decode_float_invalid(payload: bytes) -> None:
+    """Anything but a plain number is INVALID, never an exception."""
+    assert decode_float(payload) is INVALID
+
+
+@pytest.mark.parametrize(
+    ("payload", "expected"),
+    [
+        (b"ON", True),
+        (b"off", False),
+        (b"True", True),
+        (b"false", False),
+        (b"1", True),
+        (b"0", False),
+        (b"locked", True),
+        (b"UNLOCKED", False),
+        (b" on ", True),
+        (b"2", True),
+        (b"0.0", False),
+        (b"garbage", False),
+    ],
+)
+def test_decode_bool(payload: bytes, expected: bool) -> None:
+    """Switch states accept the usual spellings; unknown payloads are off."""
+    assert decode_bool(payload) is expected
+
+
+def test_decode_text() -> None:
+    """Text payloads are stripped, invalid UTF-8 is replaced."""
+    assert decode_text(b"  v1.2.3\n") == "v1.2.3"
+    assert decode_text(b"\xffabc") == "�abc"
+
+
+def test_decode_timestamp() -> None:
+    """Device times decode to aware datetimes in the configured time zone."""
+    value = decode_timestamp(b"17/10/26 08:05")
+    assert value == datetime(2026, 10, 17, 8, 5, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    assert decode_timestamp(b"17/10/26 08:05") is value
+
+
+@pytest.mark.parametrize(
+    "payload", [b"", b"2026-10-17 08:05", b"31/02/26 08:05", b"17/13/26 08:05", b"17/10/26 24:00"]
+)
+def test_decode_timestamp_invalid(payload: bytes) -> None:
+    """Malformed or impossible device times are INVALID."""
+    assert decode_timestamp(payload) is INVALID
+
+
+def test_decode_json() -> None:
+    """Only JSON objects and arrays decode."""
+    assert decode_json(b'{"type": "ph_low"}') == {"type": "ph_low"}
+    assert decode_json(b" [1, 2]") == [1, 2]
+    assert decode_json(b"42") is INVALID
+    assert decode_json(b"{broken") is INVALID
+
+
+def test_decoder_table_covers_every_key() -> None:
+    """Every entity key has a decoder of the expected type."""
+    assert set(DECODERS) == {*SENSOR_TYPES, *SWITCH_TYPES, *TEXT_TYPES, *SELECT_TYPES}
+    assert DECODERS["ph"] is decode_float
+    assert DECODERS["firmware"] is decode_text
+    assert DECODERS["last_pH_prob_cal"] is decode_timestamp
+    assert DECODERS["alert"] is decode_json
+    assert DECODERS["pump"] is decode_bool
+    assert DECODERS["set_ph"] is decode_text
+
+
+def test_enum_decoder() -> None:
+    """Selects only accept their configured options."""
+    decode = DECODERS["operating_mode"]
+    assert decode(b"normal ") == "normal"
+    assert decode(b"turbo") is INVALID
+
+
+@pytest.mark.parametrize(
+    ("text_type", "value", "valid"),
+    [
+        ("set_ph", "07.2", True),
+        ("set_ph", "7.2", False),
+        ("set_redox", "6.500", True),
+        ("set_redox", "6.5", False),
+        ("set_temperature", "25.0", True),
+        ("set_temperature", "25", False),
+        ("unknown", "anything", True),
+    ],
+)
+def test_validate_text(text_type: str, value: str, valid: bool) -> None:
+    """Setpoints must match the device formats."""
+    assert validate_text(text_type, value) is valid
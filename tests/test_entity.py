@@ -0,0 +1,189 @@
+"""Tests for the state write policy of the PoolNexus entities."""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.poolnexus.decoder import DECODERS, INVALID
+from custom_components.poolnexus.entity import PoolNexusEntity
+from custom_components.poolnexus.hub import PoolNexusHub
+from custom_components.poolnexus.sensor import PoolNexusSensor
+from custom_components.poolnexus.switch import PoolNexusSwitch
+from custom_components.poolnexus.text import PoolNexusText
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .conftest import PREFIX, SERIAL, make_message
+
+TOPIC = f"{PREFIX}/{SERIAL}"
+
+
+def _entity(hass: HomeAssistant, entity):
+    """Attach ``entity`` to hass with its state writes recorded."""
+    entity.hass = hass
+    entity.entity_id = f"sensor.{entity.unique_id}"
+    entity.async_write_ha_state = Mock()
+    return entity
+
+
+async def test_platform_hooks_are_abstract(hub: PoolNexusHub) -> None:
+    """An entity class must implement the message and value hooks."""
+
+    class _NoApply(PoolNexusEntity):
+        def _message_received(self, msg) -> None:
+            pass
+
+    with pytest.raises(TypeError, match="_apply_value"):
+        _NoApply(hub, hub.device(SERIAL), "ph", "pH")
+
+
+async def test_unchanged_values_are_not_written(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A value equal to the last written one is suppressed."""
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "ph"))
+    for payload in ("7.2", "7.2", "7.3", "7.3"):
+        sensor._message_received(make_message(f"{TOPIC}/ph", payload))
+    assert sensor.async_write_ha_state.call_count == 2
+    assert sensor.state_writes == 2
+    assert sensor.suppressed_writes == 2
+    assert sensor.native_value == 7.3
+    assert hub.device(SERIAL).metrics.suppressed_writes == 2
+
+
+async def test_deadband(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """Changes within the deadband of the last written value are suppressed."""
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "temperature"))
+    assert sensor._deadband == 0.1
+    for payload in ("25.0", "25.05", "25.09", "25.2"):
+        sensor._message_received(make_message(f"{TOPIC}/temperature", payload))
+    # The reference stays 25.0 until 25.2 leaves the deadband
+    assert sensor.state_writes == 2
+    assert sensor.suppressed_writes == 2
+    assert sensor.native_value == 25.2
+
+
+async def test_invalid_payload(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A numeric sensor receiving text is counted and set to unknown."""
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "ph"))
+    sensor._message_received(make_message(f"{TOPIC}/ph", "n/a"))
+    assert sensor.native_value is None
+    assert hub.device(SERIAL).metrics.parse_failures == 1
+
+
+async def test_min_write_interval_coalesces(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """Writes closer than the interval end in one trailing write of the latest value."""
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "ph"))
+    sensor._min_write_interval = 10
+    for payload in ("7.0", "7.1", "7.2", "7.3"):
+        sensor._message_received(make_message(f"{TOPIC}/ph", payload))
+    assert sensor.state_writes == 1
+    assert sensor.suppressed_writes == 3
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
+    assert sensor.state_writes == 2
+    assert sensor.native_value == 7.3
+    assert sensor._cancel_trailing_write is None
+
+
+async def test_trailing_write_skipped_when_back_to_written(
+    hass: HomeAssistant, hub: PoolNexusHub
+) -> None:
+    """No trailing write when the burst ends on the value already written."""
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "ph"))
+    sensor._min_write_interval = 10
+    for payload in ("7.0", "7.5", "7.0"):
+        sensor._message_received(make_message(f"{TOPIC}/ph", payload))
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
+    assert sensor.state_writes == 1
+
+
+async def test_switch_uses_the_decoder_table(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A per-key decoder override applies to switches too."""
+    decode = Mock(side_effect=[True, INVALID])
+    with patch.dict(DECODERS, {"switch_1": decode}):
+        switch = _entity(hass, PoolNexusSwitch(hub, hub.device(SERIAL), "switch_1"))
+    switch._message_received(make_message(f"{TOPIC}/switch_1/state", "running"))
+    assert switch.is_on
+    switch._message_received(make_message(f"{TOPIC}/switch_1/state", "???"))
+    assert switch.is_on
+    assert hub.device(SERIAL).metrics.parse_failures == 1
+    assert decode.call_count == 2
+
+
+async def test_registered_handler_receives_replay(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """Messages received before the entity is added are replayed on registration."""
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.4"))
+    sensor = _entity(hass, PoolNexusSensor(hub, hub.device(SERIAL), "ph"))
+    await sensor.async_added_to_hass()
+    assert sensor.native_value == 7.4
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.5"))
+    assert sensor.native_value == 7.5
+    await sensor.async_will_remove_from_hass()
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.6"))
+    assert sensor.native_value == 7.5
+
+
+async def test_only_live_samples_are_recorded(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """Replayed and deferred messages are not added to the statistics and history."""
+    device = hub.device(SERIAL)
+    window = device.statistics.window("ph", 3600)
+    raw = device.history.keys["ph"].tiers["raw"]
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.4"))
+    sensor = _entity(hass, PoolNexusSensor(hub, device, "ph"))
+    await sensor.async_added_to_hass()
+    assert sensor.native_value == 7.4
+    assert window.summary().count == 0
+    assert len(raw) == 0
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.5"))
+    assert window.summary().count == 1
+    assert len(raw) == 1
+    # Received while offline, dispatched when the device is back
+    hub._async_message_received(make_message(f"{TOPIC}/availability", "offline"))
+    hub._async_message_received(make_message(f"{TOPIC}/ph", "7.6"))
+    hub._async_message_received(make_message(f"{TOPIC}/availability", "online"))
+    assert sensor.native_value == 7.6
+    assert window.summary().count == 1
+    assert len(raw) == 1
+    assert not device.replaying
+    await sensor.async_will_remove_from_hass()
+
+
+async def test_command_echo_is_dropped(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """The hub drops the echo of our own command on the /set topic."""
+    device = hub.device(SERIAL)
+    text = _entity(hass, PoolNexusText(hub, device, "set_ph"))
+    await text.async_added_to_hass()
+    handler = device.handlers["set_ph/set"] = Mock(wraps=device.handlers["set_ph/set"])
+    device.commands.in_flight[f"{TOPIC}/set_ph/set"] = (b"07.2", float("inf"))
+    hub._async_message_received(make_message(f"{TOPIC}/set_ph/set", "07.2"))
+    handler.assert_not_called()
+    assert device.commands.echoes == 1
+    # Without a command in flight the retained /set value is dispatched
+    hub._async_message_received(make_message(f"{TOPIC}/set_ph/set", "07.4"))
+    handler.assert_called_once()
+    assert text.native_value == "07.4"
+    await text.async_will_remove_from_hass()
+
+
+async def test_switch_command(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A switch shows the commanded state and queues the command."""
+    device = hub.device(SERIAL)
+    switch = _entity(hass, PoolNexusSwitch(hub, device, "switch_1"))
+    await switch.async_added_to_hass()
+    await switch.async_turn_on()
+    assert switch.is_on
+    assert device.commands.depth == 1
+    assert "switch_1" in device.acks.pending
+    with patch("custom_components.poolnexus.commands.async_publish", AsyncMock()) as publish:
+        await device.commands.async_flush()
+    publish.assert_called_once_with(hass, f"{TOPIC}/switch_1/set", "ON", retain=True)
+    hub._async_message_received(make_message(f"{TOPIC}/switch_1/state", "ON"))
+    assert not device.acks.pending
+    assert device.acks.acknowledged == 1
+    await switch.async_will_remove_from_hass()
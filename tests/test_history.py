@@ -0,0 +1,91 @@
+"""Tests for the in-memory telemetry history."""
+from __future__ import annotations
+
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.poolnexus.api import _timestamp
+from custom_components.poolnexus.const import HISTORY_MEMORY_BUDGET
+from custom_components.poolnexus.history import DeviceHistory, HistoryRing, KeyHistory
+
+
+def test_ring_overwrites_the_oldest() -> None:
+    """A full ring keeps the latest points in time order."""
+    ring = HistoryRing(3)
+    for t in range(5):
+        ring.append(float(t), t * 10.0)
+    assert len(ring) == 3
+    assert ring.oldest == 2.0
+    assert ring.range(0, 10) == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert ring.range(2.5, 3.5) == [(3.0, 30.0)]
+
+
+def test_downsampled_tiers() -> None:
+    """Aggregated tiers hold bucket means, including the bucket in progress."""
+    history = KeyHistory(16 * 4000)
+    for t in range(0, 180, 10):
+        history.add(1_000_020.0 + t, float(t))
+    tier, points = history.query(1_000_000.0, 1_000_300.0, "1min")
+    assert tier == "1min"
+    # 1_000_020 starts a minute: 3 buckets of 6 samples, the last in progress
+    assert points == [(1_000_020.0, 25.0), (1_000_080.0, 85.0), (1_000_140.0, 145.0)]
+
+
+def test_tier_selection() -> None:
+    """The raw tier is used until it no longer reaches back to the start."""
+    history = KeyHistory(16 * 40)
+    raw = history.tiers["raw"]
+    for t in range(0, 10_000, 10):
+        history.add(float(t), 1.0)
+    assert len(raw) == raw.capacity
+    assert history.select_tier(raw.oldest) == "raw"
+    assert history.select_tier(raw.oldest - 100) == "1min"
+
+
+def test_device_history_budget() -> None:
+    """A device never allocates more than its memory budget."""
+    history = DeviceHistory()
+    assert set(history.keys) == {"temperature", "ph", "chlorine"}
+    assert history.memory <= HISTORY_MEMORY_BUDGET
+    history.add("ph", 7.2, 100.0)
+    assert history.keys["ph"].query(0, 200, "raw") == ("raw", [(100.0, 7.2)])
+
+
+async def test_naive_service_datetimes_are_local(hass: HomeAssistant) -> None:
+    """Naive start/end are read in the Home Assistant time zone."""
+    hass.config.set_time_zone("Europe/Paris")
+    local = datetime(2025, 6, 1, 8, 0)
+    assert _timestamp(local) == datetime(2025, 6, 1, 6, 0, tzinfo=dt_util.UTC).timestamp()
+    assert _timestamp(dt_util.as_utc(local)) == _timestamp(local)
+    assert _timestamp(None) is None
+
+
+def test_samples_stay_in_time_order() -> None:
+    """A sample older than the previous one is moved to its time."""
+    history = KeyHistory(16 * 4000)
+    history.add(1_000_100.0, 1.0)
+    history.add(1_000_040.0, 2.0)
+    history.add(1_000_110.0, 3.0)
+    assert history.query(0, 2_000_000, "raw")[1] == [
+        (1_000_100.0, 1.0),
+        (1_000_100.0, 2.0),
+        (1_000_110.0, 3.0),
+    ]
+    assert history.query(1_000_100.0, 1_000_100.0, "raw")[1] == [
+        (1_000_100.0, 1.0),
+        (1_000_100.0, 2.0),
+    ]
+
+
+def test_wall_clock_steps_are_ignored() -> None:
+    """Live samples are timed on the monotonic clock."""
+    clock = Mock(time=Mock(return_value=1_000_000.0), monotonic=Mock(return_value=50.0))
+    with patch("custom_components.poolnexus.history.time", clock):
+        history = DeviceHistory()
+        clock.time.return_value = 990_000.0
+        clock.monotonic.return_value = 60.0
+        history.add("ph", 7.2)
+    assert history.keys["ph"].query(0, 2_000_000, "raw")[1] == [(1_000_010.0, 7.2)]
@@ -0,0 +1,105 @@
+"""Tests for the PoolNexus hub dispatcher."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, Mock, patch
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.poolnexus.hub import PoolNexusHub
+from custom_components.poolnexus.sensor import PoolNexusSensor
+from custom_components.poolnexus.topics import TopicPlan
+
+from .conftest import PREFIX, SERIAL, make_message
+
+NEW_SERIAL = "SN0002"
+TOPIC = f"{PREFIX}/{NEW_SERIAL}"
+
+
+async def test_first_message_of_new_device_is_dispatched(hass: HomeAssistant) -> None:
+    """In hub mode the discovering message reaches the handlers and the watch."""
+    hub = PoolNexusHub(hass, "entry", TopicPlan(PREFIX))
+    handler = Mock()
+
+    def _listener(serial: str) -> None:
+        hub.async_register(serial, ("ph",), handler)
+
+    hub.async_add_device_listener(_listener)
+    msg = make_message(f"{TOPIC}/ph", "7.2")
+    with patch("custom_components.poolnexus.hub.time", Mock(monotonic=Mock(return_value=5000.0))):
+        hub._async_message_received(msg)
+    try:
+        device = hub.device(NEW_SERIAL)
+        handler.assert_called_once_with(msg)
+        assert device.last_messages["ph"] is msg
+        assert device.watches["ph"].last_seen == 5000.0
+        assert device.metrics.messages == 1
+    finally:
+        hub.async_stop()
+
+
+async def test_unknown_key_creates_no_device(hass: HomeAssistant) -> None:
+    """Stray topics under the prefix do not spawn devices."""
+    hub = PoolNexusHub(hass, "entry", TopicPlan(PREFIX))
+    hub._async_message_received(make_message(f"{TOPIC}/unknown", "1"))
+    assert hub.serials == []
+    hub.async_stop()
+
+
+async def test_restored_offline_availability(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A device saved offline starts offline, deferring its traffic."""
+    hub._snapshot = Mock(
+        async_load=AsyncMock(return_value={SERIAL: {"availability": "offline", "ph": "7.2"}})
+    )
+    await hub._async_restore_snapshot()
+    device = hub.device(SERIAL)
+    assert not device.available
+    assert hub.diagnostics()["devices"][SERIAL]["stale_topics"] == ["availability", "ph"]
+    handler = Mock()
+    hub.async_register(SERIAL, ("ph",), handler)
+    handler.assert_called_once()
+    hub._async_message_received(make_message(f"{PREFIX}/{SERIAL}/ph", "7.3"))
+    assert "ph" in device.deferred
+    hub._async_message_received(make_message(f"{PREFIX}/{SERIAL}/availability", "online"))
+    assert device.available
+    assert handler.call_count == 2
+
+
+async def test_entity_counters_per_topic(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """Parse failures and state writes are charged to the dispatched topic."""
+    sensor = PoolNexusSensor(hub, hub.device(SERIAL), "ph")
+    sensor.hass = hass
+    sensor.entity_id = "sensor.ph"
+    sensor.async_write_ha_state = Mock()
+    hub.async_register(SERIAL, ("ph",), sensor._message_received)
+    for payload in ("7.2", "7.2", "n/a", "7.3"):
+        hub._async_message_received(make_message(f"{PREFIX}/{SERIAL}/ph", payload))
+    metrics = hub.device(SERIAL).metrics
+    topic = metrics.as_dict()["topics"]["ph"]
+    assert topic["messages"] == 4
+    assert topic["parse_failures"] == 1
+    assert topic["state_writes"] == 3
+    assert metrics.dispatching is None
+    # Writes outside a dispatch only count per device
+    sensor._async_write_now(7.4)
+    assert metrics.state_writes == 4
+    assert metrics.topics["ph"].state_writes == 3
+
+
+async def test_restored_value_is_flagged(hass: HomeAssistant, hub: PoolNexusHub) -> None:
+    """A restored value carries the restored attribute until received live."""
+    hub._snapshot = Mock(async_load=AsyncMock(return_value={SERIAL: {"ph": "7.2"}}))
+    await hub._async_restore_snapshot()
+    sensor = PoolNexusSensor(hub, hub.device(SERIAL), "ph")
+    sensor.hass = hass
+    sensor.entity_id = "sensor.ph"
+    sensor.async_write_ha_state = Mock()
+    await sensor.async_added_to_hass()
+    assert sensor.native_value == 7.2
+    assert sensor.extra_state_attributes == {"restored": True}
+    # The same value from the broker is written to drop the attribute
+    hub._async_message_received(make_message(f"{PREFIX}/{SERIAL}/ph", "7.2"))
+    assert sensor.state_writes == 2
+    assert not sensor.extra_state_attributes
+    hub._async_message_received(make_message(f"{PREFIX}/{SERIAL}/ph", "7.2"))
+    assert sensor.state_writes == 2
+    await sensor.async_will_remove_from_hass()
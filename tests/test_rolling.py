@@ -0,0 +1,115 @@
+"""Tests for the rolling statistics windows."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from custom_components.poolnexus.rolling import DeviceStatistics, RollingWindow
+
+
+def test_empty_window() -> None:
+    """An empty window has no statistics."""
+    summary = RollingWindow(60).summary(0.0)
+    assert summary.count == 0
+    assert summary.mean is None
+    assert summary.minimum is None
+    assert summary.maximum is None
+    assert summary.slope is None
+
+
+def test_mean_min_max() -> None:
+    """Mean, min and max cover the samples of the window."""
+    window = RollingWindow(60)
+    for t, value in enumerate([7.0, 7.4, 6.8, 7.2]):
+        window.add(value, 1000.0 + t)
+    summary = window.summary(1003.0)
+    assert summary.count == 4
+    assert summary.mean == pytest.approx(7.1)
+    assert summary.minimum == 6.8
+    assert summary.maximum == 7.4
+
+
+def test_samples_expire_with_the_duration() -> None:
+    """Samples older than the duration leave the window, min/max follow."""
+    window = RollingWindow(60)
+    window.add(1.0, 0.0)
+    window.add(9.0, 30.0)
+    window.add(5.0, 50.0)
+    assert window.summary(55.0).maximum == 9.0
+    summary = window.summary(85.0)
+    assert summary.count == 2
+    assert summary.minimum == 5.0
+    summary = window.summary(100.0)
+    assert summary.count == 1
+    assert summary.maximum == 5.0
+    assert window.summary(200.0).count == 0
+
+
+def test_capacity_evicts_the_oldest() -> None:
+    """A full ring drops its oldest sample."""
+    window = RollingWindow(3600, capacity=3)
+    for t, value in enumerate([10.0, 1.0, 2.0, 3.0]):
+        window.add(value, float(t))
+    summary = window.summary(3.0)
+    assert summary.count == 3
+    assert summary.maximum == 3.0
+    assert summary.mean == pytest.approx(2.0)
+
+
+def test_slope_in_units_per_hour() -> None:
+    """The least-squares slope is reported per hour once the span is long enough."""
+    window = RollingWindow(3600)
+    window.add(20.0, 0.0)
+    # Burst shorter than a tenth of the window: no slope yet
+    window.add(20.1, 60.0)
+    assert window.summary(60.0).slope is None
+    for minute in range(2, 31):
+        window.add(20.0 + minute * 0.1, minute * 60.0)
+    # 0.1 per minute
+    assert window.summary(1800.0).slope == pytest.approx(6.0)
+
+
+def test_flat_slope() -> None:
+    """Constant values have a zero slope."""
+    window = RollingWindow(600)
+    for t in range(0, 600, 10):
+        window.add(7.2, float(t))
+    assert window.summary(590.0).slope == pytest.approx(0.0, abs=1e-9)
+
+
+def test_running_sums_match_brute_force() -> None:
+    """After many evictions and re-basings the sums still match the samples."""
+    rng = random.Random(4)
+    capacity = 50
+    window = RollingWindow(300, capacity=capacity)
+    samples: list[tuple[float, float]] = []
+    now = 1e6
+    for _ in range(2000):
+        now += rng.uniform(0.5, 10)
+        value = rng.uniform(6.5, 8.0)
+        window.add(value, now)
+        samples.append((now, value))
+    kept = [(t, v) for t, v in samples[-capacity:] if t >= now - 300]
+    summary = window.summary(now)
+    values = [v for _, v in kept]
+    assert summary.count == len(kept)
+    assert summary.mean == pytest.approx(sum(values) / len(values))
+    assert summary.minimum == min(values)
+    assert summary.maximum == max(values)
+    n = len(kept)
+    mean_t = sum(t for t, _ in kept) / n
+    mean_v = sum(values) / n
+    expected = sum((t - mean_t) * (v - mean_v) for t, v in kept) / sum(
+        (t - mean_t) ** 2 for t, _ in kept
+    )
+    assert summary.slope == pytest.approx(expected * 3600, rel=1e-6, abs=1e-9)
+
+
+def test_device_statistics() -> None:
+    """Only keys declaring windows get them, every window receives the samples."""
+    statistics = DeviceStatistics()
+    assert "ph" in statistics.windows
+    assert "firmware" not in statistics.windows
+    statistics.add("ph", 7.1)
+    assert len(statistics.window("ph", 3600)) == 1
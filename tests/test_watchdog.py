@@ -0,0 +1,132 @@
+"""Tests for the staleness timer wheel."""
+from __future__ import annotations
+
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.poolnexus.watchdog import KeyWatch, TimerWheel
+
+
+@pytest.fixture
+def clock() -> Generator[MagicMock, None, None]:
+    """Control the monotonic clock seen by the watchdog."""
+    with patch("custom_components.poolnexus.watchdog.time") as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        yield mock_time.monotonic
+
+
+@pytest.fixture
+def wheel(hass: HomeAssistant, clock: MagicMock) -> Generator[TimerWheel, None, None]:
+    """Return a wheel of 1 s ticks and 16 slots, stopped at teardown."""
+    wheel = TimerWheel(hass, resolution=1.0, slots=16)
+    yield wheel
+    wheel._async_stop()
+
+
+def _tick_until(wheel: TimerWheel, clock: MagicMock, until: float, step: float = 1.0) -> None:
+    """Run the wheel ticks up to ``until``, ``step`` seconds apart."""
+    now = clock.return_value
+    while now < until:
+        now = min(now + step, until)
+        clock.return_value = now
+        wheel._async_tick(None)
+
+
+def _watch(interval: float, stale: list[str], key: str = "ph") -> KeyWatch:
+    return KeyWatch("SN0001", key, interval, lambda watch: stale.append(watch.key))
+
+
+async def test_silent_key_becomes_stale(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A key without messages for its interval expires once."""
+    stale: list[str] = []
+    watch = _watch(10, stale)
+    wheel.schedule(watch, watch.deadline)
+    assert len(wheel) == 1
+    _tick_until(wheel, clock, 1009.0)
+    assert not stale
+    _tick_until(wheel, clock, 1011.0)
+    assert stale == ["ph"]
+    assert watch.stale
+    assert len(wheel) == 0
+
+
+async def test_received_key_is_rescheduled(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A message since scheduling moves the watch to its new deadline."""
+    stale: list[str] = []
+    watch = _watch(10, stale)
+    wheel.schedule(watch, watch.deadline)
+    _tick_until(wheel, clock, 1005.0)
+    watch.last_seen = 1005.0
+    _tick_until(wheel, clock, 1011.0)
+    assert not stale
+    assert len(wheel) == 1
+    _tick_until(wheel, clock, 1016.0)
+    assert stale == ["ph"]
+
+
+async def test_deadline_beyond_one_revolution(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A watch further than the wheel's span waits for its own tick."""
+    stale: list[str] = []
+    watch = _watch(40, stale)
+    wheel.schedule(watch, watch.deadline)
+    _tick_until(wheel, clock, 1039.0)
+    assert not stale
+    _tick_until(wheel, clock, 1041.0)
+    assert stale == ["ph"]
+
+
+async def test_missed_ticks_are_caught_up(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A tick running late expires every watch due since the last one."""
+    stale: list[str] = []
+    for key, interval in (("ph", 3), ("chlorine", 7)):
+        watch = _watch(interval, stale, key)
+        wheel.schedule(watch, watch.deadline)
+    clock.return_value = 1010.0
+    wheel._async_tick(None)
+    assert sorted(stale) == ["chlorine", "ph"]
+
+
+async def test_cancel_stops_the_wheel(wheel: TimerWheel, clock: MagicMock) -> None:
+    """The wheel only ticks while it holds watches."""
+    stale: list[str] = []
+    watch = _watch(10, stale)
+    wheel.schedule(watch, watch.deadline)
+    assert wheel._cancel_tick is not None
+    wheel.cancel(watch)
+    assert len(wheel) == 0
+    assert wheel._cancel_tick is None
+    _tick_until(wheel, clock, 1020.0)
+    assert not stale
+
+
+async def test_fractional_deadline(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A deadline between two ticks expires on the next tick."""
+    stale: list[str] = []
+    clock.return_value = 1000.3
+    watch = _watch(10, stale)
+    wheel.schedule(watch, watch.deadline)
+    # Ticks run at a different phase than the deadline
+    for second in range(1001, 1011):
+        clock.return_value = second + 0.1
+        wheel._async_tick(None)
+    assert not stale
+    clock.return_value = 1011.1
+    wheel._async_tick(None)
+    assert stale == ["ph"]
+
+
+async def test_schedule_after_restart(wheel: TimerWheel, clock: MagicMock) -> None:
+    """A wheel stopped for a while schedules from the current time."""
+    stale: list[str] = []
+    watch = _watch(3, stale)
+    wheel.schedule(watch, watch.deadline)
+    wheel.cancel(watch)
+    clock.return_value = 1100.0
+    watch.last_seen = 1095.0
+    wheel.schedule(watch, watch.deadline)
+    _tick_until(wheel, clock, 1101.0)
+    assert stale == ["ph"]
@@ -0,0 +1,494 @@
+"""
+Message-to-state benchmark for the PoolNexus integration.
+
+Replays PoolNexus traffic through the real hub dispatcher and the entity
+callbacks of `sensor.py`, `switch.py`, `text.py` and `select.py`, with a stub
+`hass` whose state writes are only counted. The hub subscribes through
+`HassMqttAdapter` of the broker stand-in, patched over the integration's MQTT
+helpers, and the traffic is published on the stand-in broker, so messages
+reach the hub the way Home Assistant's MQTT integration delivers them
+(`--direct` calls the hub callback instead). Traffic is either synthetic
+(telemetry cycles of `PoolNexusSimulator`, i.e. every key of
+`DEFAULT_STATE` plus the `/state` variants) or a recording: a capture of
+`mqtt_traffic_capture.py` or JSON lines (`{"topic": ..., "payload": ...}`
+per line).
+
+Reported (and written as JSON with `--output`):
+ - messages/s through the dispatcher and callbacks,
+ - p50/p99/max callback latency, overall and per platform,
+ - state writes and suppressed writes per message,
+ - allocations per message (tracemalloc peak bytes, net allocated blocks),
+   measured in a separate pass so tracing does not skew the latencies,
+ - with `--command-rounds N`, the command path: N rounds toggling every
+   switch of every device through the entities, flushed by the write-behind
+   queue, echoed by the broker and acknowledged by stand-in devices
+   (commands/s, round latency, acknowledgement latency, echoes dropped).
+
+Usage:
+    python tools/benchmark_poolnexus.py --devices 50 --cycles 20 --output bench.json
+    python tools/benchmark_poolnexus.py --devices 50 --cycles 20 --compare bench.json
+
+Dependencies:
+    pip install homeassistant paho-mqtt
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from custom_components.poolnexus import commands, hub as hub_module  # noqa: E402
+from custom_components.poolnexus import select, sensor, switch, text  # noqa: E402
+from custom_components.poolnexus.const import (  # noqa: E402
+    COMMAND_ACK_TIMEOUT,
+    DOMAIN,
+    SELECT_TYPES,
+    SENSOR_TYPES,
+    SWITCH_TYPES,
+    TEXT_TYPES,
+)
+from custom_components.poolnexus.hub import PoolNexusHub  # noqa: E402
+from custom_components.poolnexus.profiling import CallbackProfiler  # noqa: E402
+from custom_components.poolnexus.topics import TopicPlan  # noqa: E402
+from mqtt_broker_standin import Broker, HassMqttAdapter, ReceiveMessage  # noqa: E402
+from mqtt_poolnexus_simulator import DeviceModel, PoolNexusSimulator  # noqa: E402
+from mqtt_traffic_capture import MAGIC as CAPTURE_MAGIC, CaptureReader  # noqa: E402
+
+_LOGGER = logging.getLogger("poolnexus_benchmark")
+
+PREFIX = "poolnexus"
+ENTRY_ID = "benchmark"
+
+PLATFORM_OF_KEY: Dict[str, str] = {
+    **{key: "sensor" for key in SENSOR_TYPES},
+    **{key: "switch" for key in SWITCH_TYPES},
+    **{key: "text" for key in TEXT_TYPES},
+    **{key: "select" for key in SELECT_TYPES},
+}
+
+Traffic = List[Tuple[str, bytes]]
+
+
+class _CaptureClient:
+    """paho-like client recording what the simulator publishes."""
+
+    def __init__(self):
+        self.messages: Traffic = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.messages.append((topic, str(payload).encode("utf-8")))
+
+
+def synthetic_traffic(devices: int, cycles: int, seed: int, state_variant: bool = True) -> Traffic:
+    """Return `cycles` simulator telemetry cycles for `devices` serials."""
+    random.seed(seed)
+    client = _CaptureClient()
+    sims = [
+        PoolNexusSimulator(client, PREFIX, f"BENCH{i:05d}", state_variant=state_variant)
+        for i in range(devices)
+    ]
+    for sim in sims:
+        sim.publish_all_initial()
+    for _ in range(cycles):
+        for sim in sims:
+            sim._publish_telemetry_cycle()
+    return client.messages
+
+
+def recorded_traffic(path: str) -> Traffic:
+    """Load a capture of `mqtt_traffic_capture.py` or `{"topic": ..., "payload": ...}` JSON lines."""
+    with open(path, "rb") as fh:
+        is_capture = fh.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+    if is_capture:
+        with CaptureReader(path) as reader:
+            return [(msg.topic, msg.payload) for msg in reader.messages()]
+    traffic: Traffic = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                traffic.append((record["topic"], record["payload"].encode("utf-8")))
+    return traffic
+
+
+class _StubBus:
+    """Counts the events fired (alert transitions)."""
+
+    def __init__(self):
+        self.fired = 0
+
+    def async_fire(self, event_type, event_data=None):
+        self.fired += 1
+
+
+class _StubHass:
+    """Just what the hub and the entities touch outside of state writes."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.bus = _StubBus()
+        # Built inside the benchmark loop: the staleness watchdog schedules on it
+        self.loop = asyncio.get_running_loop()
+
+    def async_run_hass_job(self, job, *args):
+        return job.target(*args)
+
+    def async_create_task(self, target, name=None, eager_start=False):
+        # Command queue flushes
+        return self.loop.create_task(target, name=name)
+
+
+class Harness:
+    """Hub in hub mode plus the four platforms, wired to a stub hass.
+
+    The hub subscribes and publishes through a `HassMqttAdapter` on `broker`
+    while set up: `publish()` delivers to the hub callback before returning.
+    """
+
+    def __init__(self, profiling: bool = False):
+        self.hass = _StubHass()
+        self.broker = Broker()
+        self.mqtt = HassMqttAdapter(self.broker)
+        self._patches = contextlib.ExitStack()
+        profiler = CallbackProfiler() if profiling else None
+        self.hub = PoolNexusHub(self.hass, ENTRY_ID, TopicPlan(PREFIX), profiler=profiler)
+        self.hass.data[DOMAIN] = {ENTRY_ID: self.hub}
+        self.entry = SimpleNamespace(entry_id=ENTRY_ID, data={}, async_on_unload=lambda func: None)
+        self.entities: List[Any] = []
+        self._pending: List[Any] = []
+        self.state_writes = 0
+
+    def _count_write(self):
+        self.state_writes += 1
+
+    def _add_entities(self, new_entities: Iterable[Any], update_before_add: bool = False):
+        for entity in new_entities:
+            entity.hass = self.hass
+            entity.entity_id = f"bench.{entity.unique_id}"
+            entity.async_write_ha_state = self._count_write
+            self.entities.append(entity)
+            self._pending.append(entity)
+
+    async def async_setup(self):
+        self._patches.enter_context(patch.object(hub_module, "async_subscribe", self.mqtt.async_subscribe))
+        self._patches.enter_context(patch.object(commands, "async_publish", self.mqtt.async_publish))
+        await self.hub._async_subscribe()
+        for platform_module in (sensor, switch, text, select):
+            await platform_module.async_setup_entry(self.hass, self.entry, self._add_entities)
+
+    def close(self):
+        """Stop the hub and restore the MQTT helpers."""
+        self.hub.async_stop()
+        self._patches.close()
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        """Publish on the stand-in broker, as a device would."""
+        self.broker.publish(topic, payload, qos, retain)
+
+    async def async_add_pending(self):
+        """Run async_added_to_hass for entities created by discovery."""
+        pending, self._pending = self._pending, []
+        for entity in pending:
+            await entity.async_added_to_hass()
+
+    @property
+    def suppressed_writes(self) -> int:
+        return sum(getattr(entity, "suppressed_writes", 0) for entity in self.entities)
+
+    def message(self, topic: str, payload: bytes) -> ReceiveMessage:
+        return ReceiveMessage(topic, payload, 0, False, f"{PREFIX}/+/#", 0.0)
+
+
+class _StandinDevices:
+    """Devices answering the commands published on the stand-in broker.
+
+    Each `/set` command is applied to a `DeviceModel` and the new state is
+    reported on `<key>` (and `<key>/state`) on the next loop iteration, like
+    a device on the network would.
+    """
+
+    def __init__(self, broker: Broker, state_variant: bool = True):
+        self.broker = broker
+        self.state_variant = state_variant
+        self.models: Dict[str, DeviceModel] = {}
+        self.commands = 0
+        self._loop = asyncio.get_running_loop()
+        self._session = broker.attach("standin-devices", self._on_command)
+        broker.subscribe(self._session, f"{PREFIX}/+/+/set")
+
+    def _on_command(self, msg):
+        _, serial, key, _ = msg.topic.split("/")
+        model = self.models.get(serial)
+        if model is None:
+            model = self.models[serial] = DeviceModel()
+        update = model.apply_set(key, msg.payload.decode("utf-8"))
+        if update is not None:
+            self.commands += 1
+            self._loop.call_soon(self._report, serial, *update)
+
+    def _report(self, serial: str, key: str, value: Any):
+        topic = f"{PREFIX}/{serial}/{key}"
+        payload = str(value)
+        self.broker.publish(topic, payload, 0, True)
+        if self.state_variant:
+            self.broker.publish(f"{topic}/state", payload, 0, True)
+
+    def close(self):
+        self.broker.detach(self._session)
+
+
+async def _async_run_commands(harness: Harness, rounds: int, state_variant: bool) -> Dict[str, Any]:
+    """Toggle every switch ``rounds`` times and wait for each round to be acknowledged."""
+    devices = _StandinDevices(harness.broker, state_variant)
+    switches = [entity for entity in harness.entities if isinstance(entity, switch.PoolNexusSwitch)]
+    hub_devices = list(harness.hub.devices.values())
+    enqueue_ns: List[int] = []
+    round_ms: List[float] = []
+    perf = time.perf_counter_ns
+    start = perf()
+    try:
+        for index in range(rounds):
+            round_start = perf()
+            for entity in switches:
+                t0 = perf()
+                if index % 2:
+                    await entity.async_turn_off()
+                else:
+                    await entity.async_turn_on()
+                enqueue_ns.append(perf() - t0)
+            # Flushed by the queue window, then echoed and acknowledged
+            deadline = time.monotonic() + COMMAND_ACK_TIMEOUT
+            while any(device.acks.pending for device in hub_devices) and time.monotonic() < deadline:
+                await asyncio.sleep(0.001)
+            round_ms.append((perf() - round_start) / 1e6)
+    finally:
+        devices.close()
+    total_s = (perf() - start) / 1e9
+    commands = len(enqueue_ns)
+    histograms = [
+        histogram for device in hub_devices for histogram in device.acks.latency.values()
+    ]
+    acknowledged = sum(histogram.count for histogram in histograms)
+    return {
+        "rounds": rounds,
+        "commands": commands,
+        "commands_per_s": commands / total_s if total_s else 0.0,
+        "enqueue_us": _latency_summary(enqueue_ns),
+        "round_ms": {
+            "p50": statistics.median(round_ms) if round_ms else 0.0,
+            "max": max(round_ms, default=0.0),
+        },
+        "published": sum(device.commands.published for device in hub_devices),
+        "failed": sum(device.commands.failed for device in hub_devices),
+        "echoes_dropped": sum(device.commands.echoes for device in hub_devices),
+        "acknowledged": acknowledged,
+        "ack_timeouts": sum(device.acks.total_timeouts for device in hub_devices),
+        "ack_latency_ms": {
+            "mean": sum(h.total for h in histograms) / acknowledged * 1000 if acknowledged else 0.0,
+            "max": max((h.maximum for h in histograms), default=0.0) * 1000,
+        },
+        "device_commands": devices.commands,
+    }
+
+
+def _percentile(sorted_values: List[int], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx] / 1000.0
+
+
+def _latency_summary(samples_ns: List[int]) -> Dict[str, float]:
+    ordered = sorted(samples_ns)
+    return {
+        "p50": _percentile(ordered, 50),
+        "p99": _percentile(ordered, 99),
+        "max": ordered[-1] / 1000.0 if ordered else 0.0,
+        "mean": statistics.fmean(ordered) / 1000.0 if ordered else 0.0,
+    }
+
+
+async def run_benchmark(
+    traffic: Traffic,
+    alloc_samples: int,
+    profiling: bool = False,
+    direct: bool = False,
+    command_rounds: int = 0,
+    state_variant: bool = True,
+) -> Dict[str, Any]:
+    harness = Harness(profiling)
+    await harness.async_setup()
+    try:
+        results = await _async_run_inbound(harness, traffic, alloc_samples, direct)
+        if command_rounds:
+            results["commands"] = await _async_run_commands(harness, command_rounds, state_variant)
+        return results
+    finally:
+        harness.close()
+
+
+async def _async_run_inbound(harness: Harness, traffic: Traffic, alloc_samples: int, direct: bool) -> Dict[str, Any]:
+    """Time every message from publish (or hub callback with ``direct``) to state write."""
+    deliver: Callable[..., Any]
+    if direct:
+        deliver = harness.hub._async_message_received
+        items: List[tuple] = [(harness.message(topic, payload),) for topic, payload in traffic]
+    else:
+        deliver = harness.publish
+        items = list(traffic)
+
+    # Warm-up: discover every device and register the entity handlers, so the
+    # timed pass measures steady-state traffic only.
+    seen = set()
+    for topic, payload in traffic:
+        serial = topic[len(PREFIX) + 1 :].partition("/")[0]
+        if serial in seen:
+            continue
+        seen.add(serial)
+        harness.publish(topic, payload)
+        await harness.async_add_pending()
+
+    platforms = [PLATFORM_OF_KEY.get(topic.split("/")[2], "other") for topic, _ in traffic]
+    writes_before = harness.state_writes
+    suppressed_before = harness.suppressed_writes
+
+    latencies: List[int] = []
+    per_platform: Dict[str, List[int]] = {}
+    perf = time.perf_counter_ns
+    start = perf()
+    for args, platform_name in zip(items, platforms):
+        t0 = perf()
+        deliver(*args)
+        elapsed = perf() - t0
+        latencies.append(elapsed)
+        per_platform.setdefault(platform_name, []).append(elapsed)
+    total_s = (perf() - start) / 1e9
+    count = len(items)
+    state_writes = harness.state_writes - writes_before
+    suppressed_writes = harness.suppressed_writes - suppressed_before
+
+    # Allocation pass on a subset, traced separately
+    subset = items[:alloc_samples]
+    peak_bytes = 0
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    for args in subset:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        deliver(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_bytes += peak - before
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+
+    return {
+        "transport": "direct" if direct else "standin",
+        "messages": count,
+        "devices": len(seen),
+        "entities": len(harness.entities),
+        "duration_s": total_s,
+        "msgs_per_s": count / total_s if total_s else 0.0,
+        "latency_us": _latency_summary(latencies),
+        "latency_us_by_platform": {
+            name: _latency_summary(samples) for name, samples in sorted(per_platform.items())
+        },
+        "state_writes_per_msg": state_writes / count if count else 0.0,
+        "suppressed_writes_per_msg": suppressed_writes / count if count else 0.0,
+        "alloc_peak_bytes_per_msg": peak_bytes / len(subset) if subset else 0.0,
+        "alloc_net_blocks_per_msg": (blocks_after - blocks_before) / len(subset) if subset else 0.0,
+    }
+
+
+def _metadata() -> Dict[str, Any]:
+    manifest = json.loads((ROOT / "custom_components" / "poolnexus" / "manifest.json").read_text(encoding="utf-8"))
+    return {
+        "integration_version": manifest.get("version"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def _print_comparison(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print relative changes of the headline numbers against a previous run."""
+    rows = [
+        ("msgs_per_s", current["msgs_per_s"], baseline["msgs_per_s"]),
+        ("latency p50 (us)", current["latency_us"]["p50"], baseline["latency_us"]["p50"]),
+        ("latency p99 (us)", current["latency_us"]["p99"], baseline["latency_us"]["p99"]),
+        ("state writes/msg", current["state_writes_per_msg"], baseline["state_writes_per_msg"]),
+        ("alloc bytes/msg", current["alloc_peak_bytes_per_msg"], baseline["alloc_peak_bytes_per_msg"]),
+    ]
+    print(f"{'metric':<20} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, cur, base in rows:
+        change = f"{(cur - base) / base * 100:+.1f}%" if base else "n/a"
+        print(f"{name:<20} {base:>12.3f} {cur:>12.3f} {change:>9}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="PoolNexus message-to-state benchmark")
+    parser.add_argument("--devices", type=int, default=20, help="simulated devices (synthetic traffic)")
+    parser.add_argument("--cycles", type=int, default=20, help="telemetry cycles per device (synthetic traffic)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the synthetic traffic")
+    parser.add_argument("--no-state-variant", dest="state_variant", action="store_false", help="synthetic devices publish on <key> only, not on <key>/state too")
+    parser.add_argument("--input", default=None, help="replay a capture or JSON lines recording instead of synthetic traffic")
+    parser.add_argument("--alloc-samples", type=int, default=2000, help="messages traced for allocation stats")
+    parser.add_argument("--profiling", action="store_true", help="run with the profiling option (timed callbacks), to measure its overhead")
+    parser.add_argument("--direct", action="store_true", help="call the hub callback directly instead of publishing on the stand-in broker")
+    parser.add_argument("--command-rounds", type=int, default=0, help="then toggle every switch of every device this many times (command path)")
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    traffic = (
+        recorded_traffic(args.input)
+        if args.input
+        else synthetic_traffic(args.devices, args.cycles, args.seed, args.state_variant)
+    )
+    results = {
+        "metadata": _metadata(),
+        "traffic": {
+            "source": args.input or "synthetic",
+            "devices": args.devices,
+            "cycles": args.cycles,
+            "seed": args.seed,
+            "state_variant": args.state_variant,
+        },
+        "profiling": args.profiling,
+        "results": asyncio.run(
+            run_benchmark(
+                traffic,
+                args.alloc_samples,
+                args.profiling,
+                args.direct,
+                args.command_rounds,
+                args.state_variant,
+            )
+        ),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        _print_comparison(results["results"], baseline["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Minimal in-process MQTT broker stand-in for offline PoolNexus benchmarks.
+
+It implements just enough of MQTT for the simulator and the integration to
+talk to each other inside one Python process, with no network:
+ - topic filters with `+` and `#` wildcards (subscription trie),
+ - a retained message store (empty retained payload clears the topic),
+ - QoS 0 (fire and forget) and QoS 1 (at least once: a message whose
+   callback raised stays in flight and is redelivered with `dup` set by
+   `StandinSession.redeliver()`).
+
+Two front-ends attach to the same `Broker`:
+ - `StandinClient`: the subset of the paho-mqtt `Client` API used by
+   `mqtt_poolnexus_simulator.py`, so a `PoolNexusSimulator` can be built on
+   it unchanged (or run with `--standin`);
+ - `HassMqttAdapter`: `async_subscribe` / `async_publish` coroutines shaped
+   like `homeassistant.components.mqtt`, so a harness can patch them into
+   `custom_components/poolnexus` and drive the entity callbacks.
+
+Delivery is synchronous in the publisher's thread; `HassMqttAdapter` hops
+onto its event loop when called from another thread.
+
+Usage:
+    broker = Broker()
+    client = StandinClient(broker, "sim")
+    client.connect("standin", 0)
+    sim = PoolNexusSimulator(client, "poolnexus", "SIM12345")
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger("poolnexus_broker_standin")
+
+
+@dataclass
+class StandinMessage:
+    """Message delivered to subscribers (fields of paho's MQTTMessage)."""
+
+    topic: str
+    payload: bytes
+    qos: int = 0
+    retain: bool = False
+    mid: int = 0
+    dup: bool = False
+    # time.monotonic() when the broker accepted the publish (for latency)
+    timestamp: float = 0.0
+
+
+def _to_bytes(payload: Any) -> bytes:
+    """Convert a payload the way paho does (str, numbers, None, bytes)."""
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    if isinstance(payload, (int, float)):
+        return str(payload).encode("ascii")
+    raise TypeError(f"payload must be a string, bytearray, int, float or None, not {type(payload)!r}")
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Return True if `topic` matches the subscription filter `pattern`."""
+    pat = pattern.split("/")
+    top = topic.split("/")
+    for i, part in enumerate(pat):
+        if part == "#":
+            return True
+        if i >= len(top):
+            return False
+        if part != "+" and part != top[i]:
+            return False
+    return len(pat) == len(top)
+
+
+class _TrieNode:
+    __slots__ = ("children", "subscribers")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # session -> granted qos
+        self.subscribers: Dict["StandinSession", int] = {}
+
+
+class StandinSession:
+    """One subscriber attached to the broker."""
+
+    def __init__(self, broker: "Broker", name: str, callback: Callable[[StandinMessage], None]):
+        self.broker = broker
+        self.name = name
+        self.callback = callback
+        self.filters: Dict[str, int] = {}
+        # mid -> QoS 1 message whose delivery failed
+        self.inflight: Dict[int, StandinMessage] = {}
+        self.received = 0
+
+    def __hash__(self):
+        return id(self)
+
+    def deliver(self, msg: StandinMessage):
+        self.received += 1
+        try:
+            self.callback(msg)
+        except Exception:
+            if msg.qos >= 1:
+                self.inflight[msg.mid] = msg
+                self.broker.stats["redeliveries_pending"] += 1
+                _LOGGER.debug("Delivery of %s to %s failed, kept in flight", msg.topic, self.name)
+            else:
+                _LOGGER.exception("Subscriber %s failed on %s", self.name, msg.topic)
+
+    def redeliver(self) -> int:
+        """Redeliver QoS 1 messages still in flight; return how many."""
+        pending, self.inflight = self.inflight, {}
+        for msg in pending.values():
+            msg.dup = True
+            self.broker.stats["redeliveries_pending"] -= 1
+            self.broker.stats["redelivered"] += 1
+            self.deliver(msg)
+        return len(pending)
+
+
+class Broker:
+    """In-process topic router with retained messages and QoS 0/1."""
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._retained: Dict[str, Tuple[bytes, int]] = {}
+        self._lock = threading.RLock()
+        self._mids = itertools.count(1)
+        self.stats: Dict[str, int] = {
+            "published": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "redelivered": 0,
+            "redeliveries_pending": 0,
+        }
+
+    # -- sessions / subscriptions -------------------------------------------------
+
+    def attach(self, name: str, callback: Callable[[StandinMessage], None]) -> StandinSession:
+        return StandinSession(self, name, callback)
+
+    def subscribe(self, session: StandinSession, pattern: str, qos: int = 0) -> int:
+        """Subscribe `session` to `pattern`; deliver matching retained messages."""
+        qos = min(max(qos, 0), 1)
+        with self._lock:
+            node = self._root
+            for part in pattern.split("/"):
+                node = node.children.setdefault(part, _TrieNode())
+            node.subscribers[session] = qos
+            session.filters[pattern] = qos
+            retained = [
+                (topic, payload, min(rqos, qos))
+                for topic, (payload, rqos) in self._retained.items()
+                if topic_matches(pattern, topic)
+            ]
+        now = time.monotonic()
+        for topic, payload, mqos in retained:
+            msg = StandinMessage(topic, payload, mqos, True, next(self._mids) if mqos else 0, timestamp=now)
+            self.stats["delivered"] += 1
+            session.deliver(msg)
+        return qos
+
+    def unsubscribe(self, session: StandinSession, pattern: str):
+        with self._lock:
+            path = [self._root]
+            for part in pattern.split("/"):
+                node = path[-1].children.get(part)
+                if node is None:
+                    return
+                path.append(node)
+            path[-1].subscribers.pop(session, None)
+            session.filters.pop(pattern, None)
+            # prune empty branches
+            parts = pattern.split("/")
+            for depth in range(len(parts), 0, -1):
+                node = path[depth]
+                if node.children or node.subscribers:
+                    break
+                del path[depth - 1].children[parts[depth - 1]]
+
+    def detach(self, session: StandinSession):
+        for pattern in list(session.filters):
+            self.unsubscribe(session, pattern)
+
+    def _match(self, node: _TrieNode, parts: List[str], i: int, out: Dict[StandinSession, int]):
+        wild = node.children.get("#")
+        if wild is not None:
+            for session, qos in wild.subscribers.items():
+                out[session] = max(out.get(session, 0), qos)
+        if i == len(parts):
+            for session, qos in node.subscribers.items():
+                out[session] = max(out.get(session, 0), qos)
+            return
+        child = node.children.get(parts[i])
+        if child is not None:
+            self._match(child, parts, i + 1, out)
+        plus = node.children.get("+")
+        if plus is not None:
+            self._match(plus, parts, i + 1, out)
+
+    # -- publishing ---------------------------------------------------------------
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> int:
+        """Route a message to every matching subscriber; return the mid."""
+        data = _to_bytes(payload)
+        qos = min(max(qos, 0), 1)
+        mid = next(self._mids) if qos else 0
+        now = time.monotonic()
+        with self._lock:
+            self.stats["published"] += 1
+            if retain:
+                if data:
+                    self._retained[topic] = (data, qos)
+                else:
+                    self._retained.pop(topic, None)
+            targets: Dict[StandinSession, int] = {}
+            self._match(self._root, topic.split("/"), 0, targets)
+        if not targets:
+            self.stats["dropped"] += 1
+        for session, sub_qos in targets.items():
+            # retain flag is only set on deliveries of stored messages
+            msg = StandinMessage(topic, data, min(qos, sub_qos), False, mid, timestamp=now)
+            self.stats["delivered"] += 1
+            session.deliver(msg)
+        return mid
+
+    def retained(self) -> Dict[str, bytes]:
+        with self._lock:
+            return {topic: payload for topic, (payload, _) in self._retained.items()}
+
+
+class _PublishInfo:
+    """Stand-in for paho's MQTTMessageInfo (publishes complete synchronously)."""
+
+    def __init__(self, mid: int):
+        self.mid = mid
+        self.rc = 0
+
+    def is_published(self) -> bool:
+        return True
+
+    def wait_for_publish(self, timeout: Optional[float] = None):
+        return None
+
+
+class StandinClient:
+    """Subset of paho-mqtt's `Client` used by the PoolNexus simulator."""
+
+    def __init__(self, broker: Broker, client_id: str = ""):
+        self.broker = broker
+        self._client_id = client_id
+        self.on_connect: Optional[Callable] = None
+        self.on_message: Optional[Callable] = None
+        self.on_disconnect: Optional[Callable] = None
+        self._session = broker.attach(client_id or f"client-{id(self)}", self._deliver)
+
+    def _deliver(self, msg: StandinMessage):
+        if self.on_message is not None:
+            self.on_message(self, None, msg)
+
+    def username_pw_set(self, username, password=None):
+        return None
+
+    def connect(self, host: str = "standin", port: int = 0, keepalive: int = 60):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def loop_start(self):
+        return 0
+
+    def loop_stop(self, force: bool = False):
+        return 0
+
+    def disconnect(self):
+        self.broker.detach(self._session)
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, None, 0)
+        return 0
+
+    def subscribe(self, topic: str, qos: int = 0):
+        self.broker.subscribe(self._session, topic, qos)
+        return 0, 0
+
+    def unsubscribe(self, topic: str):
+        self.broker.unsubscribe(self._session, topic)
+        return 0, 0
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> _PublishInfo:
+        return _PublishInfo(self.broker.publish(topic, payload, qos, retain))
+
+
+@dataclass
+class ReceiveMessage:
+    """Same fields as `homeassistant.components.mqtt.ReceiveMessage`."""
+
+    topic: str
+    payload: Any
+    qos: int
+    retain: bool
+    subscribed_topic: str
+    timestamp: float = field(default_factory=time.monotonic)
+
+
+class HassMqttAdapter:
+    """`async_subscribe` / `async_publish` shaped like Home Assistant's MQTT helpers.
+
+    Patch them over `custom_components.poolnexus.hub.async_subscribe` and
+    `custom_components.poolnexus.commands.async_publish` to run the
+    integration against the stand-in broker. Callbacks always run on `loop`.
+    """
+
+    def __init__(self, broker: Broker, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.broker = broker
+        self.loop = loop
+        self.published = 0
+
+    def _loop(self) -> asyncio.AbstractEventLoop:
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        return self.loop
+
+    async def async_subscribe(self, hass, topic: str, msg_callback, qos: int = 0, encoding: Optional[str] = "utf-8"):
+        loop = self._loop()
+        loop_thread = threading.get_ident()
+
+        def _deliver(msg: StandinMessage):
+            payload = msg.payload.decode(encoding) if encoding is not None else msg.payload
+            message = ReceiveMessage(msg.topic, payload, msg.qos, msg.retain, topic, msg.timestamp)
+            if threading.get_ident() == loop_thread:
+                msg_callback(message)
+            else:
+                loop.call_soon_threadsafe(msg_callback, message)
+
+        session = self.broker.attach(f"hass:{topic}", _deliver)
+        self.broker.subscribe(session, topic, qos)
+
+        def _unsubscribe():
+            self.broker.detach(session)
+
+        return _unsubscribe
+
+    async def async_publish(self, hass, topic: str, payload: Any, qos: int = 0, retain: bool = False, encoding: Optional[str] = "utf-8"):
+        self.published += 1
+        self.broker.publish(topic, payload, qos, retain)
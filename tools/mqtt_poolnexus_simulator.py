@@ -18,6 +18,13 @@ Usage (PowerShell):
     # Or provide only --username and you will be prompted for the password (recommended):
     python tools/mqtt_poolnexus_simulator.py --host 127.0.0.1 --prefix poolnexus --serial SIM12345 --username myuser
 
+    # Fleet / load-generator mode: 2000 devices SIM00000..SIM01999 over 4 connections,
+    # capped at 5000 msgs/s, printing achieved throughput and backlog:
+    python tools/mqtt_poolnexus_simulator.py --host 127.0.0.1 --serial SIM --devices 2000 --connections 4 --interval 10 --rate 5000 --jitter 0.1
+
+    # Same fleet against the in-process broker stand-in (no broker, no network):
+    python tools/mqtt_poolnexus_simulator.py --standin --serial SIM --devices 2000 --duration 60
+
 Dependencies:
     pip install paho-mqtt
 
@@ -25,10 +32,16 @@ Notes:
  - The simulator publishes telemetry every `--interval` seconds.
  - It publishes initial retained states on connect.
  - It listens to command topics for text, switches and select (operating_mode).
+ - With `--devices N` (N > 1) it runs a fleet of virtual devices driven by a
+   single scheduler thread over `--connections` client connections; see
+   `FleetScheduler` for the `--profile`, `--rate` and `--jitter` options.
+ - Device state and values live in `DeviceModel` (no I/O, no lock), shared
+   with the asyncio fleet of `mqtt_poolnexus_simulator_async.py`.
 """
 
 import argparse
 import getpass
+import heapq
 import inspect
 import json
 import logging
@@ -37,10 +50,13 @@ import random
 import threading
 import time
 import warnings
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 import paho.mqtt.client as mqtt
 
+from mqtt_broker_standin import Broker, StandinClient
+
 _LOGGER = logging.getLogger("poolnexus_simulator")
 
 DEFAULT_PREFIX = "poolnexus"
@@ -94,16 +110,128 @@ def command_topic(base: str, key: str) -> str:
     return f"{base}/{key}/set"
 
 
+class DeviceModel:
+    """State of one simulated device, without I/O or locking.
+
+    `initial_values`, `telemetry_values` and `apply_set` update the state
+    and return the `(key, value)` pairs to publish retained, in order. The
+    threaded `PoolNexusSimulator` publishes them under its lock; the asyncio
+    simulator (`mqtt_poolnexus_simulator_async.py`) from its event loop.
+    """
+
+    def __init__(self):
+        self.state: Dict[str, Any] = DEFAULT_STATE.copy()
+
+    def initial_values(self) -> List[Tuple[str, Any]]:
+        # sensors, info, then text/switch/select state topics
+        return [(k, self.state.get(k, "")) for k in SENSOR_TYPES + INFO_TYPES + TEXT_TYPES + SWITCH_TYPES + SELECT_TYPES]
+
+    def apply_set(self, key: str, payload: str) -> Optional[Tuple[str, Any]]:
+        """Apply a `/set` command; return the state to publish, None for unknown keys."""
+        payload = payload.strip()
+        if key in TEXT_TYPES:
+            # accept any text but store as-is
+            self.state[key] = payload
+            return key, self.state[key]
+        if key in SWITCH_TYPES:
+            val = self.parse_bool(payload)
+            self.state[key] = val
+            return key, "ON" if val else "OFF"
+        if key in SELECT_TYPES:
+            # operating_mode -> store string
+            self.state[key] = payload
+            return key, self.state[key]
+        return None
+
+    @staticmethod
+    def parse_bool(payload: str) -> bool:
+        s = payload.lower()
+        if s in ("on", "1", "true", "yes", "locked"):
+            return True
+        if s in ("off", "0", "false", "no", "unlocked"):
+            return False
+        # fallback: try numeric
+        try:
+            return float(payload) != 0.0
+        except Exception:
+            return False
+
+    def telemetry_values(self) -> List[Tuple[str, Any]]:
+        """Simulate one telemetry cycle (small fluctuations)."""
+        state = self.state
+        values: List[Tuple[str, Any]] = []
+        # temperature float
+        temp = float(state.get("temperature", 25.0))
+        temp += random.uniform(-0.2, 0.2)
+        state["temperature"] = round(temp, 2)
+        values.append(("temperature", state["temperature"]))
+        # pH with one decimal
+        ph = float(state.get("ph", 7.2))
+        ph += random.uniform(-0.05, 0.05)
+        state["ph"] = round(ph, 1)
+        values.append(("ph", f"{state['ph']:.1f}"))
+
+        # chlorine as float with 3 decimals
+        chlorine = float(state.get("chlorine", 0.802))
+        chlorine += random.uniform(-0.005, 0.005)
+        state["chlorine"] = round(chlorine, 3)
+        values.append(("chlorine", f"{state['chlorine']:.3f}"))
+
+        # textual/status sensors
+        # water_level: ok/nok
+        state["water_level"] = random.choice(["ok", "nok"])
+        values.append(("water_level", state["water_level"]))
+
+        # chlorine_level / ph_level options
+        state["chlorine_level"] = random.choice(["low", "no liquid", "ok"])
+        values.append(("chlorine_level", state["chlorine_level"]))
+
+        state["ph_level"] = random.choice(["low", "no liquid", "ok"])
+        values.append(("ph_level", state["ph_level"]))
+
+        # informational values (dates formatted DD/MM/YY HH:MM)
+        now = datetime.now()
+        state["last_pH_prob_cal"] = now.strftime("%d/%m/%y %H:%M")
+        state["last_ORP_prob_cal"] = now.strftime("%d/%m/%y %H:%M")
+        state["last_pump_cleaning"] = now.strftime("%d/%m/%y %H:%M")
+        values.append(("last_pH_prob_cal", state["last_pH_prob_cal"]))
+        values.append(("last_ORP_prob_cal", state["last_ORP_prob_cal"]))
+        values.append(("last_pump_cleaning", state["last_pump_cleaning"]))
+
+        # firmware & availability
+        values.append(("firmware", state.get("firmware", "1.0.0")))
+        values.append(("availability", state.get("availability", "online")))
+
+        # alert as JSON
+        alert = {"type": "none", "message": "", "timestamp": now.isoformat()}
+        state["alert"] = json.dumps(alert, ensure_ascii=False)
+        values.append(("alert", state["alert"]))
+
+        # re-publish switches/select/text states to reflect any changes
+        for k in TEXT_TYPES:
+            values.append((k, state.get(k, "")))
+        for k in SWITCH_TYPES:
+            values.append((k, "ON" if state.get(k) else "OFF"))
+        for k in SELECT_TYPES:
+            values.append((k, state.get(k, "")))
+        return values
+
+
 class PoolNexusSimulator:
-    def __init__(self, client: mqtt.Client, prefix: str, serial: str, interval: float = 10.0):
+    def __init__(self, client: mqtt.Client, prefix: str, serial: str, interval: float = 10.0, state_variant: bool = True):
         self.client = client
         self.prefix = prefix
         self.serial = serial
         self.base = f"{self.prefix}/{self.serial}"
         self.interval = interval
+        # also publish every value on <key>/state (as some firmware do)
+        self.state_variant = state_variant
         self.running = False
-        self.state: Dict[str, Any] = DEFAULT_STATE.copy()
+        self.model = DeviceModel()
+        self.state: Dict[str, Any] = self.model.state
         self.lock = threading.Lock()
+        # number of MQTT publishes issued (read by the fleet scheduler)
+        self.published = 0
 
     def publish_retained(self, key: str, value: Any):
         t = topic(self.base, key)
@@ -112,58 +240,35 @@ class PoolNexusSimulator:
         # publish the primary topic
         try:
             self.client.publish(t, payload, retain=True)
+            self.published += 1
         except Exception:
             _LOGGER.exception("Failed to publish to %s", t)
+        if not self.state_variant:
+            return
         # Also publish a /state variant for compatibility (some firmware use <key>/state)
         state_t = f"{t}/state"
         try:
             self.client.publish(state_t, payload, retain=True)
+            self.published += 1
         except Exception:
             _LOGGER.debug("Failed to publish state variant to %s", state_t)
 
     def publish_all_initial(self):
-        # publish sensors, info, switches, texts, select
         with self.lock:
-            for k in SENSOR_TYPES + INFO_TYPES:
-                self.publish_retained(k, self.state.get(k, ""))
-            for k in TEXT_TYPES + SWITCH_TYPES + SELECT_TYPES:
-                # text/select/switch state topic
-                self.publish_retained(k, self.state.get(k, ""))
+            for key, value in self.model.initial_values():
+                self.publish_retained(key, value)
 
     def handle_set_message(self, key: str, payload: str):
         _LOGGER.info("Set request %s = %s", key, payload)
-        payload = payload.strip()
         with self.lock:
-            if key in TEXT_TYPES:
-                # accept any text but store as-is
-                self.state[key] = payload
-                # publish updated state (no /set suffix)
-                self.publish_retained(key, self.state[key])
-            elif key in SWITCH_TYPES:
-                val = self._parse_bool(payload)
-                self.state[key] = val
-                self.publish_retained(key, "ON" if val else "OFF")
-            elif key in SELECT_TYPES:
-                # operating_mode -> store string
-                self.state[key] = payload
-                self.publish_retained(key, self.state[key])
-            else:
+            update = self.model.apply_set(key, payload)
+            if update is None:
                 _LOGGER.warning("Unknown set key: %s", key)
-
-    def _parse_bool(self, payload: str) -> bool:
-        s = payload.lower()
-        if s in ("on", "1", "true", "yes", "locked"):
-            return True
-        if s in ("off", "0", "false", "no", "unlocked"):
-            return False
-        # fallback: try numeric
-        try:
-            return float(payload) != 0.0
-        except Exception:
-            return False
+                return
+            # publish updated state (no /set suffix)
+            self.publish_retained(*update)
 
     def on_message(self, client, userdata, msg):
-        topic_parts = msg.topic.split("/")
         # expect: prefix/serial/<key>/set  OR prefix/serial/<key>
         # we'll only react to /set topics
         if not msg.topic.startswith(self.base + "/"):
@@ -201,64 +306,180 @@ class PoolNexusSimulator:
         self.running = False
 
     def _publish_telemetry_cycle(self):
-        # simulate small fluctuations
         with self.lock:
-            # temperature float
-            temp = float(self.state.get("temperature", 25.0))
-            temp += random.uniform(-0.2, 0.2)
-            self.state["temperature"] = round(temp, 2)
-            self.publish_retained("temperature", self.state["temperature"])
-            # pH with one decimal
-            ph = float(self.state.get("ph", 7.2))
-            ph += random.uniform(-0.05, 0.05)
-            self.state["ph"] = round(ph, 1)
-            self.publish_retained("ph", f"{self.state['ph']:.1f}")
-
-            # chlorine as float with 3 decimals
-            chlorine = float(self.state.get("chlorine", 0.802))
-            chlorine += random.uniform(-0.005, 0.005)
-            self.state["chlorine"] = round(chlorine, 3)
-            self.publish_retained("chlorine", f"{self.state['chlorine']:.3f}")
-
-            # textual/status sensors
-            # water_level: ok/nok
-            self.state["water_level"] = random.choice(["ok", "nok"])
-            self.publish_retained("water_level", self.state["water_level"])
-
-            # chlorine_level / ph_level options
-            self.state["chlorine_level"] = random.choice(["low", "no liquid", "ok"])
-            self.publish_retained("chlorine_level", self.state["chlorine_level"])
-
-            self.state["ph_level"] = random.choice(["low", "no liquid", "ok"])
-            self.publish_retained("ph_level", self.state["ph_level"])
-
-            # informational values (dates formatted DD/MM/YY HH:MM)
-            from datetime import datetime
-
-            now = datetime.now()
-            self.state["last_pH_prob_cal"] = now.strftime("%d/%m/%y %H:%M")
-            self.state["last_ORP_prob_cal"] = now.strftime("%d/%m/%y %H:%M")
-            self.state["last_pump_cleaning"] = now.strftime("%d/%m/%y %H:%M")
-            self.publish_retained("last_pH_prob_cal", self.state["last_pH_prob_cal"])
-            self.publish_retained("last_ORP_prob_cal", self.state["last_ORP_prob_cal"])
-            self.publish_retained("last_pump_cleaning", self.state["last_pump_cleaning"])
-
-            # firmware & availability
-            self.publish_retained("firmware", self.state.get("firmware", "1.0.0"))
-            self.publish_retained("availability", self.state.get("availability", "online"))
-
-            # alert as JSON
-            alert = {"type": "none", "message": "", "timestamp": now.isoformat()}
-            self.state["alert"] = json.dumps(alert, ensure_ascii=False)
-            self.publish_retained("alert", self.state["alert"])
-
-            # re-publish switches/select/text states to reflect any changes
-            for k in TEXT_TYPES:
-                self.publish_retained(k, self.state.get(k, ""))
-            for k in SWITCH_TYPES:
-                self.publish_retained(k, "ON" if self.state.get(k) else "OFF")
-            for k in SELECT_TYPES:
-                self.publish_retained(k, self.state.get(k, ""))
+            for key, value in self.model.telemetry_values():
+                self.publish_retained(key, value)
+
+
+class FleetScheduler:
+    """Drive many `PoolNexusSimulator` devices from a single scheduler thread.
+
+    Every device publishes one telemetry cycle every `interval` seconds. The
+    scheduler keeps a heap of the next due time of every device, so thousands
+    of devices cost one thread instead of one thread each.
+
+    Profiles:
+      - steady: device phases are spread evenly over the interval
+      - aligned: every device publishes at the same instant each interval
+      - spike: steady, plus a cycle of every device at once each `spike_period`
+
+    `jitter` randomizes each interval by +/- that fraction. `rate` caps the
+    total publish rate (msgs/s, 0 = unlimited); when the cap or the broker
+    cannot keep up, cycles fall behind schedule and show up as backlog.
+    """
+
+    PROFILES = ("steady", "aligned", "spike")
+
+    def __init__(
+        self,
+        sims: List[PoolNexusSimulator],
+        interval: float,
+        rate: float = 0.0,
+        profile: str = "steady",
+        jitter: float = 0.0,
+        spike_period: float = 60.0,
+    ):
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown profile {profile!r}")
+        self.sims = sims
+        self.interval = interval
+        self.rate = rate
+        self.profile = profile
+        self.jitter = jitter
+        self.spike_period = spike_period
+        self.running = False
+        self.cycles = 0
+        self.max_lag = 0.0
+        # (due, seq, device index); seq keeps heap entries comparable
+        self._heap: List[tuple] = []
+        self._seq = 0
+        self._by_serial: Dict[str, PoolNexusSimulator] = {sim.serial: sim for sim in sims}
+        self._tokens = 0.0
+        self._tokens_at = 0.0
+
+    @property
+    def published(self) -> int:
+        return sum(sim.published for sim in self.sims)
+
+    def _push(self, due: float, idx: int):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, idx))
+
+    def _next_interval(self) -> float:
+        if not self.jitter:
+            return self.interval
+        return self.interval * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def _throttle(self, sent: int):
+        """Token bucket on messages: sleep while the bucket is in debt."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._tokens_at) * self.rate)
+        self._tokens_at = now
+        self._tokens -= sent
+        if self._tokens < 0:
+            time.sleep(-self._tokens / self.rate)
+
+    def backlog(self, now: float) -> int:
+        """Return the number of device cycles already due but not published."""
+        return sum(1 for due, _, _ in self._heap if due <= now)
+
+    def run(self, duration: Optional[float] = None, report_interval: float = 5.0):
+        start = time.monotonic()
+        n = len(self.sims)
+        for idx in range(n):
+            offset = 0.0 if self.profile == "aligned" else self.interval * idx / n
+            self._push(start + offset, idx)
+        self._tokens_at = start
+        next_spike = start + self.spike_period
+        next_report = start + report_interval
+        # Retained burst of publish_all_initial(), not part of the run rate
+        initial = self.published
+        last_report, last_published = start, initial
+        self.running = True
+        while self.running:
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            if now >= next_report:
+                published = self.published
+                _LOGGER.info(
+                    "Fleet: %d devices, %.0f msgs/s achieved, backlog %d cycles, max lag %.2fs",
+                    n,
+                    (published - last_published) / (now - last_report),
+                    self.backlog(now),
+                    self.max_lag,
+                )
+                last_report, last_published = now, published
+                next_report = now + report_interval
+            if self.profile == "spike" and now >= next_spike:
+                for idx in range(n):
+                    self._push(now, -1 - idx)  # extra cycle, not rescheduled
+                next_spike += self.spike_period
+            due, _, idx = self._heap[0]
+            if due > now:
+                time.sleep(min(due, next_report) - now)
+                continue
+            heapq.heappop(self._heap)
+            self.max_lag = max(self.max_lag, now - due)
+            sim = self.sims[idx if idx >= 0 else -1 - idx]
+            before = sim.published
+            sim._publish_telemetry_cycle()
+            self.cycles += 1
+            if idx >= 0:
+                self._push(due + self._next_interval(), idx)
+            self._throttle(sim.published - before)
+        elapsed = time.monotonic() - start
+        published = self.published - initial
+        _LOGGER.info(
+            "Fleet summary: %d devices, %d cycles, %d publishes in %.1fs (%.0f msgs/s), "
+            "max lag %.2fs, %d initial publishes",
+            n,
+            self.cycles,
+            published,
+            elapsed,
+            published / elapsed if elapsed else 0.0,
+            self.max_lag,
+            initial,
+        )
+
+    def stop(self):
+        self.running = False
+
+    def on_message(self, client, userdata, msg):
+        """Route `<prefix>/<serial>/<key>/set` commands to the right device."""
+        parts = msg.topic.split("/")
+        if len(parts) < 3:
+            return
+        sim = self._by_serial.get(parts[-3] if parts[-1] == "set" else "")
+        if sim is not None:
+            sim.on_message(client, userdata, msg)
+
+
+def _create_client(client_id: Optional[str], username: Optional[str], password: Optional[str], broker: Any = None) -> mqtt.Client:
+    if broker is not None:
+        # in-process broker stand-in (offline benchmarks)
+        return StandinClient(broker, client_id or "")
+    client = mqtt.Client(client_id=client_id) if client_id else mqtt.Client()
+    if username:
+        # If password is None, username_pw_set still accepts None and will try
+        # to connect without a password (broker may reject it).
+        client.username_pw_set(username, password)
+    return client
+
+
+def resolve_credentials(username: Optional[str], password: Optional[str]):
+    """Resolve username/password from (in order): CLI args -> environment -> prompt."""
+    username = username or os.environ.get("MQTT_USERNAME")
+    password = password or os.environ.get("MQTT_PASSWORD")
+    if username and not password:
+        # Prompt for password interactively (doesn't show on terminal)
+        try:
+            password = getpass.getpass(f"MQTT password for '{username}': ")
+        except Exception:
+            password = None
+    return username, password
 
 
 def main():
@@ -268,10 +489,21 @@ def main():
     parser.add_argument("--username", help="MQTT username", default=None)
     parser.add_argument("--password", help="MQTT password", default=None)
     parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="topic prefix (e.g. poolnexus)")
-    parser.add_argument("--serial", required=True, help="device serial to include in topics")
+    parser.add_argument("--serial", required=True, help="device serial to include in topics (serial prefix in fleet mode)")
     parser.add_argument("--interval", type=float, default=10.0, help="telemetry publish interval seconds")
     parser.add_argument("--client-id", default=None, help="MQTT client id (optional)")
     parser.add_argument("--debug", action="store_true", help="enable debug logging")
+    parser.add_argument("--standin", action="store_true", help="publish to the in-process broker stand-in instead of --host (no network)")
+    parser.add_argument("--no-state-variant", dest="state_variant", action="store_false", help="publish values on <key> only, not on <key>/state too")
+    fleet = parser.add_argument_group("fleet / load-generator mode")
+    fleet.add_argument("--devices", type=int, default=1, help="number of simulated devices (fleet mode when > 1)")
+    fleet.add_argument("--connections", type=int, default=4, help="MQTT client connections shared by the fleet")
+    fleet.add_argument("--rate", type=float, default=0.0, help="cap on total publishes per second (0 = unlimited)")
+    fleet.add_argument("--profile", choices=FleetScheduler.PROFILES, default="steady", help="publish schedule profile")
+    fleet.add_argument("--jitter", type=float, default=0.0, help="random +/- fraction applied to each interval")
+    fleet.add_argument("--spike-period", type=float, default=60.0, help="seconds between fleet-wide bursts (spike profile)")
+    fleet.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    fleet.add_argument("--report-interval", type=float, default=5.0, help="seconds between throughput reports")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
@@ -287,24 +519,17 @@ def main():
         category=DeprecationWarning,
     )
 
-    client = mqtt.Client(client_id=args.client_id) if args.client_id else mqtt.Client()
+    username, password = resolve_credentials(args.username, args.password)
 
-    # Resolve username/password from (in order): CLI args -> environment -> prompt
-    username = args.username or os.environ.get("MQTT_USERNAME")
-    password = args.password or os.environ.get("MQTT_PASSWORD")
-    if username and not password:
-        # Prompt for password interactively (doesn't show on terminal)
-        try:
-            password = getpass.getpass(f"MQTT password for '{username}': ")
-        except Exception:
-            password = None
+    broker = Broker() if args.standin else None
 
-    if username:
-        # If password is None, username_pw_set still accepts None and will try
-        # to connect without a password (broker may reject it).
-        client.username_pw_set(username, password)
+    if args.devices > 1:
+        run_fleet(args, username, password, broker)
+        return
 
-    sim = PoolNexusSimulator(client, args.prefix, args.serial, interval=args.interval)
+    client = _create_client(args.client_id, username, password, broker)
+
+    sim = PoolNexusSimulator(client, args.prefix, args.serial, interval=args.interval, state_variant=args.state_variant)
 
     def _on_connect(client, userdata, flags, rc):
         if rc == 0:
@@ -335,5 +560,62 @@ def main():
         client.disconnect()
 
 
+def run_fleet(args, username: Optional[str], password: Optional[str], broker: Any = None):
+    """Run `args.devices` virtual devices over `args.connections` clients."""
+    base_id = args.client_id or f"poolnexus-sim-{os.getpid()}"
+    clients = [
+        _create_client(f"{base_id}-{k}", username, password, broker)
+        for k in range(max(1, min(args.connections, args.devices)))
+    ]
+    sims = [
+        PoolNexusSimulator(
+            clients[i % len(clients)],
+            args.prefix,
+            f"{args.serial}{i:05d}",
+            interval=args.interval,
+            state_variant=args.state_variant,
+        )
+        for i in range(args.devices)
+    ]
+    scheduler = FleetScheduler(
+        sims,
+        args.interval,
+        rate=args.rate,
+        profile=args.profile,
+        jitter=args.jitter,
+        spike_period=args.spike_period,
+    )
+    # A single wildcard subscription receives the commands of the whole fleet
+    clients[0].on_message = scheduler.on_message
+
+    try:
+        for client in clients:
+            client.connect(args.host, args.port)
+            client.loop_start()
+    except Exception as exc:
+        _LOGGER.exception("Failed to connect to broker: %s", exc)
+        for client in clients:
+            client.loop_stop()
+        return
+
+    try:
+        clients[0].subscribe(f"{args.prefix}/+/+/set")
+        for sim in sims:
+            sim.publish_all_initial()
+        _LOGGER.info(
+            "Fleet running (%d devices, %d connections, profile=%s). Press Ctrl-C to stop.",
+            len(sims),
+            len(clients),
+            args.profile,
+        )
+        scheduler.run(duration=args.duration, report_interval=args.report_interval)
+    except KeyboardInterrupt:
+        _LOGGER.info("Stopping fleet...")
+        scheduler.stop()
+    finally:
+        for client in clients:
+            client.loop_stop()
+            client.disconnect()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,633 @@
+"""
+Asyncio PoolNexus fleet simulator: one event loop, no locks.
+
+Every simulated device, its command handling and the optional command load
+generator run as callbacks of a single asyncio loop, so publishes and
+commands are never serialized behind a lock and thousands of devices cost
+no thread. The device behaviour is the `DeviceModel` of
+`mqtt_poolnexus_simulator.py`; telemetry cycles are plain `loop.call_at`
+timers and commands arrive through one `<prefix>/+/+/set` subscription.
+
+Transports:
+ - `PahoTransport`: a paho-mqtt client driven by the loop (socket readers and
+   writers registered on the loop instead of paho's network thread), one per
+   `--connections`;
+ - `StandinTransport`: the in-process broker stand-in (`--standin`), with
+   deliveries scheduled on the loop like network reads.
+
+Measured under load (logged every `--report-interval`, summary printed as
+JSON and written with `--output`):
+ - publishes/s and publish latency: time from `publish()` until the broker
+   takes it (paho `on_publish`: PUBACK with `--qos 1`, written to the socket
+   with QoS 0; stand-in: routed);
+ - commands/s and command round trip: with `--command-rate`, a controller
+   toggles `switch_1` of the devices in turn and waits for each device to
+   report the commanded state;
+ - schedule lag of the telemetry cycles and event loop lag.
+
+Usage:
+    python tools/mqtt_poolnexus_simulator_async.py --standin --serial SIM --devices 2000 --command-rate 500 --duration 60
+    python tools/mqtt_poolnexus_simulator_async.py --host 127.0.0.1 --serial SIM --devices 2000 --connections 4 --qos 1 --command-rate 200
+
+Dependencies:
+    pip install paho-mqtt
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+
+from mqtt_broker_standin import Broker, StandinMessage
+from mqtt_poolnexus_simulator import (
+    DEFAULT_PREFIX,
+    DeviceModel,
+    FleetScheduler,
+    _create_client,
+    command_topic,
+    resolve_credentials,
+    topic,
+)
+
+_LOGGER = logging.getLogger("poolnexus_simulator_async")
+
+MessageCallback = Callable[[str, bytes], None]
+
+# Switch toggled by the command load generator
+COMMAND_KEY = "switch_1"
+# Seconds a command waits for the device to report its state
+COMMAND_TIMEOUT = 10.0
+# Seconds between command load ticks
+COMMAND_TICK = 0.01
+# Seconds between event loop lag probes
+LOOP_PROBE_INTERVAL = 0.1
+
+
+class LatencyStats:
+    """Latency samples in seconds, summarized as milliseconds."""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self._reported = 0
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @staticmethod
+    def _summary(samples: List[float]) -> Dict[str, float]:
+        if not samples:
+            return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            "count": len(ordered),
+            "p50_ms": round(ordered[round(0.50 * last)] * 1000, 3),
+            "p99_ms": round(ordered[round(0.99 * last)] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+    def summary(self) -> Dict[str, float]:
+        return self._summary(self.samples)
+
+    def interval_summary(self) -> Dict[str, float]:
+        """Summary of the samples added since the previous call."""
+        samples = self.samples[self._reported :]
+        self._reported = len(self.samples)
+        return self._summary(samples)
+
+
+class StandinTransport:
+    """Connection to the in-process broker stand-in, delivering on the loop."""
+
+    def __init__(self, broker: Broker, name: str, latency: LatencyStats):
+        self.broker = broker
+        self.name = name
+        self.latency = latency
+        self.published = 0
+        self._loop = asyncio.get_running_loop()
+        self._sessions = []
+
+    async def async_connect(self):
+        return None
+
+    def subscribe(self, pattern: str, on_message: MessageCallback, qos: int = 0):
+        call_soon = self._loop.call_soon
+
+        def _deliver(msg: StandinMessage):
+            # Next loop iteration, like a network read
+            call_soon(on_message, msg.topic, msg.payload)
+
+        session = self.broker.attach(f"{self.name}:{pattern}", _deliver)
+        self._sessions.append(session)
+        self.broker.subscribe(session, pattern, qos)
+
+    def publish(self, topic_: str, payload: Any, qos: int = 0, retain: bool = False):
+        start = time.perf_counter()
+        self.broker.publish(topic_, payload, qos, retain)
+        self.latency.add(time.perf_counter() - start)
+        self.published += 1
+
+    def close(self):
+        for session in self._sessions:
+            self.broker.detach(session)
+        self._sessions.clear()
+
+
+class PahoTransport:
+    """paho-mqtt client whose network I/O runs on the asyncio loop."""
+
+    def __init__(self, client_id: str, username: Optional[str], password: Optional[str], latency: LatencyStats):
+        self.client = _create_client(client_id, username, password)
+        self.latency = latency
+        self.published = 0
+        self._loop = asyncio.get_running_loop()
+        self._connected = self._loop.create_future()
+        self._misc: Optional[asyncio.Task] = None
+        # mid -> perf_counter() of the publish call
+        self._sent: Dict[int, float] = {}
+        self._publish_start = 0.0
+        client = self.client
+        client.on_connect = self._on_connect
+        client.on_publish = self._on_publish
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    async def async_connect(self, host: str, port: int):
+        self.client.connect(host, port)
+        await self._connected
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if self._connected.done():
+            return
+        if rc == 0:
+            self._connected.set_result(None)
+        else:
+            self._connected.set_exception(ConnectionError(f"MQTT connection failed with rc={rc}"))
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+        self._misc = self._loop.create_task(self._async_misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+            self._misc = None
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    async def _async_misc_loop(self):
+        # Keepalive pings and retries, what paho's network thread would do
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    def _on_publish(self, client, userdata, mid, *args):
+        sent = self._sent.pop(mid, None)
+        if sent is None:
+            # Written before publish() returned the mid
+            sent = self._publish_start
+        self.latency.add(time.perf_counter() - sent)
+
+    def subscribe(self, pattern: str, on_message: MessageCallback, qos: int = 0):
+        def _on_message(client, userdata, msg):
+            on_message(msg.topic, msg.payload)
+
+        self.client.message_callback_add(pattern, _on_message)
+        self.client.subscribe(pattern, qos)
+
+    def publish(self, topic_: str, payload: Any, qos: int = 0, retain: bool = False):
+        self._publish_start = start = time.perf_counter()
+        info = self.client.publish(topic_, payload, qos, retain)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            _LOGGER.debug("Failed to publish to %s: rc=%s", topic_, info.rc)
+            return
+        if not info.is_published():
+            self._sent[info.mid] = start
+        self.published += 1
+
+    def close(self):
+        self.client.disconnect()
+
+
+class AsyncDevice:
+    """One simulated device publishing through a transport."""
+
+    __slots__ = ("serial", "base", "model", "transport", "state_variant", "qos")
+
+    def __init__(self, prefix: str, serial: str, transport, state_variant: bool = True, qos: int = 0):
+        self.serial = serial
+        self.base = f"{prefix}/{serial}"
+        self.model = DeviceModel()
+        self.transport = transport
+        self.state_variant = state_variant
+        self.qos = qos
+
+    def publish_retained(self, key: str, value: Any):
+        t = topic(self.base, key)
+        payload = str(value)
+        self.transport.publish(t, payload, self.qos, True)
+        if self.state_variant:
+            self.transport.publish(f"{t}/state", payload, self.qos, True)
+
+    def publish_values(self, values):
+        for key, value in values:
+            self.publish_retained(key, value)
+
+    def handle_set_message(self, key: str, payload: bytes):
+        update = self.model.apply_set(key, payload.decode("utf-8") if payload else "")
+        if update is None:
+            _LOGGER.warning("Unknown set key for %s: %s", self.serial, key)
+            return
+        self.publish_retained(*update)
+
+
+class AsyncFleet:
+    """Telemetry schedule and command handling of every device on one loop.
+
+    Same profiles, jitter and rate cap as `FleetScheduler`, but every device
+    cycle is a `loop.call_at` timer instead of an entry in a heap polled by
+    a thread.
+    """
+
+    def __init__(
+        self,
+        devices: List[AsyncDevice],
+        interval: float,
+        rate: float = 0.0,
+        profile: str = "steady",
+        jitter: float = 0.0,
+        spike_period: float = 60.0,
+    ):
+        if profile not in FleetScheduler.PROFILES:
+            raise ValueError(f"Unknown profile {profile!r}")
+        self.devices = devices
+        self.interval = interval
+        self.rate = rate
+        self.profile = profile
+        self.jitter = jitter
+        self.spike_period = spike_period
+        self.cycles = 0
+        self.commands = 0
+        self.max_lag = 0.0
+        self._by_serial: Dict[str, AsyncDevice] = {device.serial: device for device in devices}
+        self._loop = asyncio.get_running_loop()
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._spike: Optional[asyncio.TimerHandle] = None
+        # device index -> due time of its cycle, while waiting for rate tokens
+        self._due: Dict[int, float] = {}
+        self._tokens = 0.0
+        self._tokens_at = 0.0
+
+    def start(self, command_transport):
+        """Subscribe to the commands, publish the initial states and schedule the cycles."""
+        prefix = self.devices[0].base.rpartition("/")[0] if self.devices else DEFAULT_PREFIX
+        command_transport.subscribe(command_topic(f"{prefix}/+", "+"), self._on_command)
+        for device in self.devices:
+            device.publish_values(device.model.initial_values())
+        now = self._loop.time()
+        self._tokens_at = now
+        n = len(self.devices)
+        for idx in range(n):
+            offset = 0.0 if self.profile == "aligned" else self.interval * idx / n
+            self._schedule(idx, now + offset)
+        if self.profile == "spike":
+            self._spike = self._loop.call_at(now + self.spike_period, self._spike_cycle)
+
+    def stop(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        if self._spike is not None:
+            self._spike.cancel()
+
+    def _schedule(self, idx: int, due: float):
+        self._due[idx] = due
+        self._timers[idx] = self._loop.call_at(due, self._cycle, idx)
+
+    def _next_interval(self) -> float:
+        if not self.jitter:
+            return self.interval
+        return self.interval * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def _take_tokens(self, count: int) -> float:
+        """Token bucket on messages: return how long to wait before spending ``count``."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._loop.time()
+        self._tokens = min(self.rate, self._tokens + (now - self._tokens_at) * self.rate)
+        self._tokens_at = now
+        if self._tokens < 0:
+            return -self._tokens / self.rate
+        self._tokens -= count
+        return 0.0
+
+    def _cycle(self, idx: int):
+        device = self.devices[idx]
+        due = self._due[idx]
+        values = device.model.telemetry_values()
+        wait = self._take_tokens(len(values) * (2 if device.state_variant else 1))
+        if wait > 0:
+            # Over the rate cap: retry once the bucket refilled, still late
+            self._timers[idx] = self._loop.call_later(wait, self._cycle, idx)
+            return
+        self.max_lag = max(self.max_lag, self._loop.time() - due)
+        device.publish_values(values)
+        self.cycles += 1
+        self._schedule(idx, due + self._next_interval())
+
+    def _spike_cycle(self):
+        for device in self.devices:
+            device.publish_values(device.model.telemetry_values())
+            self.cycles += 1
+        self._spike = self._loop.call_later(self.spike_period, self._spike_cycle)
+
+    def backlog(self) -> int:
+        """Return the number of device cycles already due but not published."""
+        now = self._loop.time()
+        return sum(1 for due in self._due.values() if due <= now)
+
+    def _on_command(self, topic_: str, payload: bytes):
+        """Route `<prefix>/<serial>/<key>/set` commands to the right device."""
+        parts = topic_.split("/")
+        if len(parts) < 4 or parts[-1] != "set":
+            return
+        device = self._by_serial.get(parts[-3])
+        if device is not None:
+            self.commands += 1
+            device.handle_set_message(parts[-2], payload)
+
+
+class CommandLoad:
+    """Controller toggling `COMMAND_KEY` of the devices at ``rate`` commands/s.
+
+    A command completes when the device reports the commanded state; devices
+    with a command in flight are skipped, so a saturated fleet shows up as
+    `skipped` instead of an ever growing queue.
+    """
+
+    def __init__(self, transport, prefix: str, serials: List[str], rate: float, qos: int = 0):
+        self.transport = transport
+        self.prefix = prefix
+        self.serials = serials
+        self.rate = rate
+        self.qos = qos
+        self.round_trip = LatencyStats()
+        self.sent = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self._loop = asyncio.get_running_loop()
+        # serial -> (commanded payload, perf_counter() when sent)
+        self._pending: Dict[str, tuple] = {}
+        self._values: Dict[str, bool] = {}
+        self._next = itertools.cycle(serials)
+        self._credit = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # (deadline, serial) of the pending commands
+        self._deadlines: List[tuple] = []
+
+    @property
+    def completed(self) -> int:
+        return len(self.round_trip)
+
+    def start(self):
+        self.transport.subscribe(topic(f"{self.prefix}/+", COMMAND_KEY), self._on_state, self.qos)
+        self._timer = self._loop.call_later(COMMAND_TICK, self._tick)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _tick(self):
+        self._timer = self._loop.call_later(COMMAND_TICK, self._tick)
+        now = time.perf_counter()
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            _, serial = heapq.heappop(deadlines)
+            pending = self._pending.get(serial)
+            if pending is not None and pending[1] + COMMAND_TIMEOUT <= now:
+                del self._pending[serial]
+                self.timeouts += 1
+        self._credit += self.rate * COMMAND_TICK
+        while self._credit >= 1:
+            self._credit -= 1
+            self._send()
+
+    def _send(self):
+        for _ in range(len(self.serials)):
+            serial = next(self._next)
+            if serial not in self._pending:
+                break
+        else:
+            self.skipped += 1
+            return
+        value = not self._values.get(serial, False)
+        self._values[serial] = value
+        payload = "ON" if value else "OFF"
+        sent = time.perf_counter()
+        self._pending[serial] = (payload.encode("ascii"), sent)
+        heapq.heappush(self._deadlines, (sent + COMMAND_TIMEOUT, serial))
+        self.transport.publish(command_topic(f"{self.prefix}/{serial}", COMMAND_KEY), payload, self.qos, True)
+        self.sent += 1
+
+    def _on_state(self, topic_: str, payload: bytes):
+        serial = topic_[len(self.prefix) + 1 :].partition("/")[0]
+        pending = self._pending.get(serial)
+        if pending is None or payload != pending[0]:
+            # Telemetry republishing the previous state
+            return
+        del self._pending[serial]
+        self.round_trip.add(time.perf_counter() - pending[1])
+
+
+class LoopMonitor:
+    """Measure how late the event loop runs a periodic callback."""
+
+    def __init__(self):
+        self.lag = LatencyStats()
+        self._loop = asyncio.get_running_loop()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self):
+        self._schedule(self._loop.time() + LOOP_PROBE_INTERVAL)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _schedule(self, due: float):
+        self._timer = self._loop.call_at(due, self._probe, due)
+
+    def _probe(self, due: float):
+        now = self._loop.time()
+        self.lag.add(now - due)
+        self._schedule(now + LOOP_PROBE_INTERVAL)
+
+
+async def async_run(args, username: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Any]:
+    """Run the fleet (and command load) for ``args.duration`` seconds; return the results."""
+    publish_latency = LatencyStats()
+    n_transports = max(1, min(args.connections, args.devices))
+    base_id = args.client_id or f"poolnexus-sim-async-{os.getpid()}"
+    if args.standin:
+        broker = Broker()
+        transports = [StandinTransport(broker, f"{base_id}-{k}", publish_latency) for k in range(n_transports)]
+        controller = StandinTransport(broker, f"{base_id}-controller", LatencyStats())
+    else:
+        transports = [PahoTransport(f"{base_id}-{k}", username, password, publish_latency) for k in range(n_transports)]
+        controller = PahoTransport(f"{base_id}-controller", username, password, LatencyStats())
+    connect_args = () if args.standin else (args.host, args.port)
+    await asyncio.gather(*(t.async_connect(*connect_args) for t in transports + [controller]))
+
+    devices = [
+        AsyncDevice(args.prefix, f"{args.serial}{i:05d}", transports[i % n_transports], args.state_variant, args.qos)
+        for i in range(args.devices)
+    ]
+    fleet = AsyncFleet(
+        devices,
+        args.interval,
+        rate=args.rate,
+        profile=args.profile,
+        jitter=args.jitter,
+        spike_period=args.spike_period,
+    )
+    load = CommandLoad(controller, args.prefix, [d.serial for d in devices], args.command_rate, args.qos) if args.command_rate > 0 else None
+    monitor = LoopMonitor()
+
+    def _published() -> int:
+        return sum(t.published for t in transports)
+
+    start = time.monotonic()
+    fleet.start(transports[0])
+    if load is not None:
+        load.start()
+    monitor.start()
+    _LOGGER.info(
+        "Async fleet running (%d devices, %d connections, profile=%s, %s). Press Ctrl-C to stop.",
+        len(devices),
+        n_transports,
+        args.profile,
+        "stand-in" if args.standin else f"{args.host}:{args.port}",
+    )
+    last_report, last_published, last_completed = start, _published(), 0
+    try:
+        while args.duration is None or time.monotonic() - start < args.duration:
+            remaining = args.duration - (time.monotonic() - start) if args.duration is not None else args.report_interval
+            await asyncio.sleep(min(args.report_interval, remaining))
+            now = time.monotonic()
+            published = _published()
+            completed = load.completed if load is not None else 0
+            _LOGGER.info(
+                "Async fleet: %.0f msgs/s, publish p99 %.2f ms, %.0f commands/s, command p99 %.1f ms, backlog %d, loop lag max %.1f ms",
+                (published - last_published) / (now - last_report),
+                publish_latency.interval_summary()["p99_ms"],
+                (completed - last_completed) / (now - last_report),
+                load.round_trip.interval_summary()["p99_ms"] if load is not None else 0.0,
+                fleet.backlog(),
+                monitor.lag.interval_summary()["max_ms"],
+            )
+            last_report, last_published, last_completed = now, published, completed
+    except asyncio.CancelledError:
+        _LOGGER.info("Stopping async fleet...")
+    finally:
+        monitor.stop()
+        if load is not None:
+            load.stop()
+        fleet.stop()
+        # Let the last acknowledgements arrive
+        await asyncio.sleep(0.2)
+        for transport in transports + [controller]:
+            transport.close()
+
+    elapsed = time.monotonic() - start
+    results: Dict[str, Any] = {
+        "devices": len(devices),
+        "connections": n_transports,
+        "transport": "standin" if args.standin else "paho",
+        "qos": args.qos,
+        "duration_s": round(elapsed, 3),
+        "cycles": fleet.cycles,
+        "publishes": _published(),
+        "publishes_per_s": round(_published() / elapsed, 1) if elapsed else 0.0,
+        "publish_latency": publish_latency.summary(),
+        "schedule_max_lag_s": round(fleet.max_lag, 3),
+        "loop_lag": monitor.lag.summary(),
+        "commands_handled": fleet.commands,
+    }
+    if load is not None:
+        results["command_load"] = {
+            "rate": args.command_rate,
+            "sent": load.sent,
+            "completed": load.completed,
+            "commands_per_s": round(load.completed / elapsed, 1) if elapsed else 0.0,
+            "skipped": load.skipped,
+            "timeouts": load.timeouts,
+            "round_trip": load.round_trip.summary(),
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="PoolNexus asyncio fleet simulator")
+    parser.add_argument("--host", default="127.0.0.1", help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--username", help="MQTT username", default=None)
+    parser.add_argument("--password", help="MQTT password", default=None)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="topic prefix (e.g. poolnexus)")
+    parser.add_argument("--serial", required=True, help="serial prefix of the devices (SIM -> SIM00000, SIM00001, ...)")
+    parser.add_argument("--interval", type=float, default=10.0, help="telemetry publish interval seconds")
+    parser.add_argument("--client-id", default=None, help="MQTT client id prefix (optional)")
+    parser.add_argument("--debug", action="store_true", help="enable debug logging")
+    parser.add_argument("--standin", action="store_true", help="use the in-process broker stand-in instead of --host (no network)")
+    parser.add_argument("--no-state-variant", dest="state_variant", action="store_false", help="publish values on <key> only, not on <key>/state too")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1), help="QoS of the publishes (1: publish latency up to the PUBACK)")
+    parser.add_argument("--devices", type=int, default=1, help="number of simulated devices")
+    parser.add_argument("--connections", type=int, default=4, help="MQTT connections shared by the fleet")
+    parser.add_argument("--rate", type=float, default=0.0, help="cap on total publishes per second (0 = unlimited)")
+    parser.add_argument("--profile", choices=FleetScheduler.PROFILES, default="steady", help="publish schedule profile")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- fraction applied to each interval")
+    parser.add_argument("--spike-period", type=float, default=60.0, help="seconds between fleet-wide bursts (spike profile)")
+    parser.add_argument("--command-rate", type=float, default=0.0, help="commands per second sent to the fleet by the load generator (0 = none)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between throughput reports")
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    warnings.filterwarnings(
+        "ignore",
+        message=r".*Callback API version 1 is deprecated.*",
+        category=DeprecationWarning,
+    )
+    username, password = (None, None) if args.standin else resolve_credentials(args.username, args.password)
+
+    try:
+        results = asyncio.run(async_run(args, username, password))
+    except KeyboardInterrupt:
+        return
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
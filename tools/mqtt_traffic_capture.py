@@ -0,0 +1,593 @@
+"""
+Record and replay PoolNexus MQTT traffic.
+
+`record` subscribes to a broker and appends every message (topic, payload,
+retain flag, QoS, arrival time) to a compact binary capture; `replay` feeds a
+capture back at its recorded pace (`--speed 1`), N times faster
+(`--speed N`) or as fast as possible (`--speed 0`), either to a broker, to
+the in-process broker stand-in, or straight into the hub dispatcher and the
+entity callbacks of `custom_components/poolnexus` (the harness of
+`benchmark_poolnexus.py`). `info` summarizes a capture per serial.
+
+Capture format (little endian, append-only, read through mmap):
+ - header: magic ``PNXCAP1\\0``, version (u16), start time (f64, epoch
+   seconds), prefix length (u16) and the topic prefix;
+ - topic record: kind 1 (u8), topic id (u32), length (u16), topic. Each
+   topic is written once, before its first message;
+ - message record: kind 2 (u8), time since start (f64, seconds), topic id
+   (u32), flags (u8: bit 0 retain, bits 1-2 QoS), payload length (u32),
+   payload.
+A torn record at the end (recorder killed mid-write) is ignored on read and
+cut off when the capture is appended to.
+
+The index by serial lives in a ``<capture>.idx`` sidecar: for each serial,
+the offsets of its message records, then the topic table. It is written
+when the recorder stops and rebuilt by a scan when it is missing or older
+than the capture, so opening a large capture reads no record and replaying
+a few devices only touches theirs.
+
+Usage:
+    python tools/mqtt_traffic_capture.py record --host 127.0.0.1 --prefix poolnexus --output pool.pnxcap --duration 3600
+    python tools/mqtt_traffic_capture.py info pool.pnxcap
+    python tools/mqtt_traffic_capture.py replay pool.pnxcap --host 127.0.0.1 --speed 1
+    python tools/mqtt_traffic_capture.py replay pool.pnxcap --standin --speed 0
+    python tools/mqtt_traffic_capture.py replay pool.pnxcap --callbacks --speed 10 --serial SN12345
+
+Dependencies:
+    pip install paho-mqtt              (record, replay to a broker)
+    pip install homeassistant          (replay --callbacks)
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import warnings
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+_LOGGER = logging.getLogger("poolnexus_capture")
+
+DEFAULT_PREFIX = "poolnexus"
+
+MAGIC = b"PNXCAP1\0"
+INDEX_MAGIC = b"PNXIDX1\0"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHdH")
+TOPIC = struct.Struct("<BIH")
+MESSAGE = struct.Struct("<BdIBI")
+INDEX_HEADER = struct.Struct("<8sQI")
+INDEX_SERIAL = struct.Struct("<HI")
+INDEX_TOPIC = struct.Struct("<IH")
+
+KIND_TOPIC = 1
+KIND_MESSAGE = 2
+FLAG_RETAIN = 0x01
+
+
+class CapturedMessage(NamedTuple):
+    """One recorded message; `time` is in seconds since the capture start."""
+
+    time: float
+    topic: str
+    payload: bytes
+    qos: int
+    retain: bool
+
+
+def serial_of(prefix: str, topic: str) -> str:
+    """Return the serial segment of ``<prefix>/<serial>/...``, "" for other topics."""
+    if not topic.startswith(prefix + "/"):
+        return ""
+    return topic[len(prefix) + 1 :].partition("/")[0]
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+class CaptureReader:
+    """Read-only, memory-mapped view of a capture file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.start, prefix_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a PoolNexus capture")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported capture version {version}")
+        self.prefix = bytes(self._mm[HEADER.size : HEADER.size + prefix_len]).decode("utf-8")
+        self.data_offset = HEADER.size + prefix_len
+        # topic id -> topic
+        self.topics: Dict[int, str] = {}
+        # serial -> offsets of its message records
+        self.index: Dict[str, array] = {}
+        # End of the last complete record
+        self.end = self.data_offset
+        self._load_index() or self._scan()
+
+    def close(self):
+        self._mm.close()
+        self._fh.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(len(offsets) for offsets in self.index.values())
+
+    @property
+    def serials(self) -> List[str]:
+        return sorted(self.index)
+
+    def _scan(self):
+        """Read the topic records and build the index from the whole capture."""
+        mm, size = self._mm, len(self._mm)
+        offset = self.data_offset
+        topics, index = self.topics, self.index
+        serial_of_topic: Dict[int, str] = {}
+        while offset < size:
+            kind = mm[offset]
+            if kind == KIND_TOPIC:
+                if offset + TOPIC.size > size:
+                    break
+                _, topic_id, length = TOPIC.unpack_from(mm, offset)
+                end = offset + TOPIC.size + length
+                if end > size:
+                    break
+                topic = bytes(mm[offset + TOPIC.size : end]).decode("utf-8")
+                topics[topic_id] = topic
+                serial_of_topic[topic_id] = serial_of(self.prefix, topic)
+            elif kind == KIND_MESSAGE:
+                if offset + MESSAGE.size > size:
+                    break
+                _, _, topic_id, _, length = MESSAGE.unpack_from(mm, offset)
+                end = offset + MESSAGE.size + length
+                if end > size:
+                    break
+                serial = serial_of_topic[topic_id]
+                offsets = index.get(serial)
+                if offsets is None:
+                    offsets = index[serial] = array("Q")
+                offsets.append(offset)
+            else:
+                _LOGGER.warning("%s: unknown record kind %s at %d, stopping", self.path, kind, offset)
+                break
+            offset = end
+        self.end = offset
+
+    def _load_index(self) -> bool:
+        """Load the sidecar index if it covers the whole capture."""
+        try:
+            with open(index_path(self.path), "rb") as fh:
+                data = fh.read()
+        except OSError:
+            return False
+        try:
+            magic, covered, serials = INDEX_HEADER.unpack_from(data, 0)
+            if magic != INDEX_MAGIC or covered != len(self._mm):
+                return False
+            pos = INDEX_HEADER.size
+            index: Dict[str, array] = {}
+            for _ in range(serials):
+                name_len, count = INDEX_SERIAL.unpack_from(data, pos)
+                pos += INDEX_SERIAL.size
+                serial = data[pos : pos + name_len].decode("utf-8")
+                pos += name_len
+                offsets = array("Q")
+                offsets.frombytes(data[pos : pos + 8 * count])
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+                pos += 8 * count
+                index[serial] = offsets
+            topics: Dict[int, str] = {}
+            (count,) = struct.unpack_from("<I", data, pos)
+            pos += 4
+            for _ in range(count):
+                topic_id, length = INDEX_TOPIC.unpack_from(data, pos)
+                pos += INDEX_TOPIC.size
+                topics[topic_id] = data[pos : pos + length].decode("utf-8")
+                pos += length
+        except (struct.error, UnicodeDecodeError, ValueError):
+            _LOGGER.debug("Ignoring damaged index of %s", self.path)
+            return False
+        self.index = index
+        self.topics = topics
+        self.end = covered
+        return True
+
+    def write_index(self):
+        write_index(self.path, self.end, self.index, self.topics)
+
+    def message_at(self, offset: int) -> CapturedMessage:
+        _, t, topic_id, flags, length = MESSAGE.unpack_from(self._mm, offset)
+        start = offset + MESSAGE.size
+        return CapturedMessage(
+            t,
+            self.topics[topic_id],
+            self._mm[start : start + length],
+            (flags >> 1) & 0x03,
+            bool(flags & FLAG_RETAIN),
+        )
+
+    def messages(self, serials: Optional[Sequence[str]] = None) -> Iterator[CapturedMessage]:
+        """Yield the messages of ``serials`` (default: all) in recorded order."""
+        if serials is None:
+            offsets = [self.index[serial] for serial in self.index]
+        else:
+            offsets = [self.index[serial] for serial in serials if serial in self.index]
+        if len(offsets) == 1:
+            ordered: Iterator[int] = iter(offsets[0])
+        else:
+            ordered = heapq.merge(*offsets)
+        message_at = self.message_at
+        for offset in ordered:
+            yield message_at(offset)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return message count, byte count and time span per serial."""
+        devices = {}
+        for serial, offsets in sorted(self.index.items()):
+            first = self.message_at(offsets[0]).time
+            last = self.message_at(offsets[-1]).time
+            size = sum(MESSAGE.unpack_from(self._mm, offset)[4] for offset in offsets)
+            devices[serial or "(outside prefix)"] = {
+                "messages": len(offsets),
+                "payload_bytes": size,
+                "first_s": round(first, 3),
+                "last_s": round(last, 3),
+            }
+        return {
+            "path": self.path,
+            "prefix": self.prefix,
+            "start": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.start)),
+            "bytes": self.end,
+            "topics": len(self.topics),
+            "messages": len(self),
+            "devices": devices,
+        }
+
+
+def write_index(path: str, covered: int, index: Dict[str, array], topics: Dict[int, str]):
+    """Write the sidecar index of ``path`` (covering its first ``covered`` bytes)."""
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(INDEX_HEADER.pack(INDEX_MAGIC, covered, len(index)))
+        for serial, offsets in index.items():
+            name = serial.encode("utf-8")
+            fh.write(INDEX_SERIAL.pack(len(name), len(offsets)))
+            fh.write(name)
+            if sys.byteorder != "little":
+                offsets = array("Q", offsets)
+                offsets.byteswap()
+            offsets.tofile(fh)
+        fh.write(struct.pack("<I", len(topics)))
+        for topic_id, topic in topics.items():
+            encoded = topic.encode("utf-8")
+            fh.write(INDEX_TOPIC.pack(topic_id, len(encoded)))
+            fh.write(encoded)
+    os.replace(tmp, index_path(path))
+
+
+class CaptureWriter:
+    """Append messages to a capture file, creating it if needed.
+
+    `append` may be called from the MQTT network thread while another
+    thread calls `flush`.
+    """
+
+    def __init__(self, path: str, prefix: str = DEFAULT_PREFIX):
+        self.path = path
+        self._lock = threading.Lock()
+        self._topic_ids: Dict[str, int] = {}
+        self._serials: Dict[int, str] = {}
+        self.index: Dict[str, array] = {}
+        self.written = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with CaptureReader(path) as reader:
+                self.prefix = reader.prefix
+                self.start = reader.start
+                self._topic_ids = {topic: topic_id for topic_id, topic in reader.topics.items()}
+                self.index = reader.index
+                end = reader.end
+            if prefix != self.prefix:
+                _LOGGER.warning("Appending to %s recorded under prefix %s, not %s", path, self.prefix, prefix)
+            self._serials = {topic_id: serial_of(self.prefix, topic) for topic, topic_id in self._topic_ids.items()}
+            self._fh = open(path, "r+b")
+            # Cut off a torn record left by an interrupted recorder
+            self._fh.truncate(end)
+            self._fh.seek(end)
+            self._offset = end
+        else:
+            self.prefix = prefix
+            self.start = time.time()
+            encoded = prefix.encode("utf-8")
+            self._fh = open(path, "wb")
+            self._fh.write(HEADER.pack(MAGIC, VERSION, self.start, len(encoded)) + encoded)
+            self._offset = HEADER.size + len(encoded)
+        # Monotonic clock of this session, mapped onto the capture time line
+        self._session_offset = time.time() - self.start
+        self._session_start = time.monotonic()
+        self._last_time = 0.0
+
+    def append(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False, timestamp: Optional[float] = None):
+        """Append a message received at ``timestamp`` (time.monotonic(), default now)."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        t = max(self._session_offset + timestamp - self._session_start, self._last_time)
+        with self._lock:
+            fh = self._fh
+            topic_id = self._topic_ids.get(topic)
+            if topic_id is None:
+                topic_id = self._topic_ids[topic] = len(self._topic_ids)
+                self._serials[topic_id] = serial_of(self.prefix, topic)
+                encoded = topic.encode("utf-8")
+                fh.write(TOPIC.pack(KIND_TOPIC, topic_id, len(encoded)))
+                fh.write(encoded)
+                self._offset += TOPIC.size + len(encoded)
+            serial = self._serials[topic_id]
+            offsets = self.index.get(serial)
+            if offsets is None:
+                offsets = self.index[serial] = array("Q")
+            offsets.append(self._offset)
+            flags = (FLAG_RETAIN if retain else 0) | ((qos & 0x03) << 1)
+            fh.write(MESSAGE.pack(KIND_MESSAGE, t, topic_id, flags, len(payload)))
+            fh.write(payload)
+            self._offset += MESSAGE.size + len(payload)
+            self._last_time = t
+            self.written += 1
+
+    def flush(self):
+        with self._lock:
+            self._fh.flush()
+
+    def close(self):
+        """Flush the capture and write its index."""
+        with self._lock:
+            self._fh.close()
+            topics = {topic_id: topic for topic, topic_id in self._topic_ids.items()}
+            write_index(self.path, self._offset, self.index, topics)
+
+
+class Pacer:
+    """Hold a replay to the recorded pace, ``speed`` times faster (0: no pacing)."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self._origin: Optional[float] = None
+        self._wall_start = 0.0
+        # Worst delay behind the scaled recorded schedule, in seconds
+        self.max_lag = 0.0
+
+    def delay(self, t: float) -> float:
+        """Return how long to wait before the message recorded at ``t``."""
+        if self.speed <= 0:
+            return 0.0
+        now = time.monotonic()
+        if self._origin is None:
+            self._origin = t
+            self._wall_start = now
+            return 0.0
+        ahead = self._wall_start + (t - self._origin) / self.speed - now
+        if ahead < 0 and -ahead > self.max_lag:
+            self.max_lag = -ahead
+        return ahead
+
+
+def replay(messages: Iterator[CapturedMessage], publish: Callable[..., Any], speed: float = 1.0) -> Dict[str, Any]:
+    """Publish ``messages`` with ``publish(topic, payload, qos, retain)`` at ``speed``."""
+    pacer = Pacer(speed)
+    count = 0
+    start = time.perf_counter()
+    for msg in messages:
+        wait = pacer.delay(msg.time)
+        if wait > 0.001:
+            time.sleep(wait)
+        publish(msg.topic, msg.payload, msg.qos, msg.retain)
+        count += 1
+    return _replay_stats(count, time.perf_counter() - start, pacer)
+
+
+async def async_replay(
+    messages: Iterator[CapturedMessage], dispatch: Callable[[CapturedMessage], Any], speed: float = 1.0
+) -> Dict[str, Any]:
+    """Call ``dispatch(msg)`` on the running loop for ``messages`` at ``speed``.
+
+    An awaitable returned by ``dispatch`` is awaited before the next message.
+    At max speed the loop still gets a turn every 1000 messages, so timers
+    of the integration (trailing writes, acknowledgement timeouts) run.
+    """
+    pacer = Pacer(speed)
+    count = 0
+    start = time.perf_counter()
+    for msg in messages:
+        wait = pacer.delay(msg.time)
+        if wait > 0.001:
+            await asyncio.sleep(wait)
+        elif not count % 1000:
+            await asyncio.sleep(0)
+        pending = dispatch(msg)
+        if pending is not None:
+            await pending
+        count += 1
+    return _replay_stats(count, time.perf_counter() - start, pacer)
+
+
+def _replay_stats(count: int, elapsed: float, pacer: Pacer) -> Dict[str, Any]:
+    return {
+        "messages": count,
+        "duration_s": round(elapsed, 3),
+        "msgs_per_s": round(count / elapsed, 1) if elapsed else 0.0,
+        "speed": pacer.speed or "max",
+        "max_lag_s": round(pacer.max_lag, 3),
+    }
+
+
+async def _async_replay_callbacks(reader: CaptureReader, serials: Optional[List[str]], speed: float) -> Dict[str, Any]:
+    """Replay through the stand-in broker into the hub and entity callbacks of the benchmark harness."""
+    from benchmark_poolnexus import PREFIX, Harness
+
+    if reader.prefix != PREFIX:
+        raise SystemExit(f"--callbacks replays captures under '{PREFIX}', not '{reader.prefix}'")
+    harness = Harness()
+    await harness.async_setup()
+
+    def _dispatch(msg: CapturedMessage):
+        known = len(harness.hub.devices)
+        harness.publish(msg.topic, msg.payload, msg.qos, msg.retain)
+        if len(harness.hub.devices) != known:
+            # Entities of a discovered device are added before the next
+            # message, as Home Assistant does on the next loop iterations
+            return harness.async_add_pending()
+        return None
+
+    try:
+        stats = await async_replay(reader.messages(serials), _dispatch, speed)
+        stats.update(
+            devices=len(harness.hub.devices),
+            entities=len(harness.entities),
+            state_writes=harness.state_writes,
+            suppressed_writes=harness.suppressed_writes,
+        )
+    finally:
+        harness.close()
+    return stats
+
+
+def _mqtt_client(args, client_id: str):
+    from mqtt_poolnexus_simulator import _create_client, resolve_credentials
+
+    warnings.filterwarnings(
+        "ignore",
+        message=r".*Callback API version 1 is deprecated.*",
+        category=DeprecationWarning,
+    )
+    username, password = resolve_credentials(args.username, args.password)
+    return _create_client(client_id, username, password)
+
+
+def cmd_record(args):
+    writer = CaptureWriter(args.output, args.prefix)
+    client = _mqtt_client(args, args.client_id or f"poolnexus-capture-{os.getpid()}")
+    topic = args.topic or f"{args.prefix}/#"
+
+    def _on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(topic, args.qos)
+            _LOGGER.info("Recording %s from %s:%s into %s", topic, args.host, args.port, args.output)
+        else:
+            _LOGGER.error("MQTT connection failed with rc=%s", rc)
+
+    def _on_message(client, userdata, msg):
+        writer.append(msg.topic, msg.payload, msg.qos, bool(msg.retain))
+
+    client.on_connect = _on_connect
+    client.on_message = _on_message
+    client.connect(args.host, args.port)
+    client.loop_start()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    next_report = time.monotonic() + args.report_interval
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(1)
+            writer.flush()
+            if args.report_interval and time.monotonic() >= next_report:
+                _LOGGER.info("%d messages recorded", writer.written)
+                next_report += args.report_interval
+    except KeyboardInterrupt:
+        _LOGGER.info("Stopping recorder...")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        writer.close()
+    _LOGGER.info("Recorded %d messages into %s", writer.written, args.output)
+
+
+def cmd_replay(args):
+    with CaptureReader(args.capture) as reader:
+        serials = args.serial or None
+        if args.callbacks:
+            stats = asyncio.run(_async_replay_callbacks(reader, serials, args.speed))
+        elif args.standin:
+            from mqtt_broker_standin import Broker
+
+            broker = Broker()
+            stats = replay(reader.messages(serials), broker.publish, args.speed)
+            stats["broker"] = dict(broker.stats)
+        else:
+            client = _mqtt_client(args, args.client_id or f"poolnexus-replay-{os.getpid()}")
+            client.connect(args.host, args.port)
+            client.loop_start()
+            try:
+                stats = replay(reader.messages(serials), client.publish, args.speed)
+            finally:
+                client.loop_stop()
+                client.disconnect()
+    print(json.dumps(stats, indent=2))
+
+
+def cmd_info(args):
+    with CaptureReader(args.capture) as reader:
+        summary = reader.summary()
+        if not os.path.exists(index_path(args.capture)):
+            reader.write_index()
+    print(json.dumps(summary, indent=2))
+
+
+def _add_broker_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--host", default="127.0.0.1", help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--username", help="MQTT username", default=None)
+    parser.add_argument("--password", help="MQTT password", default=None)
+    parser.add_argument("--client-id", default=None, help="MQTT client id (optional)")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Record and replay PoolNexus MQTT traffic")
+    parser.add_argument("--debug", action="store_true", help="enable debug logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="record broker traffic into a capture")
+    _add_broker_arguments(record)
+    record.add_argument("--prefix", default=DEFAULT_PREFIX, help="topic prefix (e.g. poolnexus)")
+    record.add_argument("--topic", default=None, help="subscription filter (default <prefix>/#)")
+    record.add_argument("--qos", type=int, default=0, choices=(0, 1, 2), help="subscription QoS")
+    record.add_argument("--output", required=True, help="capture file, appended to if it exists")
+    record.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    record.add_argument("--report-interval", type=float, default=10.0, help="seconds between progress logs")
+    record.set_defaults(func=cmd_record)
+
+    play = commands.add_parser("replay", help="replay a capture")
+    play.add_argument("capture", help="capture file")
+    _add_broker_arguments(play)
+    target = play.add_mutually_exclusive_group()
+    target.add_argument("--standin", action="store_true", help="publish to the in-process broker stand-in instead of --host")
+    target.add_argument("--callbacks", action="store_true", help="dispatch into the integration's hub and entity callbacks (benchmark harness)")
+    play.add_argument("--speed", type=float, default=1.0, help="pace multiplier: 1 = recorded pace, N = N times faster, 0 = max speed")
+    play.add_argument("--serial", action="append", default=None, help="replay this serial only (repeatable)")
+    play.set_defaults(func=cmd_replay)
+
+    info = commands.add_parser("info", help="summarize a capture per serial")
+    info.add_argument("capture", help="capture file")
+    info.set_defaults(func=cmd_info)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()